@@ -1,219 +1,78 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
 import datetime
-import networkx as nx
 import math
+import itertools
 import numpy as np
 import plotly.graph_objects as go
 import colorsys
+from shared_store import SharedFamilyData
+from relations import classify_relations, get_relation_cache
+from kinship import get_kinship_engine
+from kinship_path import get_kinship_path_finder
+from reachability import get_ancestor_index
+from levels import compute_relation_levels, get_level_cache, window_edges, DEFAULT_MAX_DEPTH
+from figure_cache import get_figure_cache
+from name_index import get_name_index
+from pedigree import get_pedigree_index
+from journal import get_journal, load_store
+from sqlite_store import get_backend as get_sqlite_backend, load_store as load_sqlite_store
+from clusters import assign_clusters, cluster_title
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from layout import (
+    collapse_edges,
+    concentric_layout,
+    index_edges,
+    merged_ring_coordinates,
+    radius_step_for,
+    ring_coordinates,
+    segment_coordinates,
+)
 
 # Настройка страницы с адаптивным макетом
 st.set_page_config(page_title="Фамильное древо", layout="wide", initial_sidebar_state="collapsed")
 
 # --- Функции визуализации в начале файла ---
 
-def calculate_relation_levels(members, relationships, central_person_id):
+def calculate_relation_levels(store, central_person_id, max_depth=DEFAULT_MAX_DEPTH):
     """
     Вычисляет уровни родства всех членов семьи относительно центрального узла
     
+    Уровень - число шагов по связям родитель-ребенок и супружеским связям.
+    Результат кешируется для пары (версия данных, центр), поэтому смена
+    центра древа при неизменных данных не требует повторного обхода.
+    
     Returns:
         dict: Словарь {id: уровень}, где уровень:
             0 - центральный человек
             1 - прямая семья (родители, дети, супруг/а)
-            2 - близкие родственники (бабушки/дедушки, братья/сестры)
-            3 - дальние родственники (дяди/тети, двоюродные)
+            2 - близкие родственники (бабушки/дедушки, братья/сестры, внуки)
+            3 - дальние родственники (дяди/тети, племянники, прадедушки/прабабушки)
+            ... и так далее до max_depth
+    """
+    return get_level_cache().get(store, central_person_id, max_depth, compute=query_relation_levels)
+
+def query_relation_levels(store, central_person_id, max_depth):
+    """
+    Обход для кеша уровней: в режиме SQLite - рекурсивный запрос к базе
+    (окно родства по ее индексам), иначе - обход в ширину по хранилищу.
     """
-    levels = {central_person_id: 0}  # Центральный узел
-    
-    # Строим граф для анализа связей
-    G = build_family_graph(members, relationships)
-    
-    # Находим родителей, детей и супруга
-    parents = list(G.predecessors(central_person_id))
-    children = list(G.successors(central_person_id))
-    
-    # Находим супруга (общие дети)
-    spouse_ids = []
-    for child_id in children:
-        child_parents = list(G.predecessors(child_id))
-        for parent_id in child_parents:
-            if parent_id != central_person_id:
-                spouse_ids.append(parent_id)
-    
-    # Прямая семья (уровень 1)
-    for member_id in parents + children + spouse_ids:
-        levels[member_id] = 1
-    
-    # Находим братьев/сестер (общие родители)
-    siblings = []
-    for parent_id in parents:
-        for child_id in G.successors(parent_id):
-            if child_id != central_person_id and child_id not in siblings:
-                siblings.append(child_id)
-    
-    # Находим бабушек/дедушек (родители родителей)
-    grandparents = []
-    for parent_id in parents:
-        for gp_id in G.predecessors(parent_id):
-            if gp_id not in grandparents:
-                grandparents.append(gp_id)
-    
-    # Близкие родственники (уровень 2)
-    for member_id in siblings + grandparents:
-        levels[member_id] = 2
-    
-    # Дяди/тети (братья/сестры родителей)
-    uncles_aunts = []
-    for parent_id in parents:
-        parent_siblings = []
-        parent_parents = list(G.predecessors(parent_id))
-        for gp_id in parent_parents:
-            for child_id in G.successors(gp_id):
-                if child_id != parent_id and child_id not in uncles_aunts:
-                    uncles_aunts.append(child_id)
-    
-    # Племянники (дети братьев/сестер)
-    niblings = []
-    for sibling_id in siblings:
-        for child_id in G.successors(sibling_id):
-            if child_id not in niblings:
-                niblings.append(child_id)
-    
-    # Двоюродные (дети дядь/теть)
-    cousins = []
-    for ua_id in uncles_aunts:
-        for child_id in G.successors(ua_id):
-            if child_id not in cousins:
-                cousins.append(child_id)
-    
-    # Дальние родственники (уровень 3)
-    for member_id in uncles_aunts + niblings + cousins:
-        levels[member_id] = 3
-    
-    return levels
+    if STORAGE_BACKEND == "sqlite" and central_person_id is not None:
+        return get_sqlite_backend(store).window(central_person_id, max_depth)
+    return compute_relation_levels(store, central_person_id, max_depth)
 
-def get_relation_to_person(members, relationships, central_id, person_id):
+def get_relation_to_person(store, central_id, person_id):
     """
     Определяет отношение человека к центральному узлу
     """
-    if central_id == person_id:
-        return "Это я"
-    
-    # Строим граф для анализа отношений
-    G = nx.DiGraph()
-    for member in members:
-        G.add_node(member["id"], **member)
-    for rel in relationships:
-        G.add_edge(rel["parent_id"], rel["child_id"])
-    
-    # Находим прямых родителей центрального узла
-    parents = list(G.predecessors(central_id))
-    
-    # Находим прямых детей центрального узла
-    children = list(G.successors(central_id))
-    
-    # Находим братьев/сестер центрального узла (имеют тех же родителей)
-    siblings = []
-    for parent_id in parents:
-        for child_id in G.successors(parent_id):
-            if child_id != central_id and child_id not in siblings:
-                siblings.append(child_id)
-    
-    # Проверяем родительские связи
-    if person_id in parents:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Отец" if person["gender"] == "Мужской" else "Мать"
-    
-    # Проверяем супружеские связи
-    marriage_pairs = find_marriage_pairs(relationships)
-    for pair in marriage_pairs:
-        if central_id in pair and person_id in pair:
-            person = next(m for m in members if m["id"] == person_id)
-            return "Муж" if person["gender"] == "Мужской" else "Жена"
-    
-    # Проверяем, является ли человек ребенком
-    if person_id in children:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Сын" if person["gender"] == "Мужской" else "Дочь"
-    
-    # Проверяем, является ли человек братом/сестрой
-    if person_id in siblings:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Брат" if person["gender"] == "Мужской" else "Сестра"
-    
-    # Проверяем бабушек/дедушек (родители родителей)
-    for parent_id in parents:
-        grandparents = list(G.predecessors(parent_id))
-        if person_id in grandparents:
-            person = next(m for m in members if m["id"] == person_id)
-            return "Дедушка" if person["gender"] == "Мужской" else "Бабушка"
-    
-    # Проверяем дядей/теть (братья/сестры родителей)
-    uncles_aunts = []
-    for parent_id in parents:
-        parent_parents = list(G.predecessors(parent_id))
-        for grandparent in parent_parents:
-            for uncle_aunt in G.successors(grandparent):
-                if uncle_aunt != parent_id and uncle_aunt not in uncles_aunts:
-                    uncles_aunts.append(uncle_aunt)
-    
-    if person_id in uncles_aunts:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Дядя" if person["gender"] == "Мужской" else "Тетя"
-    
-    # Проверяем двоюродных братьев/сестер (дети дядей/теть)
-    cousins = []
-    for uncle_aunt in uncles_aunts:
-        for cousin in G.successors(uncle_aunt):
-            if cousin not in cousins:
-                cousins.append(cousin)
-    
-    if person_id in cousins:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Двоюродный брат" if person["gender"] == "Мужской" else "Двоюродная сестра"
-    
-    # Проверяем племянников (дети братьев/сестер)
-    niblings = []
-    for sibling in siblings:
-        for child in G.successors(sibling):
-            if child not in niblings:
-                niblings.append(child)
-    
-    if person_id in niblings:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Племянник" if person["gender"] == "Мужской" else "Племянница"
-    
-    # По умолчанию, если отношение не определено
-    return "Родственник"
+    return get_kinship_engine(store).relation(central_id, person_id)
 
-def find_marriage_pairs(relationships):
+def find_marriage_pairs(store):
     """
     Находит супружеские пары на основе общих детей
     """
-    # Словарь для группировки родителей по детям
-    parents_by_child = {}
-    
-    for rel in relationships:
-        child_id = rel["child_id"]
-        parent_id = rel["parent_id"]
-        
-        if child_id not in parents_by_child:
-            parents_by_child[child_id] = []
-        
-        parents_by_child[child_id].append(parent_id)
-    
-    # Находим пары родителей, у которых есть общие дети
-    marriage_pairs = set()
-    for child_id, parents in parents_by_child.items():
-        if len(parents) >= 2:
-            for i in range(len(parents)):
-                for j in range(i + 1, len(parents)):
-                    pair = tuple(sorted([parents[i], parents[j]]))
-                    marriage_pairs.add(pair)
-    
-    return list(marriage_pairs)
+    return store.marriage_pairs()
 
 def get_relation_group(relation):
     """
@@ -283,17 +142,51 @@ def get_node_color(gender, level, color_scheme="standard"):
     idx = min(level, len(colors)-1)
     return colors[idx]
 
-def create_concentric_family_tree(members, relationships, central_person_id=3, show_names=True, show_relations=True, color_scheme="standard"):
+# Режимы отрисовки древа: автоматический выбор, SVG или WebGL
+RENDER_MODES = ["auto", "svg", "webgl"]
+RENDER_MODE_NAMES = {"auto": "Автоматически", "svg": "SVG", "webgl": "WebGL"}
+
+# Число узлов, начиная с которого в автоматическом режиме используется WebGL
+DEFAULT_WEBGL_THRESHOLD = 2000
+
+# Варианты детализации: None - все круги подробно, иначе последний подробный круг
+DETAIL_DEPTHS = [None, 1, 2, 3, 4, 5, 6, 7, 8]
+
+def format_detail_depth(detail_depth):
+    """Подпись варианта детализации для настроек"""
+    return "Все круги" if detail_depth is None else f"{detail_depth}"
+
+def use_webgl(render_mode, node_count, webgl_threshold=DEFAULT_WEBGL_THRESHOLD):
+    """
+    Определяет, нужно ли рисовать древо через WebGL (go.Scattergl)
+    """
+    if render_mode == "webgl":
+        return True
+    if render_mode == "svg":
+        return False
+    return node_count >= webgl_threshold
+
+def create_concentric_family_tree(store, central_person_id=3, show_names=True, show_relations=True, color_scheme="standard", max_depth=DEFAULT_MAX_DEPTH,
+                                  render_mode="auto", webgl_threshold=DEFAULT_WEBGL_THRESHOLD, detail_depth=None, expanded_clusters=(),
+                                  window=False, highlight_path=()):
     """
     Создает концентрическую визуализацию семейного древа с заданным центральным узлом.
     
     Args:
-        members: Список словарей с информацией о членах семьи
-        relationships: Список словарей с информацией о родственных связях
+        store: Хранилище FamilyStore с членами семьи и родственными связями
         central_person_id: ID члена семьи, который будет в центре (по умолчанию Георгий Богданов, ID=3)
         show_names: Показывать ли полные имена
         show_relations: Показывать ли родственные связи
         color_scheme: Цветовая схема ("standard", "contrast", "monochrome")
+        max_depth: Число кругов родства; более дальние родственники попадают на внешний круг
+        render_mode: Режим отрисовки ("auto", "svg", "webgl")
+        webgl_threshold: Число узлов, начиная с которого режим "auto" переключается на WebGL
+        detail_depth: Последний круг, отображаемый подробно; дальние круги объединяются
+            в группы по фамилиям (None - подробно все круги)
+        expanded_clusters: Ключи групп, раскрытых пользователем
+        window: Показывать только окно из max_depth шагов родства вокруг центра;
+            работа пропорциональна размеру окна, а не всего древа
+        highlight_path: ID членов семьи на пути родства, который нужно выделить на древе
         
     Returns:
         fig: Объект plotly Figure с визуализацией
@@ -309,32 +202,58 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
         pass
     
     # Вычисляем степень родства для каждого члена семьи относительно центрального узла
-    relation_levels = calculate_relation_levels(members, relationships, central_person_id)
+    relation_levels = calculate_relation_levels(store, central_person_id, max_depth)
     
     # Получаем центрального человека
-    central_person = next((m for m in members if m["id"] == central_person_id), None)
+    central_person = store.get(central_person_id)
     if not central_person:
         return None
     
-    # Создаем граф для анализа
-    G = build_family_graph(members, relationships)
+    if window:
+        # В режиме окна берем только членов семьи в пределах max_depth шагов и связи между ними
+        window_members = [store.get(member_id) for member_id in relation_levels if member_id in store]
+        relations = classify_relations(store, central_person_id, relation_levels)
+        parent_edges, marriage_pairs = window_edges(store, relation_levels)
+    else:
+        # Определяем отношения всех членов семьи к центральному узлу за один проход
+        window_members = store
+        relations = get_relation_cache(store).classify_all(central_person_id)
+        parent_edges, marriage_pairs = list(store.edges()), find_marriage_pairs(store)
     
     # Подготавливаем данные для визуализации
-    nodes_by_level = {}
-    labels = {}
-    node_colors = {}
+    members = []
+    member_ids = []
+    member_levels = []
+    member_relations = []
     
-    for member in members:
+    for member in window_members:
         member_id = member["id"]
-        level = relation_levels.get(member_id, 4)  # Если уровень не определен, помещаем на 4й круг
-        
-        if level not in nodes_by_level:
-            nodes_by_level[level] = []
-        
-        nodes_by_level[level].append(member_id)
-        
-        # Определяем метку с именем и родством
-        relation = get_relation_to_person(members, relationships, central_person_id, member_id)
+        members.append(member)
+        member_ids.append(member_id)
+        member_levels.append(relation_levels.get(member_id, max_depth + 1))  # Если уровень не определен, помещаем на внешний круг
+        member_relations.append(relations[member_id])
+    
+    # Дальние круги при ограниченной детализации объединяются в группы по фамилиям
+    if detail_depth is not None:
+        cluster_of, clusters = assign_clusters([member["name"] for member in members], member_levels,
+                                               detail_depth, expanded_clusters)
+    else:
+        cluster_of, clusters = [None] * len(members), {}
+    
+    node_ids = []
+    node_levels = []
+    node_groups = []
+    node_text = []
+    node_color = []
+    node_size = []
+    
+    for member, level, relation, cluster in zip(members, member_levels, member_relations, cluster_of):
+        if cluster is not None:
+            continue
+        member_id = member["id"]
+        node_ids.append(member_id)
+        node_levels.append(level)
+        node_groups.append(get_relation_group(relation))
         
         # Для мобильного отображения - компактная версия имени
         name_display = member['name']
@@ -348,166 +267,106 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
         
         if member_id == central_person_id:
             if show_names:
-                labels[member_id] = f"{name_display}<br>(Центр древа)"
+                node_text.append(f"{name_display}<br>(Центр древа)")
             else:
-                labels[member_id] = f"(Центр древа)"
+                node_text.append(f"(Центр древа)")
         else:
             if show_names and show_relations:
-                labels[member_id] = f"{name_display}<br>({relation})"
+                node_text.append(f"{name_display}<br>({relation})")
             elif show_names:
-                labels[member_id] = f"{name_display}"
+                node_text.append(f"{name_display}")
             elif show_relations:
-                labels[member_id] = f"({relation})"
+                node_text.append(f"({relation})")
             else:
-                labels[member_id] = f"#{member_id}"
+                node_text.append(f"#{member_id}")
         
         # Определяем цвет узла в зависимости от пола и выбранной цветовой схемы
-        node_colors[member_id] = get_node_color(member["gender"], level, color_scheme)
+        node_color.append(get_node_color(member["gender"], level, color_scheme))
+        
+        # Размер узлов адаптируется для мобильных устройств
+        if is_mobile:
+            # На мобильных делаем узлы больше для удобства тач-интерфейса
+            node_size.append(50 if member_id == central_person_id else 40)
+        else:
+            # На десктопах стандартный размер
+            node_size.append(40 if member_id == central_person_id else 30)
+    
+    # Узлы групп располагаются на своих кругах после отдельных членов семьи
+    cluster_keys = list(clusters)
+    cluster_text = []
+    cluster_size = []
+    for key in cluster_keys:
+        cluster = clusters[key]
+        count = len(cluster["members"])
+        node_levels.append(cluster["level"])
+        node_groups.append("clusters")
+        
+        sample = ", ".join(members[index]["name"] for index in cluster["members"][:5])
+        if count > 5:
+            sample += ", ..."
+        cluster_text.append(f"{cluster_title(cluster)}: {count} чел.<br>{sample}<br>(нажмите, чтобы раскрыть)")
+        cluster_size.append(min(60, 30 + 5 * math.log2(count)))
+    
+    # Номер узла для каждого члена семьи: собственный узел или узел его группы
+    cluster_node = {key: len(node_ids) + position for position, key in enumerate(cluster_keys)}
+    visible_node = iter(range(len(node_ids)))
+    node_of = np.array([next(visible_node) if cluster is None else cluster_node[cluster] for cluster in cluster_of],
+                       dtype=np.int64)
     
     # Создаем фигуру plotly
     fig = go.Figure()
     
-    # Расставляем узлы по концентрическим кругам
-    max_level = max(nodes_by_level.keys()) if nodes_by_level else 4
-    radius_step = 1.0 / max_level if max_level > 0 else 1.0
+    # Для больших древ используем WebGL: SVG-браузеры не справляются с тысячами узлов
+    webgl = use_webgl(render_mode, len(node_levels), webgl_threshold)
+    Scatter = go.Scattergl if webgl else go.Scatter
     
-    node_positions = {}
-    
-    # Размещаем центральный узел в центре
-    node_positions[central_person_id] = (0, 0)
-    
-    # Размещаем остальные узлы по концентрическим кругам
-    for level, node_ids in nodes_by_level.items():
-        if level == 0:  # Центральный узел уже размещен
-            continue
-        
-        radius = level * radius_step
-        node_count = len(node_ids)
-        
-        # Определяем начальный угол в зависимости от типа отношения
-        start_angles = {
-            1: {  # Прямая семья (родители - верхний полукруг, дети - нижний)
-                "parents": 45,      # Родители в верхней части
-                "children": 225,    # Дети в нижней части
-                "spouse": 135       # Супруги справа
-            },
-            2: {  # Расширенная семья
-                "grandparents": 30,  # Бабушки/дедушки вверху
-                "siblings": 100,     # Братья/сестры справа
-                "niblings": 260      # Племянники внизу-справа
-            }
-        }
-        
-        # Группируем узлы по типу отношения
-        grouped_nodes = {}
-        for node_id in node_ids:
-            relation = get_relation_to_person(members, relationships, central_person_id, node_id)
-            relation_type = get_relation_group(relation)
-            if relation_type not in grouped_nodes:
-                grouped_nodes[relation_type] = []
-            grouped_nodes[relation_type].append(node_id)
-        
-        # Размещаем узлы по группам
-        for group, group_nodes in grouped_nodes.items():
-            if level in start_angles and group in start_angles[level]:
-                start_angle = start_angles[level][group]
-            else:
-                start_angle = 0
-            
-            angle_step = 360 / max(20, len(node_ids))  # Минимум 20 для предотвращения перекрытий
-            
-            for i, node_id in enumerate(group_nodes):
-                angle = (start_angle + i * angle_step) % 360
-                x = radius * math.cos(math.radians(angle))
-                y = radius * math.sin(math.radians(angle))
-                node_positions[node_id] = (x, y)
-    
-    # Добавляем узлы (члены семьи) с метками
-    node_x = []
-    node_y = []
-    node_text = []
-    node_color = []
-    node_size = []
-    node_ids = []
-    
-    for member in members:
-        member_id = member["id"]
-        if member_id in node_positions:
-            x, y = node_positions[member_id]
-            node_x.append(x)
-            node_y.append(y)
-            node_text.append(labels[member_id])
-            node_color.append(node_colors[member_id])
-            
-            # Размер узлов адаптируется для мобильных устройств
-            if is_mobile:
-                # На мобильных делаем узлы больше для удобства тач-интерфейса
-                node_size.append(50 if member_id == central_person_id else 40)
-            else:
-                # На десктопах стандартный размер
-                node_size.append(40 if member_id == central_person_id else 30)
-                
-            node_ids.append(member_id)
+    # Расставляем узлы по концентрическим кругам (центральный узел - в центре)
+    x, y, max_level = concentric_layout(node_levels, node_groups)
+    if not node_levels:
+        max_level = max_depth + 1
+    radius_step = radius_step_for(max_level)
+    node_x, node_y = x[:len(node_ids)], y[:len(node_ids)]
+    cluster_x, cluster_y = x[len(node_ids):], y[len(node_ids):]
     
     # Добавляем концентрические круги для контекста
-    for level in range(1, max_level+1):
-        radius = level * radius_step
-        circle_x = []
-        circle_y = []
-        
-        for angle in range(0, 361, 1):
-            circle_x.append(radius * math.cos(math.radians(angle)))
-            circle_y.append(radius * math.sin(math.radians(angle)))
-        
-        circle_trace = go.Scatter(
+    if webgl:
+        # В режиме WebGL все круги рисуются одной трассой
+        circle_x, circle_y = merged_ring_coordinates(np.arange(1, max_level + 1) * radius_step)
+        fig.add_trace(Scatter(
             x=circle_x,
             y=circle_y,
             mode='lines',
             line=dict(width=0.5, color='lightgrey'),
             hoverinfo='none'
-        )
-        fig.add_trace(circle_trace)
+        ))
+    else:
+        for level in range(1, max_level+1):
+            circle_x, circle_y = ring_coordinates(level * radius_step)
+            
+            circle_trace = go.Scatter(
+                x=circle_x,
+                y=circle_y,
+                mode='lines',
+                line=dict(width=0.5, color='lightgrey'),
+                hoverinfo='none'
+            )
+            fig.add_trace(circle_trace)
     
     # Теперь добавляем связи между узлами, чтобы они были под узлами
     # Родительские связи (сплошные линии)
-    parent_edge_x = []
-    parent_edge_y = []
-    
-    for rel in relationships:
-        parent_id = rel["parent_id"]
-        child_id = rel["child_id"]
-        
-        if parent_id in node_positions and child_id in node_positions:
-            x0, y0 = node_positions[parent_id]
-            x1, y1 = node_positions[child_id]
-            
-            parent_edge_x.append(x0)
-            parent_edge_x.append(x1)
-            parent_edge_x.append(None)
-            parent_edge_y.append(y0)
-            parent_edge_y.append(y1)
-            parent_edge_y.append(None)
+    source, target = index_edges(member_ids, parent_edges)
+    if clusters:
+        source, target = collapse_edges(source, target, node_of)
+    parent_edge_x, parent_edge_y = segment_coordinates(x, y, source, target)
     
     # Супружеские связи (пунктирные линии)
-    marriage_edge_x = []
-    marriage_edge_y = []
-    
-    marriage_pairs = find_marriage_pairs(relationships)
-    for pair in marriage_pairs:
-        id1, id2 = pair
-        if id1 in node_positions and id2 in node_positions:
-            x0, y0 = node_positions[id1]
-            x1, y1 = node_positions[id2]
-            
-            marriage_edge_x.append(x0)
-            marriage_edge_x.append(x1)
-            marriage_edge_x.append(None)
-            marriage_edge_y.append(y0)
-            marriage_edge_y.append(y1)
-            marriage_edge_y.append(None)
+    source, target = index_edges(member_ids, marriage_pairs)
+    if clusters:
+        source, target = collapse_edges(source, target, node_of)
+    marriage_edge_x, marriage_edge_y = segment_coordinates(x, y, source, target)
     
     # Рисуем родительские связи (сплошные линии)
-    parent_child_edges = go.Scatter(
+    parent_child_edges = Scatter(
         x=parent_edge_x,
         y=parent_edge_y,
         mode='lines',
@@ -517,7 +376,7 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
     fig.add_trace(parent_child_edges)
     
     # Рисуем супружеские связи (пунктирные линии)
-    marriage_edges = go.Scatter(
+    marriage_edges = Scatter(
         x=marriage_edge_x,
         y=marriage_edge_y,
         mode='lines',
@@ -526,16 +385,45 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
     )
     fig.add_trace(marriage_edges)
     
+    # Выделенный путь родства: толстая линия по связям пути и обводка его узлов
+    if highlight_path:
+        source, target = index_edges(member_ids, list(zip(highlight_path, highlight_path[1:])))
+        if clusters:
+            source, target = collapse_edges(source, target, node_of)
+        path_edge_x, path_edge_y = segment_coordinates(x, y, source, target)
+        fig.add_trace(Scatter(
+            x=path_edge_x,
+            y=path_edge_y,
+            mode='lines',
+            line=dict(width=4, color='#FFB000'),
+            hoverinfo='none'
+        ))
+        
+        path_members = set(highlight_path)
+        path_nodes = [index for index, member_id in enumerate(node_ids) if member_id in path_members]
+        fig.add_trace(Scatter(
+            x=node_x[path_nodes],
+            y=node_y[path_nodes],
+            mode='markers',
+            marker=dict(
+                size=[node_size[index] + 12 for index in path_nodes],
+                color='rgba(0,0,0,0)',
+                line=dict(width=3, color='#FFB000')
+            ),
+            hoverinfo='none'
+        ))
+    
     # Адаптивный размер шрифта и формат узлов в зависимости от устройства
     text_size = 10
     if is_mobile:
         text_size = 8  # Уменьшаем размер текста на мобильных
     
     # Добавляем узлы на график поверх линий
-    nodes_trace = go.Scatter(
+    nodes_trace = Scatter(
         x=node_x, 
         y=node_y,
-        mode='markers+text',
+        # В режиме WebGL подписи внутри узлов не рисуем - остаются всплывающие подсказки
+        mode='markers' if webgl else 'markers+text',
         marker=dict(
             size=node_size,
             color=node_color,
@@ -550,6 +438,27 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
     
     fig.add_trace(nodes_trace)
     
+    # Узлы групп: в customdata передается ключ группы для раскрытия по нажатию
+    if clusters:
+        clusters_trace = Scatter(
+            x=cluster_x,
+            y=cluster_y,
+            mode='markers' if webgl else 'markers+text',
+            marker=dict(
+                size=cluster_size,
+                color='#B0BEC5',
+                symbol='square',
+                line=dict(width=2, color='DarkSlateGrey')
+            ),
+            text=[str(len(clusters[key]["members"])) for key in cluster_keys],
+            hovertext=cluster_text,
+            hoverinfo='text',
+            customdata=cluster_keys,
+            textposition="middle center",
+            textfont=dict(size=text_size)
+        )
+        fig.add_trace(clusters_trace)
+    
     # Настройка макета графика
     title = f"Фамильное древо - центр: {central_person['name']}"
     
@@ -603,6 +512,48 @@ def create_concentric_family_tree(members, relationships, central_person_id=3, s
     
     return fig
 
+def get_family_tree_figure(store, central_person_id=3, show_names=True, show_relations=True, color_scheme="standard", max_depth=DEFAULT_MAX_DEPTH,
+                           render_mode="auto", webgl_threshold=DEFAULT_WEBGL_THRESHOLD, detail_depth=None, expanded_clusters=(),
+                           window=False, highlight_path=()):
+    """
+    Возвращает фигуру концентрического древа из общего кеша, строя ее только при изменении
+    данных или параметров отображения. Аргументы те же, что у create_concentric_family_tree.
+    """
+    is_mobile = st.session_state.get('is_mobile', False)
+    expanded_clusters = tuple(sorted(expanded_clusters))
+    highlight_path = tuple(highlight_path)
+    key = (store.version, central_person_id, show_names, show_relations, color_scheme, is_mobile,
+           max_depth, render_mode, webgl_threshold, detail_depth, expanded_clusters, window, highlight_path)
+    return get_figure_cache().get(key, lambda: create_concentric_family_tree(
+        store,
+        central_person_id=central_person_id,
+        show_names=show_names,
+        show_relations=show_relations,
+        color_scheme=color_scheme,
+        max_depth=max_depth,
+        render_mode=render_mode,
+        webgl_threshold=webgl_threshold,
+        detail_depth=detail_depth,
+        expanded_clusters=expanded_clusters,
+        window=window,
+        highlight_path=highlight_path
+    ))
+
+def expand_selected_clusters(event):
+    """
+    Раскрывает группы дальних родственников, выбранные нажатием на узел древа.
+    
+    Ключ группы передается в customdata узла; раскрытые группы хранятся в st.session_state.expanded_clusters.
+    """
+    if not event or not event.selection:
+        return
+    expanded = st.session_state.get('expanded_clusters', [])
+    selected = [point.get("customdata") for point in event.selection.get("points", [])]
+    added = [key for key in selected if isinstance(key, str) and key not in expanded]
+    if added:
+        st.session_state.expanded_clusters = expanded + added
+        st.rerun()
+
 # Функции для определения мобильного устройства
 def is_mobile_device():
     """Определяет, запущено ли приложение на мобильном устройстве"""
@@ -683,56 +634,44 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Функции для работы с данными
-def save_family_data(members, relationships):
-    """Сохраняет данные о членах семьи и их отношениях в JSON-файлы"""
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    
-    with open(os.path.join(data_dir, "members.json"), "w", encoding="utf-8") as f:
-        json.dump(members, f, ensure_ascii=False, indent=4)
+# Способ хранения данных: "json" (снимок и журнал изменений) или "sqlite"
+STORAGE_BACKEND = os.environ.get("FAMILYTREE_STORAGE", "json")
+
+def save_family_data(store):
+    """
+    Сохраняет изменения данных о членах семьи и их отношениях.
     
-    with open(os.path.join(data_dir, "relationships.json"), "w", encoding="utf-8") as f:
-        json.dump(relationships, f, ensure_ascii=False, indent=4)
+    Изменения хранилища записываются по мере их внесения (в журнал или в базу SQLite);
+    здесь сброс журнала на диск ставится в очередь фоновой записи, поэтому обработчик
+    не ждет диска. Хранилище, еще не связанное с файлами, записывается целиком.
+    Дождаться окончания записи можно через get_journal(store).flush().
+    """
+    if STORAGE_BACKEND == "sqlite":
+        get_sqlite_backend(store).sync()
+    else:
+        get_journal(store).sync()
 
 def load_family_data():
-    """Загружает данные о членах семьи и их отношениях из JSON-файлов"""
-    data_dir = "data"
-    members = []
-    relationships = []
-    
-    if os.path.exists(data_dir):
-        members_file = os.path.join(data_dir, "members.json")
-        relationships_file = os.path.join(data_dir, "relationships.json")
-        
-        if os.path.exists(members_file):
-            with open(members_file, "r", encoding="utf-8") as f:
-                members = json.load(f)
-        
-        if os.path.exists(relationships_file):
-            with open(relationships_file, "r", encoding="utf-8") as f:
-                relationships = json.load(f)
-    
-    return members, relationships
+    """Загружает данные о членах семьи и их отношениях из выбранного хранилища"""
+    if STORAGE_BACKEND == "sqlite":
+        return load_sqlite_store()
+    return load_store()
 
-def build_family_graph(members, relationships):
-    """Создает граф семейного древа на основе данных о членах семьи и их отношениях"""
-    G = nx.DiGraph()
-    
-    # Добавляем узлы (членов семьи)
-    for member in members:
-        G.add_node(member["id"], **member)
-    
-    # Добавляем связи (родительские отношения)
-    for rel in relationships:
-        G.add_edge(rel["parent_id"], rel["child_id"])
+def check_relationship_validity(store, parent_id, child_id, new_member=None):
+    """
+    Проверяет валидность родительской связи
     
-    return G
-
-def check_relationship_validity(members, parent_id, child_id):
-    """Проверяет валидность родительской связи"""
-    parent = next((m for m in members if m["id"] == parent_id), None)
-    child = next((m for m in members if m["id"] == child_id), None)
+    Args:
+        store: Хранилище FamilyStore
+        parent_id: ID родителя
+        child_id: ID ребенка
+        new_member: Еще не добавленный в хранилище член семьи, участвующий в связи
+    """
+    parent = store.get(parent_id)
+    child = store.get(child_id)
+    if new_member is not None:
+        parent = parent or (new_member if new_member["id"] == parent_id else None)
+        child = child or (new_member if new_member["id"] == child_id else None)
     
     if not parent or not child:
         return False, "Один из членов семьи не найден"
@@ -741,109 +680,96 @@ def check_relationship_validity(members, parent_id, child_id):
     if parent["birth_year"] >= child["birth_year"]:
         return False, f"Родитель ({parent['name']}) должен быть старше ребенка ({child['name']})"
     
-    # Проверка на циклические связи
-    G = build_family_graph(members, [{"parent_id": parent_id, "child_id": child_id}])
-    
-    # Проверяем, является ли "ребенок" уже предком "родителя"
-    def is_ancestor(graph, ancestor, descendant):
-        for successor in graph.successors(ancestor):
-            if successor == descendant:
-                return True
-            if is_ancestor(graph, successor, descendant):
-                return True
-        return False
-    
-    if is_ancestor(G, child_id, parent_id):
+    # Проверка на циклические связи: является ли "ребенок" уже предком "родителя"
+    if get_ancestor_index(store).would_create_cycle(parent_id, child_id):
         return False, "Обнаружена циклическая связь в древе"
     
     return True, ""
 
-def find_member_by_id(members, member_id):
+def find_member_by_id(store, member_id):
     """Находит члена семьи по ID"""
-    for member in members:
-        if member["id"] == member_id:
-            return member
-    return None
+    return store.get(member_id)
+
+# Сколько кандидатов показывать в списке выбора члена семьи
+PICKER_LIMIT = 50
+
+def format_member(store, member_id):
+    """Подпись члена семьи в списках выбора"""
+    if member_id is None:
+        return "Не выбрано"
+    member = store.get(member_id)
+    return f"{member['name']} ({member['birth_year']})"
+
+def format_generation_counts(counts):
+    """Подпись числа предков или потомков: всего и по поколениям"""
+    if not counts:
+        return "нет"
+    return f"{sum(counts)} (по поколениям: {' · '.join(map(str, counts))})"
+
+def person_picker(store, label, key, selected_id=None, allow_empty=False):
+    """
+    Выбор члена семьи с поиском по имени.
+
+    В выпадающий список попадают только найденные по строке поиска кандидаты
+    (или первые PICKER_LIMIT членов семьи при пустом запросе) и текущий выбор,
+    а не весь список членов семьи.
+
+    Returns:
+        int: ID выбранного члена семьи или None ("Не выбрано")
+    """
+    query = st.text_input(f"{label}: поиск", key=f"{key}_query", placeholder="Начните вводить имя")
+    if query.strip():
+        # Поиск всегда идет по индексу имен: он находит и отдельные слова, и опечатки,
+        # поэтому и при хранении в SQLite его результаты не заменяются поиском по началу имени
+        candidates = get_name_index(store).search(query, PICKER_LIMIT)
+    else:
+        candidates = [member["id"] for member in itertools.islice(store, PICKER_LIMIT)]
+
+    current = st.session_state.get(key, selected_id)
+    if current is not None and current in store and current not in candidates:
+        candidates.insert(0, current)
+    options = ([None] if allow_empty else []) + candidates
+    if not options:
+        st.caption("Никто не найден")
+        return None
+
+    return st.selectbox(
+        label,
+        options,
+        index=options.index(current) if current in options else 0,
+        format_func=lambda member_id: format_member(store, member_id),
+        key=key
+    )
 
-def get_relation_to_georgy(members, relationships, person_id):
+def get_relation_to_georgy(store, person_id):
     """
     Определяет, кем человек с указанным ID является по отношению к Георгию Богданову (ID=3)
     """
     # ID Георгия Богданова
     georgy_id = 3
     
-    # Если это сам Георгий
-    if person_id == georgy_id:
-        return "Это я"
-    
-    # Строим граф для анализа отношений
-    G = nx.DiGraph()
-    for member in members:
-        G.add_node(member["id"], **member)
-    for rel in relationships:
-        G.add_edge(rel["parent_id"], rel["child_id"])
-    
-    # Находим прямых родителей Георгия
-    parents_of_georgy = list(G.predecessors(georgy_id))
-    
-    # Находим прямых детей Георгия (если есть)
-    children_of_georgy = list(G.successors(georgy_id))
-    
-    # Находим братьев/сестер Георгия (имеют тех же родителей)
-    siblings = []
-    for parent_id in parents_of_georgy:
-        for child_id in G.successors(parent_id):
-            if child_id != georgy_id and child_id not in siblings:
-                siblings.append(child_id)
-    
-    # Проверяем родительские связи
-    if person_id in parents_of_georgy:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Отец" if person["gender"] == "Мужской" else "Мать"
-    
-    # Проверяем, является ли человек ребенком Георгия
-    if person_id in children_of_georgy:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Сын" if person["gender"] == "Мужской" else "Дочь"
-    
-    # Проверяем, является ли человек братом/сестрой Георгия
-    if person_id in siblings:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Брат" if person["gender"] == "Мужской" else "Сестра"
-    
-    # Проверяем бабушек/дедушек (родители родителей)
-    for parent_id in parents_of_georgy:
-        grandparents = list(G.predecessors(parent_id))
-        if person_id in grandparents:
-            person = next(m for m in members if m["id"] == person_id)
-            return "Дедушка" if person["gender"] == "Мужской" else "Бабушка"
-    
-    # Проверяем дядей/теть (братья/сестры родителей)
-    uncles_aunts = []
-    for parent_id in parents_of_georgy:
-        parent_parents = list(G.predecessors(parent_id))
-        for grandparent in parent_parents:
-            for uncle_aunt in G.successors(grandparent):
-                if uncle_aunt != parent_id and uncle_aunt not in uncles_aunts:
-                    uncles_aunts.append(uncle_aunt)
-    
-    if person_id in uncles_aunts:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Дядя" if person["gender"] == "Мужской" else "Тетя"
-    
-    # Проверяем двоюродных братьев/сестер (дети дядей/теть)
-    cousins = []
-    for uncle_aunt in uncles_aunts:
-        for cousin in G.successors(uncle_aunt):
-            if cousin not in cousins:
-                cousins.append(cousin)
-    
-    if person_id in cousins:
-        person = next(m for m in members if m["id"] == person_id)
-        return "Двоюродный брат" if person["gender"] == "Мужской" else "Двоюродная сестра"
-    
-    # По умолчанию, если отношение не определено
-    return "Родственник"
+    return get_relation_to_person(store, georgy_id, person_id)
+
+def get_kinship_path(store, central_id, target_id):
+    """
+    Кратчайший путь родства от центра древа до выбранного человека.
+    
+    Returns:
+        tuple: ID членов семьи на пути (пустой, если человек не выбран или не связан с центром)
+    """
+    if target_id is None or target_id == central_id or target_id not in store:
+        return ()
+    return tuple(get_kinship_path_finder(store).shortest_path(central_id, target_id) or ())
+
+def show_kinship_path(store, central_id, target_id, path):
+    """Показывает под древом, как выбранный человек связан с центром"""
+    if target_id is None or target_id == central_id or target_id not in store:
+        return
+    if not path:
+        st.info(f"{store.get(target_id)['name']} не связан(а) с центром древа ни родственными, ни супружескими связями")
+        return
+    relation = get_relation_to_person(store, central_id, target_id)
+    st.info(f"**{relation}** ({len(path) - 1} шаг.): {get_kinship_path_finder(store).describe(path)}")
 
 # CSS для оформления интерфейса
 st.markdown("""
@@ -1000,100 +926,34 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Инициализация состояния приложения
-if 'force_reset' not in st.session_state:
-    # Сброс всех данных при запуске приложения
-    st.session_state.clear()
-    st.session_state.force_reset = True
-
-if 'members' not in st.session_state:
-    # Всегда загружаем структуру из предопределенного JSON
-    members = [
-        # Основные родители
-        {"id": 1, "name": "Мария Ивановна Богданова", "birth_year": 1980, "gender": "Женский"},
-        {"id": 2, "name": "Юрий Вячеславович Богданов", "birth_year": 1978, "gender": "Мужской"},
-        
-        # Дети основных родителей
-        {"id": 3, "name": "Георгий Юрьевич Богданов", "birth_year": 2005, "gender": "Мужской"},
-        {"id": 4, "name": "Ярослава Юрьевна Богданова", "birth_year": 2007, "gender": "Женский"},
-        
-        # Родители Марии
-        {"id": 5, "name": "Татьяна Сергеевна Шаньшерова", "birth_year": 1960, "gender": "Женский"},
-        {"id": 6, "name": "Иван Петрович Шаньшеров", "birth_year": 1958, "gender": "Мужской"},
-        
-        # Братья и сестры Татьяны
-        {"id": 7, "name": "Наталья Хомякова", "birth_year": 1962, "gender": "Женский"},
-        {"id": 8, "name": "Алексей Шишкин", "birth_year": 1964, "gender": "Мужской"},
-        
-        # Братья и сестры Ивана
-        {"id": 9, "name": "Леонид Шаньшеров", "birth_year": 1960, "gender": "Мужской"},
-        {"id": 10, "name": "Ольга Шаньшерова", "birth_year": 1962, "gender": "Женский"},
-        {"id": 11, "name": "Валентина Щербакова", "birth_year": 1964, "gender": "Женский"},
-        
-        # Сестра Марии и ее семья
-        {"id": 12, "name": "Наталья Ивановна Овчинникова", "birth_year": 1982, "gender": "Женский"},
-        {"id": 13, "name": "Андрей Овчинников", "birth_year": 1980, "gender": "Мужской"}, # Предполагаемый муж
-        {"id": 14, "name": "Ян Андреевич Овчинников", "birth_year": 2005, "gender": "Мужской"},
-        {"id": 15, "name": "Богдан Андреевич Овчинников", "birth_year": 2007, "gender": "Мужской"},
-        
-        # Родители Юрия
-        {"id": 16, "name": "Светлана Михайловна Жижина", "birth_year": 1956, "gender": "Женский"},
-        {"id": 17, "name": "Вячеслав Терентьевич Жижин", "birth_year": 1954, "gender": "Мужской"},
-        
-        # Братья и сестры Юрия
-        {"id": 18, "name": "Вячеслав Вячеславович Жижин", "birth_year": 1976, "gender": "Мужской"},
-        {"id": 19, "name": "Евгения Вячеславовна Жижина", "birth_year": 1980, "gender": "Женский"},
-        {"id": 20, "name": "Сергей", "birth_year": 1978, "gender": "Мужской"}, # Предполагаемый муж Евгении
-        
-        # Дети Евгении
-        {"id": 21, "name": "Полина Сергеева", "birth_year": 2006, "gender": "Женский"},
-        {"id": 22, "name": "София Сергеева", "birth_year": 2008, "gender": "Женский"},
-    ]
-
-    relationships = [
-        # Связи детей с родителями
-        {"parent_id": 1, "child_id": 3},  # Мария -> Георгий
-        {"parent_id": 1, "child_id": 4},  # Мария -> Ярослава
-        {"parent_id": 2, "child_id": 3},  # Юрий -> Георгий
-        {"parent_id": 2, "child_id": 4},  # Юрий -> Ярослава
-        
-        # Связи Марии с родителями
-        {"parent_id": 5, "child_id": 1},  # Татьяна -> Мария
-        {"parent_id": 6, "child_id": 1},  # Иван -> Мария
-        
-        # Связь сестры Марии с родителями
-        {"parent_id": 5, "child_id": 12},  # Татьяна -> Наталья Овчинникова (предположительно)
-        {"parent_id": 6, "child_id": 12},  # Иван -> Наталья Овчинникова
-        
-        # Связи детей Натальи Овчинниковой
-        {"parent_id": 12, "child_id": 14},  # Наталья -> Ян
-        {"parent_id": 12, "child_id": 15},  # Наталья -> Богдан
-        {"parent_id": 13, "child_id": 14},  # Андрей -> Ян
-        {"parent_id": 13, "child_id": 15},  # Андрей -> Богдан
-        
-        # Связи Юрия с родителями
-        {"parent_id": 16, "child_id": 2},  # Светлана -> Юрий
-        {"parent_id": 17, "child_id": 2},  # Вячеслав -> Юрий
-        
-        # Связи братьев/сестер Юрия с родителями
-        {"parent_id": 16, "child_id": 18},  # Светлана -> Вячеслав (сын)
-        {"parent_id": 17, "child_id": 18},  # Вячеслав -> Вячеслав (сын)
-        {"parent_id": 16, "child_id": 19},  # Светлана -> Евгения
-        {"parent_id": 17, "child_id": 19},  # Вячеслав -> Евгения
-        
-        # Связи детей Евгении
-        {"parent_id": 19, "child_id": 21},  # Евгения -> Полина
-        {"parent_id": 19, "child_id": 22},  # Евгения -> София
-        {"parent_id": 20, "child_id": 21},  # Сергей -> Полина
-        {"parent_id": 20, "child_id": 22},  # Сергей -> София
-    ]
+def seed_demo_data(store):
+    """
+    Добавляет в хранилище демонстрационное древо.
+    
+    Вызывается только по явному действию пользователя и только для пустого хранилища;
+    добавленные данные записываются на диск как обычные правки.
+    """
+    for member in DEMO_MEMBERS:
+        store.add_member(dict(member))
+    for rel in DEMO_RELATIONSHIPS:
+        store.add_parent_link(rel["parent_id"], rel["child_id"])
     
     # Сохраняем данные для дальнейшего использования
-    save_family_data(members, relationships)
+    save_family_data(store)
+
+@st.cache_resource(show_spinner=False)
+def get_shared_data():
+    """
+    Возвращает данные древа, общие для всех сессий процесса.
     
-    st.session_state.members = members
-    st.session_state.relationships = relationships
-    st.session_state.next_id = max([m["id"] for m in members]) + 1 if members else 1
+    Сессии хранят только ссылку на общий объект и свои настройки отображения.
+    Данные загружаются с диска при первом обращении; при открытии сессии
+    ничего не записывается.
+    """
+    return SharedFamilyData(load_family_data)
+
+# Инициализация состояния приложения
+if 'confirm_delete' not in st.session_state:
     st.session_state.confirm_delete = False
     st.session_state.member_to_delete = None
     st.session_state.show_validation_error = False
@@ -1126,6 +986,10 @@ st.markdown('</div>', unsafe_allow_html=True)
 # Выбранная вкладка
 current_tab = st.session_state.tab_key
 
+# Общие для всех сессий данные древа
+shared_data = get_shared_data()
+store = shared_data.store
+
 # Добавляем мобильные подсказки в зависимости от выбранной вкладки
 if current_tab == "tree":
     st.markdown('<div style="text-align: center; font-size: 0.8rem; margin-bottom: 10px; color: #666;">👉 Используйте два пальца для масштабирования</div>', unsafe_allow_html=True)
@@ -1149,7 +1013,12 @@ if current_tab == "settings":
     # Получаем текущие значения из state или устанавливаем значения по умолчанию
     current_zoom = st.session_state.get('zoom_level', 100)
     current_spacing = st.session_state.get('node_spacing', 3)
+    current_max_depth = st.session_state.get('max_depth', DEFAULT_MAX_DEPTH)
     current_scheme = st.session_state.get('color_scheme', "standard")
+    current_render_mode = st.session_state.get('render_mode', "auto")
+    current_webgl_threshold = st.session_state.get('webgl_threshold', DEFAULT_WEBGL_THRESHOLD)
+    current_detail_depth = st.session_state.get('detail_depth')
+    current_window = st.session_state.get('window', False)
     current_show_relations = st.session_state.get('show_relations', True)
     current_show_names = st.session_state.get('show_names', True)
     
@@ -1174,6 +1043,7 @@ if current_tab == "settings":
         
         zoom_level = st.slider("Масштаб", 50, 150, current_zoom, 5, format="%d%%")
         node_spacing = st.slider("Расстояние между узлами", 1, 5, current_spacing, 1)
+        max_depth = st.slider("Число кругов родства", 1, 8, current_max_depth, 1)
         
         col1, col2 = st.columns(2)
         with col1:
@@ -1193,6 +1063,16 @@ if current_tab == "settings":
                                 format_func=lambda x: {"standard": "Стандартная", 
                                                       "contrast": "Контрастная",
                                                       "monochrome": "Монохромная"}[x])
+        
+        render_mode = st.radio("Отрисовка", RENDER_MODES,
+                               index=RENDER_MODES.index(current_render_mode),
+                               horizontal=True,
+                               format_func=lambda x: RENDER_MODE_NAMES[x])
+        webgl_threshold = st.number_input("WebGL от числа узлов", 100, 100000, current_webgl_threshold, 100)
+        detail_depth = st.selectbox("Подробно до круга", DETAIL_DEPTHS,
+                                    index=DETAIL_DEPTHS.index(current_detail_depth),
+                                    format_func=format_detail_depth)
+        window = st.checkbox("Только ближайшие круги", current_window)
     else:
         # Для десктопов - двухколоночное расположение
         col1, col2 = st.columns(2)
@@ -1200,6 +1080,8 @@ if current_tab == "settings":
         with col1:
             zoom_level = st.slider("Масштаб по умолчанию", 50, 150, current_zoom, 5, format="%d%%")
             node_spacing = st.slider("Расстояние между узлами", 1, 5, current_spacing, 1)
+            max_depth = st.slider("Число кругов родства", 1, 8, current_max_depth, 1,
+                                  help="Родственники дальше этого круга размещаются на внешнем круге")
         
         with col2:
             show_names = st.checkbox("Показывать имена", current_show_names)
@@ -1211,6 +1093,25 @@ if current_tab == "settings":
                                 format_func=lambda x: {"standard": "Стандартная", 
                                                       "contrast": "Контрастная",
                                                       "monochrome": "Монохромная"}[x])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            render_mode = st.radio("Режим отрисовки", RENDER_MODES,
+                                   index=RENDER_MODES.index(current_render_mode),
+                                   horizontal=True,
+                                   format_func=lambda x: RENDER_MODE_NAMES[x],
+                                   help="WebGL сохраняет плавность масштабирования на больших древах")
+        with col2:
+            webgl_threshold = st.number_input("Порог WebGL (число узлов)", 100, 100000, current_webgl_threshold, 100,
+                                              help="В автоматическом режиме WebGL включается начиная с этого числа узлов")
+        
+        detail_depth = st.selectbox("Подробно до круга", DETAIL_DEPTHS,
+                                    index=DETAIL_DEPTHS.index(current_detail_depth),
+                                    format_func=format_detail_depth,
+                                    help="Родственники на более дальних кругах объединяются в группы по фамилиям")
+        window = st.checkbox("Показывать только ближайшие круги родства", current_window,
+                             help="Дальние родственники за пределами числа кругов не загружаются и не отображаются - "
+                                  "быстрее для больших древ")
     
     # Предпросмотр цветов схемы - адаптивный дизайн
     st.markdown('<h3 style="margin:20px 0 10px 0;">Предпросмотр</h3>', unsafe_allow_html=True)
@@ -1278,14 +1179,24 @@ if current_tab == "settings":
         with col4:
             st.markdown(f"<div style='background-color: {female_colors[1]}; height: 30px; border-radius: 5px;'></div>", unsafe_allow_html=True)
             st.caption("Женщина (1 круг)")
-    
+
+    # Счетчики кеша фигур для наблюдения за его эффективностью
+    figure_stats = get_figure_cache().stats()
+    st.caption(f"Кеш фигур древа: попаданий {figure_stats['hits']}, промахов {figure_stats['misses']}, "
+               f"фигур в кеше {figure_stats['size']}")
+
     # Кнопка сохранения - адаптивная на полный экран
     st.markdown('<div style="margin-top:25px;"></div>', unsafe_allow_html=True)
     save_button = st.button("Сохранить настройки", use_container_width=True, type="primary")
     if save_button:
         st.session_state.zoom_level = zoom_level
         st.session_state.node_spacing = node_spacing
+        st.session_state.max_depth = max_depth
         st.session_state.color_scheme = color_scheme
+        st.session_state.render_mode = render_mode
+        st.session_state.webgl_threshold = webgl_threshold
+        st.session_state.detail_depth = detail_depth
+        st.session_state.window = window
         st.session_state.show_relations = show_relations
         st.session_state.show_names = show_names
         
@@ -1298,179 +1209,232 @@ elif current_tab == "tree":
     # Вкладка 2: Древо
     st.header("Фамильное древо")
     
-    # Добавляем возможность выбрать центрального человека
-    if st.session_state.members:
-        # Проверяем размер экрана с помощью JavaScript
-        st.markdown("""
-        <script>
-            document.addEventListener('DOMContentLoaded', function() {
-                // Проверяем, насколько узок экран для адаптивной верстки
-                var isMobile = window.innerWidth <= 768;
+    # Все чтение хранилища и его индексов (выбор человека, путь родства, фигура) -
+    # под разделяемой блокировкой, чтобы правка другой сессии не шла одновременно
+    with shared_data.reading() as store:
+        has_members = len(store) > 0
+        # Добавляем возможность выбрать центрального человека
+        if has_members:
+            # Проверяем размер экрана с помощью JavaScript
+            st.markdown("""
+            <script>
+                document.addEventListener('DOMContentLoaded', function() {
+                    // Проверяем, насколько узок экран для адаптивной верстки
+                    var isMobile = window.innerWidth <= 768;
                 
-                if(isMobile) {
-                    // Если мобильный, скрываем неважные элементы
-                    document.querySelectorAll('.mobile-optional').forEach(function(el) {
-                        el.style.display = 'none';
-                    });
-                }
-            });
-        </script>
-        """, unsafe_allow_html=True)
+                    if(isMobile) {
+                        // Если мобильный, скрываем неважные элементы
+                        document.querySelectorAll('.mobile-optional').forEach(function(el) {
+                            el.style.display = 'none';
+                        });
+                    }
+                });
+            </script>
+            """, unsafe_allow_html=True)
         
-        # Определяем адаптивный макет в зависимости от устройства
-        is_mobile = False
-        try:
-            import user_agent
-            ua_string = st.session_state.get('user_agent', None)
-            if ua_string and user_agent.parse(ua_string).is_mobile:
-                is_mobile = True
-        except ImportError:
-            # Если библиотека user_agent не установлена, предполагаем настольный компьютер
-            pass
+            # Определяем адаптивный макет в зависимости от устройства
+            is_mobile = False
+            try:
+                import user_agent
+                ua_string = st.session_state.get('user_agent', None)
+                if ua_string and user_agent.parse(ua_string).is_mobile:
+                    is_mobile = True
+            except ImportError:
+                # Если библиотека user_agent не установлена, предполагаем настольный компьютер
+                pass
         
-        # На мобильных устройствах опции настройки под графиком
-        if is_mobile:
-            # Сначала отображаем график
-            # Создаем визуализацию древа с текущими настройками
-            central_person_id = st.session_state.get('central_person_id', 3)  # По умолчанию Георгий Богданов (ID=3)
-            show_names = st.session_state.get('show_names', True)
-            show_relations = st.session_state.get('show_relations', True)
-            color_scheme = st.session_state.get('color_scheme', "standard")
+            # На мобильных устройствах опции настройки под графиком
+            if is_mobile:
+                # Сначала отображаем график
+                # Создаем визуализацию древа с текущими настройками
+                central_person_id = st.session_state.get('central_person_id', 3)  # По умолчанию Георгий Богданов (ID=3)
+                if central_person_id not in store:
+                    central_person_id = next(iter(store))["id"]
+                show_names = st.session_state.get('show_names', True)
+                show_relations = st.session_state.get('show_relations', True)
+                color_scheme = st.session_state.get('color_scheme', "standard")
+                path_target_id = st.session_state.get('path_target_id')
             
-            fig = create_concentric_family_tree(
-                st.session_state.members, 
-                st.session_state.relationships,
-                central_person_id=central_person_id,
-                show_names=show_names,
-                show_relations=show_relations,
-                color_scheme=color_scheme
-            )
+                highlight_path = get_kinship_path(store, central_person_id, path_target_id)
+                fig = get_family_tree_figure(
+                    store,
+                    central_person_id=central_person_id,
+                    show_names=show_names,
+                    show_relations=show_relations,
+                    color_scheme=color_scheme,
+                    max_depth=st.session_state.get('max_depth', DEFAULT_MAX_DEPTH),
+                    render_mode=st.session_state.get('render_mode', "auto"),
+                    webgl_threshold=st.session_state.get('webgl_threshold', DEFAULT_WEBGL_THRESHOLD),
+                    detail_depth=st.session_state.get('detail_depth'),
+                    expanded_clusters=st.session_state.get('expanded_clusters', []),
+                    window=st.session_state.get('window', False),
+                    highlight_path=highlight_path
+                )
             
-            # Отображаем визуализацию
-            if fig:
-                st.plotly_chart(fig, use_container_width=True, config={
-                    "displayModeBar": True,
-                    "scrollZoom": True,
-                    "responsive": True,
-                    "modeBarButtonsToRemove": ["select2d", "lasso2d", "resetScale2d", "toggleSpikelines"]
-                })
+                # Отображаем визуализацию
+                if fig:
+                    event = st.plotly_chart(fig, use_container_width=True, key="tree_chart",
+                                            on_select="rerun", selection_mode="points", config={
+                        "displayModeBar": True,
+                        "scrollZoom": True,
+                        "responsive": True,
+                        "modeBarButtonsToRemove": ["select2d", "lasso2d", "resetScale2d", "toggleSpikelines"]
+                    })
+                    expand_selected_clusters(event)
+                    show_kinship_path(store, central_person_id, path_target_id, highlight_path)
             
-            # Затем под графиком отображаем компактные настройки
-            with st.expander("Настройки отображения", expanded=False):
-                # Компактный выбор центрального узла
-                central_person_idx = st.selectbox(
-                    "Центр древа",
-                    range(len(st.session_state.members)),
-                    format_func=lambda i: f"{st.session_state.members[i]['name']}",
-                    index=next((i for i, m in enumerate(st.session_state.members) if m["id"] == central_person_id), 0)
-                )
+                # Затем под графиком отображаем компактные настройки
+                with st.expander("Настройки отображения", expanded=False):
+                    # Компактный выбор центрального узла
+                    new_central_person_id = person_picker(store, "Центр древа", "central_person_mobile",
+                                                          selected_id=central_person_id)
+                    new_path_target_id = person_picker(store, "Путь родства до", "path_target_mobile",
+                                                       selected_id=path_target_id, allow_empty=True)
                 
-                # Опции отображения в одну строку
-                col1, col2 = st.columns(2)
-                with col1:
-                    show_names = st.checkbox("Имена", value=show_names)
-                with col2:
-                    show_relations = st.checkbox("Связи", value=show_relations)
+                    # Опции отображения в одну строку
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        show_names = st.checkbox("Имена", value=show_names)
+                    with col2:
+                        show_relations = st.checkbox("Связи", value=show_relations)
                 
-                # Цветовая схема
-                color_scheme = st.radio(
-                    "Цвета", 
-                    ["standard", "contrast", "monochrome"],
-                    index=["standard", "contrast", "monochrome"].index(color_scheme),
-                    format_func=lambda x: {"standard": "Стандарт", 
-                                          "contrast": "Контраст",
-                                          "monochrome": "Моно"}[x],
-                    horizontal=True
-                )
+                    # Цветовая схема
+                    color_scheme = st.radio(
+                        "Цвета", 
+                        ["standard", "contrast", "monochrome"],
+                        index=["standard", "contrast", "monochrome"].index(color_scheme),
+                        format_func=lambda x: {"standard": "Стандарт", 
+                                              "contrast": "Контраст",
+                                              "monochrome": "Моно"}[x],
+                        horizontal=True
+                    )
                 
-                # Кнопка применения настроек
-                if st.button("Применить", use_container_width=True):
-                    st.session_state.central_person_id = st.session_state.members[central_person_idx]["id"]
-                    st.session_state.show_names = show_names
-                    st.session_state.show_relations = show_relations
-                    st.session_state.color_scheme = color_scheme
-                    st.rerun()
-        else:
-            # На десктопе опции настройки справа от графика
-            col1, col2 = st.columns([3, 1])
+                    # Раскрытые группы дальних родственников можно свернуть обратно
+                    if st.session_state.get('expanded_clusters'):
+                        if st.button("Свернуть раскрытые группы", use_container_width=True):
+                            st.session_state.expanded_clusters = []
+                            st.rerun()
+                
+                    # Кнопка применения настроек
+                    if st.button("Применить", use_container_width=True):
+                        if new_central_person_id is not None:
+                            st.session_state.central_person_id = new_central_person_id
+                        st.session_state.path_target_id = new_path_target_id
+                        st.session_state.show_names = show_names
+                        st.session_state.show_relations = show_relations
+                        st.session_state.color_scheme = color_scheme
+                        st.rerun()
+            else:
+                # На десктопе опции настройки справа от графика
+                col1, col2 = st.columns([3, 1])
             
-            with col2:
-                st.subheader("Настройки древа")
-                # Выбор центрального узла
-                central_person_idx = st.selectbox(
-                    "Выберите центр древа",
-                    range(len(st.session_state.members)),
-                    format_func=lambda i: f"{st.session_state.members[i]['name']}",
-                    index=2  # По умолчанию Георгий Богданов (индекс 2)
-                )
+                with col2:
+                    st.subheader("Настройки древа")
+                    # Выбор центрального узла
+                    # По умолчанию Георгий Богданов (ID=3), если он есть в данных
+                    previous_central_id = st.session_state.get('central_person_id', 3)
+                    central_person_id = person_picker(store, "Выберите центр древа", "central_person",
+                                                      selected_id=previous_central_id)
+                    if central_person_id is None:
+                        # Поиск ничего не нашел - оставляем прежний центр
+                        st.info("По этому запросу никто не найден, показан прежний центр древа")
+                        central_person_id = previous_central_id if previous_central_id in store else next(iter(store))["id"]
                 
-                central_person_id = st.session_state.members[central_person_idx]["id"]
+                    # Опции отображения для быстрого переключения
+                    show_names = st.checkbox("Показать полные имена", value=st.session_state.get('show_names', True))
+                    show_relations = st.checkbox("Показать родственные связи", value=st.session_state.get('show_relations', True))
                 
-                # Опции отображения для быстрого переключения
-                show_names = st.checkbox("Показать полные имена", value=st.session_state.get('show_names', True))
-                show_relations = st.checkbox("Показать родственные связи", value=st.session_state.get('show_relations', True))
+                    # Выбор цветовой схемы
+                    color_scheme = st.selectbox(
+                        "Цветовая схема", 
+                        ["standard", "contrast", "monochrome"],
+                        index=["standard", "contrast", "monochrome"].index(st.session_state.get('color_scheme', "standard")),
+                        format_func=lambda x: {"standard": "Стандартная", 
+                                              "contrast": "Контрастная",
+                                              "monochrome": "Монохромная"}[x]
+                    )
                 
-                # Выбор цветовой схемы
-                color_scheme = st.selectbox(
-                    "Цветовая схема", 
-                    ["standard", "contrast", "monochrome"],
-                    index=["standard", "contrast", "monochrome"].index(st.session_state.get('color_scheme', "standard")),
-                    format_func=lambda x: {"standard": "Стандартная", 
-                                          "contrast": "Контрастная",
-                                          "monochrome": "Монохромная"}[x]
-                )
+                    # Второй человек, путь родства до которого выделяется на древе
+                    path_target_id = person_picker(store, "Показать путь родства до", "path_target",
+                                                   selected_id=st.session_state.get('path_target_id'), allow_empty=True)
                 
-                # Сохраняем текущие настройки
-                st.session_state.color_scheme = color_scheme
-                st.session_state.show_names = show_names
-                st.session_state.show_relations = show_relations
-                st.session_state.central_person_id = central_person_id
+                    # Сохраняем текущие настройки
+                    st.session_state.color_scheme = color_scheme
+                    st.session_state.show_names = show_names
+                    st.session_state.show_relations = show_relations
+                    st.session_state.central_person_id = central_person_id
+                    st.session_state.path_target_id = path_target_id
             
-            with col1:
-                # Создаем визуализацию древа
-                fig = create_concentric_family_tree(
-                    st.session_state.members, 
-                    st.session_state.relationships, 
-                    central_person_id=central_person_id,
-                    show_names=show_names,
-                    show_relations=show_relations,
-                    color_scheme=color_scheme
-                )
+                with col1:
+                    # Создаем визуализацию древа
+                    highlight_path = get_kinship_path(store, central_person_id, path_target_id)
+                    fig = get_family_tree_figure(
+                        store,
+                        central_person_id=central_person_id,
+                        show_names=show_names,
+                        show_relations=show_relations,
+                        color_scheme=color_scheme,
+                        max_depth=st.session_state.get('max_depth', DEFAULT_MAX_DEPTH),
+                        render_mode=st.session_state.get('render_mode', "auto"),
+                        webgl_threshold=st.session_state.get('webgl_threshold', DEFAULT_WEBGL_THRESHOLD),
+                        detail_depth=st.session_state.get('detail_depth'),
+                        expanded_clusters=st.session_state.get('expanded_clusters', []),
+                        window=st.session_state.get('window', False),
+                        highlight_path=highlight_path
+                    )
                 
-                # Отображаем визуализацию
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True, config={
-                        "displayModeBar": True,
-                        "scrollZoom": True
-                    })
+                    # Отображаем визуализацию
+                    if fig:
+                        event = st.plotly_chart(fig, use_container_width=True, key="tree_chart",
+                                                on_select="rerun", selection_mode="points", config={
+                            "displayModeBar": True,
+                            "scrollZoom": True
+                        })
+                        expand_selected_clusters(event)
+                        show_kinship_path(store, central_person_id, path_target_id, highlight_path)
                     
-                    # Объяснение условных обозначений
-                    with st.expander("Легенда и подсказки"):
-                        st.markdown("""
-                        ### Как читать фамильное древо:
+                        # Раскрытые группы дальних родственников можно свернуть обратно
+                        if st.session_state.get('expanded_clusters'):
+                            if st.button("Свернуть раскрытые группы"):
+                                st.session_state.expanded_clusters = []
+                                st.rerun()
+                    
+                        # Объяснение условных обозначений
+                        with st.expander("Легенда и подсказки"):
+                            st.markdown("""
+                            ### Как читать фамильное древо:
                         
-                        - **Центр древа**: выбранный вами человек
-                        - **Цвета узлов**: синий для мужчин, розовый для женщин
-                        - **Линии связи**:
-                            - **Сплошная линия**: родитель-ребенок
-                            - **Пунктирная линия**: супружеские отношения
+                            - **Центр древа**: выбранный вами человек
+                            - **Цвета узлов**: синий для мужчин, розовый для женщин
+                            - **Линии связи**:
+                                - **Сплошная линия**: родитель-ребенок
+                                - **Пунктирная линия**: супружеские отношения
+                                - **Желтая линия**: путь родства до человека, выбранного в настройках
                         
-                        **Концентрические круги**:
-                        1. **Первый круг**: сам центральный человек
-                        2. **Второй круг**: прямая семья (родители, супруг, дети)
-                        3. **Третий круг**: близкие родственники (бабушки/дедушки, братья/сестры)
-                        4. **Четвертый круг**: дальние родственники (дяди/тети, двоюродные братья/сестры)
+                            **Концентрические круги**:
+                            1. **Первый круг**: сам центральный человек
+                            2. **Второй круг**: прямая семья (родители, супруг, дети)
+                            3. **Третий круг**: близкие родственники (бабушки/дедушки, братья/сестры)
+                            4. **Четвертый круг**: дальние родственники (дяди/тети, племянники)
+                            5. **Следующие круги**: каждый следующий шаг родства (двоюродные братья/сестры и дальше); их число задается в настройках
                         
-                        #### Взаимодействие:
-                        - Наведите мышь на узел для отображения имени и родственной связи
-                        - Используйте колесико мыши для масштабирования
-                        - Перетаскивайте график для перемещения
-                        - Выберите другой центр древа в выпадающем меню справа
-                        """)
-                else:
-                    st.error("Не удалось создать визуализацию древа")
-    else:
+                            #### Взаимодействие:
+                            - Наведите мышь на узел для отображения имени и родственной связи
+                            - Используйте колесико мыши для масштабирования
+                            - Перетаскивайте график для перемещения
+                            - Выберите другой центр древа в выпадающем меню справа
+                            - Серые квадраты - группы дальних родственников по фамилиям (если в настройках ограничена детализация); нажмите на группу, чтобы раскрыть ее
+                            """)
+                    else:
+                        st.error("Не удалось создать визуализацию древа")
+    if not has_members:
         st.info("Добавьте членов семьи на вкладке 'Редактор', чтобы построить древо")
+        if st.button("Загрузить демонстрационное древо", key="init_demo"):
+            with shared_data.editing() as store:
+                # Другая сессия могла успеть добавить данные
+                if len(store) == 0:
+                    seed_demo_data(store)
+            st.rerun()
 
 elif current_tab == "editor":
     # Вкладка 3: Редактирование древа
@@ -1480,8 +1444,9 @@ elif current_tab == "editor":
     edit_tab1, edit_tab2 = st.tabs(["Добавить", "Редактировать"])
     
     with edit_tab1:
-        # Форма добавления в компактном виде для лучшей мобильной поддержки
-        with st.form(key='add_member_form'):
+        # Блок добавления в компактном виде для лучшей мобильной поддержки (не st.form:
+        # поиск родителей по имени обновляет список кандидатов при вводе)
+        with st.container(border=True):
             st.markdown('<h3 style="margin-top:0">Новый член семьи</h3>', unsafe_allow_html=True)
             
             new_name = st.text_input("Имя", placeholder="Введите полное имя")
@@ -1495,204 +1460,193 @@ elif current_tab == "editor":
             
             # Выбор родителей из существующих членов - компактное отображение
             st.subheader("Родители")
-            existing_members = [f"{m['name']} ({m['birth_year']})" for m in st.session_state.members]
-            existing_members.insert(0, "Не выбрано")
-            
             # Используем компактное горизонтальное расположение для мобильных
-            col1, col2 = st.columns(2)
-            with col1:
-                parent1_idx = st.selectbox("Родитель 1", range(len(existing_members)), 
-                                          format_func=lambda i: existing_members[i], key="parent1")
-            with col2:
-                parent2_idx = st.selectbox("Родитель 2", range(len(existing_members)), 
-                                          format_func=lambda i: existing_members[i], key="parent2")
+            # Списки выбора читают древо под блокировкой чтения; добавление - отдельно, под editing()
+            with shared_data.reading() as store:
+                col1, col2 = st.columns(2)
+                with col1:
+                    parent1_id = person_picker(store, "Родитель 1", "parent1", allow_empty=True)
+                with col2:
+                    parent2_id = person_picker(store, "Родитель 2", "parent2", allow_empty=True)
             
-            submit_button = st.form_submit_button(label="Добавить", use_container_width=True)
+            submit_button = st.button(label="Добавить", use_container_width=True, key="add_member")
             
-            # Обработка формы при добавлении нового члена семьи
+            # Добавление нового члена семьи
             if submit_button:
                 if not new_name or len(new_name.strip()) < 2:
                     st.error("Введите корректное имя (минимум 2 символа)")
                 else:
-                    # Проверяем уникальность имени
-                    if any(m["name"] == new_name and m["birth_year"] == new_birth_year for m in st.session_state.members):
-                        st.error(f"Член семьи с именем '{new_name}' и годом рождения {new_birth_year} уже существует")
-                    else:
-                        # Добавляем нового члена семьи
-                        new_member = {
-                            "id": st.session_state.next_id,
-                            "name": new_name,
-                            "birth_year": new_birth_year,
-                            "gender": new_gender
-                        }
+                    with shared_data.editing() as store:
+                        # Проверяем уникальность имени
+                        if store.find_member(new_name, new_birth_year):
+                            st.error(f"Член семьи с именем '{new_name}' и годом рождения {new_birth_year} уже существует")
+                        else:
+                            # Добавляем нового члена семьи
+                            new_member = {
+                                "id": store.next_id,
+                                "name": new_name,
+                                "birth_year": new_birth_year,
+                                "gender": new_gender
+                            }
                         
-                        valid_relationships = True
-                        error_message = ""
+                            valid_relationships = True
+                            error_message = ""
                         
-                        # Проверяем валидность родительских связей
-                        if parent1_idx != 0:  # "Не выбрано" имеет индекс 0
-                            parent1 = st.session_state.members[parent1_idx - 1]
-                            is_valid, message = check_relationship_validity(
-                                st.session_state.members + [new_member],
-                                parent1["id"], 
-                                new_member["id"]
-                            )
-                            if not is_valid:
-                                valid_relationships = False
-                                error_message = message
+                            # Проверяем валидность родительских связей
+                            if parent1_id is not None:  # None - "Не выбрано"
+                                is_valid, message = check_relationship_validity(
+                                    store,
+                                    parent1_id, 
+                                    new_member["id"],
+                                    new_member=new_member
+                                )
+                                if not is_valid:
+                                    valid_relationships = False
+                                    error_message = message
                         
-                        if valid_relationships and parent2_idx != 0:
-                            parent2 = st.session_state.members[parent2_idx - 1]
-                            is_valid, message = check_relationship_validity(
-                                st.session_state.members + [new_member],
-                                parent2["id"],
-                                new_member["id"]
-                            )
-                            if not is_valid:
-                                valid_relationships = False
-                                error_message = message
+                            if valid_relationships and parent2_id is not None:
+                                is_valid, message = check_relationship_validity(
+                                    store,
+                                    parent2_id,
+                                    new_member["id"],
+                                    new_member=new_member
+                                )
+                                if not is_valid:
+                                    valid_relationships = False
+                                    error_message = message
                         
-                        if not valid_relationships:
-                            st.error(error_message)
-                        else:
-                            st.session_state.members.append(new_member)
-                            st.session_state.next_id += 1
+                            if not valid_relationships:
+                                st.error(error_message)
+                            else:
+                                store.add_member(new_member)
                             
-                            # Добавляем связи с родителями
-                            if parent1_idx != 0:
-                                parent1 = st.session_state.members[parent1_idx - 1]
-                                st.session_state.relationships.append({
-                                    "parent_id": parent1["id"],
-                                    "child_id": new_member["id"]
-                                })
+                                # Добавляем связи с родителями
+                                if parent1_id is not None:
+                                    store.add_parent_link(parent1_id, new_member["id"])
                             
-                            if parent2_idx != 0:
-                                parent2 = st.session_state.members[parent2_idx - 1]
-                                st.session_state.relationships.append({
-                                    "parent_id": parent2["id"],
-                                    "child_id": new_member["id"]
-                                })
+                                if parent2_id is not None:
+                                    store.add_parent_link(parent2_id, new_member["id"])
                             
-                            # Сохраняем данные
-                            save_family_data(st.session_state.members, st.session_state.relationships)
+                                # Сохраняем данные
+                                save_family_data(store)
                             
-                            st.success(f"Добавлен новый член семьи: {new_name}")
-                            st.rerun()
+                                st.success(f"Добавлен новый член семьи: {new_name}")
+                                st.rerun()
     
     with edit_tab2:
         # Редактирование и удаление - адаптивный интерфейс
-        if st.session_state.members:
-            # Более компактный селектор для мобильных устройств
-            selected_member_idx = st.selectbox(
-                "Выберите члена семьи для редактирования:", 
-                range(len(st.session_state.members)), 
-                format_func=lambda i: f"{st.session_state.members[i]['name']} ({st.session_state.members[i]['birth_year']})"
-            )
+        member_to_delete = None
+        # Вкладка читает древо под блокировкой чтения. Удаление выполняется после выхода
+        # из блока: блокировка не реентерабельна, и editing() внутри reading() зависнет
+        with shared_data.reading() as store:
+            if len(store) > 0:
+                # Более компактный селектор для мобильных устройств
+                selected_member_id = person_picker(store, "Выберите члена семьи для редактирования", "edit_member")
             
-            member_info = st.session_state.members[selected_member_idx]
+                member_info = store.get(selected_member_id) if selected_member_id is not None else None
+                if member_info is None:
+                    st.info("По этому запросу никто не найден - уточните имя в поиске")
+                else:
             
-            # Создаем современную карточку для информации о члене семьи
-            gender_color = "#4361ee" if member_info['gender'] == "Мужской" else "#ff6b6b"
-            gender_icon = "♂️" if member_info['gender'] == "Мужской" else "♀️"
-            card_class = "modern-card-male" if member_info['gender'] == "Мужской" else "modern-card-female"
+                    # Создаем современную карточку для информации о члене семьи
+                    gender_color = "#4361ee" if member_info['gender'] == "Мужской" else "#ff6b6b"
+                    gender_icon = "♂️" if member_info['gender'] == "Мужской" else "♀️"
+                    card_class = "modern-card-male" if member_info['gender'] == "Мужской" else "modern-card-female"
+                    pedigree = get_pedigree_index(store)
             
-            st.markdown(f"""
-            <div class="modern-card {card_class}">
-                <h3 style="margin-top: 0; color: {gender_color};">{gender_icon} {member_info['name']}</h3>
-                <p><strong>Год рождения:</strong> {member_info['birth_year']}</p>
-                <p><strong>Пол:</strong> {member_info['gender']}</p>
-            </div>
-            """, unsafe_allow_html=True)
+                    st.markdown(f"""
+                    <div class="modern-card {card_class}">
+                        <h3 style="margin-top: 0; color: {gender_color};">{gender_icon} {member_info['name']}</h3>
+                        <p><strong>Год рождения:</strong> {member_info['birth_year']}</p>
+                        <p><strong>Пол:</strong> {member_info['gender']}</p>
+                        <p><strong>Предки:</strong> {format_generation_counts(pedigree.ancestor_counts(member_info['id']))}</p>
+                        <p><strong>Потомки:</strong> {format_generation_counts(pedigree.descendant_counts(member_info['id']))}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
             
-            # Вывод информации о родителях и детях в современных карточках
-            col1, col2 = st.columns(2)
-            with col1:
-                # Родители
-                parent_ids = [r["parent_id"] for r in st.session_state.relationships if r["child_id"] == member_info["id"]]
-                parents = [m for m in st.session_state.members if m["id"] in parent_ids]
+                    # Вывод информации о родителях и детях в современных карточках
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        # Родители
+                        parents = [store.get(parent_id) for parent_id in store.parents_of(member_info["id"]) if parent_id in store]
                 
-                st.markdown('<h4 style="margin-bottom:8px;">Родители:</h4>', unsafe_allow_html=True)
-                if parents:
-                    for parent in parents:
-                        gender_icon = "♂️" if parent['gender'] == "Мужской" else "♀️"
-                        parent_color = "#4361ee" if parent['gender'] == "Мужской" else "#ff6b6b"
-                        st.markdown(f"""
-                        <div style="padding:8px; border-left:3px solid {parent_color}; margin-bottom:5px; 
-                                    background-color:{parent_color}15; border-radius:5px;">
-                            {gender_icon} {parent['name']} ({parent['birth_year']})
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.markdown('<div style="color:#999; font-style:italic;">Родители не указаны</div>', unsafe_allow_html=True)
+                        st.markdown('<h4 style="margin-bottom:8px;">Родители:</h4>', unsafe_allow_html=True)
+                        if parents:
+                            for parent in parents:
+                                gender_icon = "♂️" if parent['gender'] == "Мужской" else "♀️"
+                                parent_color = "#4361ee" if parent['gender'] == "Мужской" else "#ff6b6b"
+                                st.markdown(f"""
+                                <div style="padding:8px; border-left:3px solid {parent_color}; margin-bottom:5px; 
+                                            background-color:{parent_color}15; border-radius:5px;">
+                                    {gender_icon} {parent['name']} ({parent['birth_year']})
+                                </div>
+                                """, unsafe_allow_html=True)
+                        else:
+                            st.markdown('<div style="color:#999; font-style:italic;">Родители не указаны</div>', unsafe_allow_html=True)
             
-            with col2:
-                # Дети
-                child_ids = [r["child_id"] for r in st.session_state.relationships if r["parent_id"] == member_info["id"]]
-                children = [m for m in st.session_state.members if m["id"] in child_ids]
+                    with col2:
+                        # Дети
+                        children = [store.get(child_id) for child_id in store.children_of(member_info["id"]) if child_id in store]
                 
-                st.markdown('<h4 style="margin-bottom:8px;">Дети:</h4>', unsafe_allow_html=True)
-                if children:
-                    for child in children:
-                        gender_icon = "♂️" if child['gender'] == "Мужской" else "♀️"
-                        child_color = "#4361ee" if child['gender'] == "Мужской" else "#ff6b6b"
-                        st.markdown(f"""
-                        <div style="padding:8px; border-left:3px solid {child_color}; margin-bottom:5px; 
-                                    background-color:{child_color}15; border-radius:5px;">
-                            {gender_icon} {child['name']} ({child['birth_year']})
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    st.markdown('<div style="color:#999; font-style:italic;">Дети не указаны</div>', unsafe_allow_html=True)
+                        st.markdown('<h4 style="margin-bottom:8px;">Дети:</h4>', unsafe_allow_html=True)
+                        if children:
+                            for child in children:
+                                gender_icon = "♂️" if child['gender'] == "Мужской" else "♀️"
+                                child_color = "#4361ee" if child['gender'] == "Мужской" else "#ff6b6b"
+                                st.markdown(f"""
+                                <div style="padding:8px; border-left:3px solid {child_color}; margin-bottom:5px; 
+                                            background-color:{child_color}15; border-radius:5px;">
+                                    {gender_icon} {child['name']} ({child['birth_year']})
+                                </div>
+                                """, unsafe_allow_html=True)
+                        else:
+                            st.markdown('<div style="color:#999; font-style:italic;">Дети не указаны</div>', unsafe_allow_html=True)
             
-            # Кнопки действий
-            st.markdown('<div style="margin-top: 20px;"></div>', unsafe_allow_html=True)
-            col1, col2 = st.columns(2)
+                    # Кнопки действий
+                    st.markdown('<div style="margin-top: 20px;"></div>', unsafe_allow_html=True)
+                    col1, col2 = st.columns(2)
             
-            with col1:
-                # Кнопка удаления с более заметным оформлением
-                if st.button("🗑️ Удалить", key=f"delete_{member_info['id']}", use_container_width=True):
-                    # Проверяем наличие связей
-                    child_ids = [r["child_id"] for r in st.session_state.relationships if r["parent_id"] == member_info["id"]]
-                    has_children = len(child_ids) > 0
+                    with col1:
+                        # Кнопка удаления с более заметным оформлением
+                        if st.button("🗑️ Удалить", key=f"delete_{member_info['id']}", use_container_width=True):
+                            # Проверяем наличие связей
+                            has_children = len(store.children_of(member_info["id"])) > 0
+                            has_parents = len(store.parents_of(member_info["id"])) > 0
                     
-                    parent_ids = [r["parent_id"] for r in st.session_state.relationships if r["child_id"] == member_info["id"]]
-                    has_parents = len(parent_ids) > 0
-                    
-                    if has_children or has_parents:
-                        st.warning(f"Вы уверены, что хотите удалить {member_info['name']}? Будут потеряны связи между родителями и детьми этого члена семьи.")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            if st.button("Да, удалить", key=f"confirm_{member_info['id']}", use_container_width=True):
-                                # Удаляем члена семьи и все связи с ним
-                                st.session_state.members.pop(selected_member_idx)
-                                st.session_state.relationships = [
-                                    r for r in st.session_state.relationships 
-                                    if r["parent_id"] != member_info["id"] and r["child_id"] != member_info["id"]
-                                ]
-                                save_family_data(st.session_state.members, st.session_state.relationships)
-                                st.success(f"Член семьи {member_info['name']} удален")
-                                st.rerun()
-                        with col2:
-                            if st.button("Отмена", use_container_width=True):
-                                st.rerun()
-                    else:
-                        # Удаляем члена семьи (нет связей)
-                        st.session_state.members.pop(selected_member_idx)
-                        save_family_data(st.session_state.members, st.session_state.relationships)
-                        st.success(f"Член семьи {member_info['name']} удален")
-                        st.rerun()
+                            if has_children or has_parents:
+                                st.warning(f"Вы уверены, что хотите удалить {member_info['name']}? Будут потеряны связи между родителями и детьми этого члена семьи.")
+                            
+                                col1, col2 = st.columns(2)
+                                with col1:
+                                    if st.button("Да, удалить", key=f"confirm_{member_info['id']}", use_container_width=True):
+                                        # Удаляем члена семьи и все связи с ним
+                                        member_to_delete = member_info
+                                with col2:
+                                    if st.button("Отмена", use_container_width=True):
+                                        st.rerun()
+                            else:
+                                # Удаляем члена семьи (нет связей)
+                                member_to_delete = member_info
             
-            with col2:
-                # Кнопка возврата к просмотру древа с новым центральным узлом
-                if st.button("🌳 Показать в древе", use_container_width=True):
-                    st.session_state.tab_key = "tree"
-                    st.session_state.central_person_id = member_info["id"]
-                    st.session_state.show_names = True
-                    st.session_state.show_relations = True
-                    st.rerun()
-        else:
-            st.info("Добавьте членов семьи на вкладке 'Добавить', чтобы редактировать их")
+                    with col2:
+                        # Кнопка возврата к просмотру древа с новым центральным узлом
+                        if st.button("🌳 Показать в древе", use_container_width=True):
+                            st.session_state.tab_key = "tree"
+                            st.session_state.central_person_id = member_info["id"]
+                            st.session_state.show_names = True
+                            st.session_state.show_relations = True
+                            st.rerun()
+            else:
+                st.info("Добавьте членов семьи на вкладке 'Добавить', чтобы редактировать их")
+
+        if member_to_delete is not None:
+            with shared_data.editing() as store:
+                # Другая сессия могла успеть удалить этого члена семьи
+                if member_to_delete["id"] in store:
+                    store.remove_member(member_to_delete["id"])
+                    save_family_data(store)
+            st.success(f"Член семьи {member_to_delete['name']} удален")
+            st.rerun()
 
 # Обработка выбора вкладки из URL
 try:
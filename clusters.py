@@ -0,0 +1,104 @@
+"""
+Уровни детализации концентрического древа: объединение дальних кругов в группы.
+
+Члены семьи на кругах дальше заданного отображаются не по отдельности, а
+группами по фамилии (одна группа на фамилию на каждом круге). Число групп на
+круге ограничено, поэтому размер фигуры не зависит от размера древа.
+Отдельные группы можно раскрыть - их члены снова отображаются по отдельности.
+"""
+
+from collections import OrderedDict
+
+# Максимальное число групп на одном круге; самые малочисленные фамилии объединяются в "прочие"
+MAX_CLUSTERS_PER_RING = 40
+
+# Фамилия группы, объединяющей малочисленные фамилии круга
+OTHER_SURNAMES = "*"
+
+# Женские окончания фамилий и соответствующие мужские: Богданова -> Богданов
+_FEMININE_ENDINGS = (
+    ("ская", "ский"),
+    ("цкая", "цкий"),
+    ("ова", "ов"),
+    ("ева", "ев"),
+    ("ёва", "ёв"),
+    ("ина", "ин"),
+    ("ына", "ын"),
+)
+
+
+def surname_key(name):
+    """
+    Возвращает фамилию для группировки: последнее слово имени в мужской форме.
+
+    Имена хранятся как "Имя Отчество Фамилия" или "Имя Фамилия", поэтому
+    фамилией считается последнее слово.
+    """
+    parts = name.split()
+    if not parts:
+        return ""
+    surname = parts[-1]
+    for feminine, masculine in _FEMININE_ENDINGS:
+        if surname.endswith(feminine) and len(surname) > len(feminine):
+            return surname[:-len(feminine)] + masculine
+    return surname
+
+
+def cluster_key(level, surname):
+    """Ключ группы: круг и фамилия, например "5:Богданов" """
+    return f"{level}:{surname}"
+
+
+def assign_clusters(names, levels, detail_depth, expanded=(), max_clusters=MAX_CLUSTERS_PER_RING):
+    """
+    Распределяет членов семьи дальних кругов по группам.
+
+    Args:
+        names: Имена членов семьи
+        levels: Номера кругов членов семьи (в том же порядке)
+        detail_depth: Последний круг, отображаемый подробно
+        expanded: Ключи раскрытых групп - их члены отображаются по отдельности
+        max_clusters: Максимальное число групп на одном круге
+
+    Returns:
+        tuple: (cluster_of, clusters), где cluster_of - список ключей групп по членам семьи
+            (None для отображаемых по отдельности), clusters - упорядоченный словарь
+            {ключ: {"level": круг, "surname": фамилия, "members": [индексы членов семьи]}}
+    """
+    expanded = set(expanded)
+
+    # Члены семьи дальних кругов по кругам и фамилиям
+    rings = {}
+    for index, (name, level) in enumerate(zip(names, levels)):
+        if level > detail_depth:
+            rings.setdefault(level, {}).setdefault(surname_key(name), []).append(index)
+
+    cluster_of = [None] * len(names)
+    clusters = OrderedDict()
+    for level in sorted(rings):
+        surnames = rings[level]
+        # Крупные фамилии получают свои группы, остальные объединяются в "прочие"
+        ordered = sorted(surnames, key=lambda surname: (-len(surnames[surname]), surname))
+        if len(ordered) > max_clusters:
+            others = [index for surname in ordered[max_clusters - 1:] for index in surnames[surname]]
+            groups = [(surname, surnames[surname]) for surname in ordered[:max_clusters - 1]]
+            groups.append((OTHER_SURNAMES, sorted(others)))
+        else:
+            groups = [(surname, surnames[surname]) for surname in ordered]
+
+        for surname, indices in groups:
+            key = cluster_key(level, surname)
+            if key in expanded:
+                continue
+            clusters[key] = {"level": level, "surname": surname, "members": indices}
+            for index in indices:
+                cluster_of[index] = key
+
+    return cluster_of, clusters
+
+
+def cluster_title(cluster):
+    """Название группы для подписи узла"""
+    if cluster["surname"] == OTHER_SURNAMES:
+        return "Прочие фамилии"
+    return cluster["surname"] or "Без фамилии"
@@ -0,0 +1,86 @@
+"""
+Демонстрационное древо: семья Богдановых и их родственники (22 человека).
+
+Загружается в приложение кнопкой "Загрузить демонстрационное древо" и
+используется в тестах.
+"""
+
+DEMO_MEMBERS = [
+    # Основные родители
+    {"id": 1, "name": "Мария Ивановна Богданова", "birth_year": 1980, "gender": "Женский"},
+    {"id": 2, "name": "Юрий Вячеславович Богданов", "birth_year": 1978, "gender": "Мужской"},
+
+    # Дети основных родителей
+    {"id": 3, "name": "Георгий Юрьевич Богданов", "birth_year": 2005, "gender": "Мужской"},
+    {"id": 4, "name": "Ярослава Юрьевна Богданова", "birth_year": 2007, "gender": "Женский"},
+
+    # Родители Марии
+    {"id": 5, "name": "Татьяна Сергеевна Шаньшерова", "birth_year": 1960, "gender": "Женский"},
+    {"id": 6, "name": "Иван Петрович Шаньшеров", "birth_year": 1958, "gender": "Мужской"},
+
+    # Братья и сестры Татьяны
+    {"id": 7, "name": "Наталья Хомякова", "birth_year": 1962, "gender": "Женский"},
+    {"id": 8, "name": "Алексей Шишкин", "birth_year": 1964, "gender": "Мужской"},
+
+    # Братья и сестры Ивана
+    {"id": 9, "name": "Леонид Шаньшеров", "birth_year": 1960, "gender": "Мужской"},
+    {"id": 10, "name": "Ольга Шаньшерова", "birth_year": 1962, "gender": "Женский"},
+    {"id": 11, "name": "Валентина Щербакова", "birth_year": 1964, "gender": "Женский"},
+
+    # Сестра Марии и ее семья
+    {"id": 12, "name": "Наталья Ивановна Овчинникова", "birth_year": 1982, "gender": "Женский"},
+    {"id": 13, "name": "Андрей Овчинников", "birth_year": 1980, "gender": "Мужской"}, # Предполагаемый муж
+    {"id": 14, "name": "Ян Андреевич Овчинников", "birth_year": 2005, "gender": "Мужской"},
+    {"id": 15, "name": "Богдан Андреевич Овчинников", "birth_year": 2007, "gender": "Мужской"},
+
+    # Родители Юрия
+    {"id": 16, "name": "Светлана Михайловна Жижина", "birth_year": 1956, "gender": "Женский"},
+    {"id": 17, "name": "Вячеслав Терентьевич Жижин", "birth_year": 1954, "gender": "Мужской"},
+
+    # Братья и сестры Юрия
+    {"id": 18, "name": "Вячеслав Вячеславович Жижин", "birth_year": 1976, "gender": "Мужской"},
+    {"id": 19, "name": "Евгения Вячеславовна Жижина", "birth_year": 1980, "gender": "Женский"},
+    {"id": 20, "name": "Сергей", "birth_year": 1978, "gender": "Мужской"}, # Предполагаемый муж Евгении
+
+    # Дети Евгении
+    {"id": 21, "name": "Полина Сергеева", "birth_year": 2006, "gender": "Женский"},
+    {"id": 22, "name": "София Сергеева", "birth_year": 2008, "gender": "Женский"},
+]
+
+DEMO_RELATIONSHIPS = [
+    # Связи детей с родителями
+    {"parent_id": 1, "child_id": 3},  # Мария -> Георгий
+    {"parent_id": 1, "child_id": 4},  # Мария -> Ярослава
+    {"parent_id": 2, "child_id": 3},  # Юрий -> Георгий
+    {"parent_id": 2, "child_id": 4},  # Юрий -> Ярослава
+
+    # Связи Марии с родителями
+    {"parent_id": 5, "child_id": 1},  # Татьяна -> Мария
+    {"parent_id": 6, "child_id": 1},  # Иван -> Мария
+
+    # Связь сестры Марии с родителями
+    {"parent_id": 5, "child_id": 12},  # Татьяна -> Наталья Овчинникова (предположительно)
+    {"parent_id": 6, "child_id": 12},  # Иван -> Наталья Овчинникова
+
+    # Связи детей Натальи Овчинниковой
+    {"parent_id": 12, "child_id": 14},  # Наталья -> Ян
+    {"parent_id": 12, "child_id": 15},  # Наталья -> Богдан
+    {"parent_id": 13, "child_id": 14},  # Андрей -> Ян
+    {"parent_id": 13, "child_id": 15},  # Андрей -> Богдан
+
+    # Связи Юрия с родителями
+    {"parent_id": 16, "child_id": 2},  # Светлана -> Юрий
+    {"parent_id": 17, "child_id": 2},  # Вячеслав -> Юрий
+
+    # Связи братьев/сестер Юрия с родителями
+    {"parent_id": 16, "child_id": 18},  # Светлана -> Вячеслав (сын)
+    {"parent_id": 17, "child_id": 18},  # Вячеслав -> Вячеслав (сын)
+    {"parent_id": 16, "child_id": 19},  # Светлана -> Евгения
+    {"parent_id": 17, "child_id": 19},  # Вячеслав -> Евгения
+
+    # Связи детей Евгении
+    {"parent_id": 19, "child_id": 21},  # Евгения -> Полина
+    {"parent_id": 19, "child_id": 22},  # Евгения -> София
+    {"parent_id": 20, "child_id": 21},  # Сергей -> Полина
+    {"parent_id": 20, "child_id": 22},  # Сергей -> София
+]
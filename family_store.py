@@ -0,0 +1,261 @@
+"""
+Индексированное хранилище данных фамильного древа.
+
+Заменяет пару списков словарей members/relationships структурой с хеш-индексами,
+чтобы поиск члена семьи выполнялся за O(1), а поиск родителей и детей - за O(степени узла).
+"""
+
+import hashlib
+import threading
+from collections import Counter
+
+
+class FamilyStore:
+    """
+    Хранилище членов семьи и родительских связей с индексами:
+        - id -> член семьи
+        - родитель -> дети
+        - ребенок -> родители
+        - (имя, год рождения) -> id
+        - супружеские пары (родители общих детей) со счетчиком общих детей
+        - член семьи -> супруги
+
+    Порядок членов семьи и связей совпадает с порядком добавления, поэтому
+    свойства members и relationships возвращают списки в том же виде,
+    в каком они хранятся в JSON-файлах.
+
+    Каждое изменение увеличивает счетчик revision и пересчитывает version -
+    хеш, зависящий от исходных данных и всей цепочки изменений. Одинаковые
+    данные дают одинаковую версию в любой сессии, поэтому version можно
+    использовать как ключ общих для процесса кешей.
+
+    Производные структуры (кеши графа, отношений и т.п.) подписываются на
+    изменения через subscribe и обновляются точечно, без полной перестройки.
+    Каждое изменение передается подписчику как listener(store, change, previous_version),
+    где change - кортеж (операция, данные):
+        - ("add_member", член семьи)
+        - ("add_parent_link", (parent_id, child_id))
+        - ("remove_parent_link", (parent_id, child_id))
+        - ("remove_member", член семьи) - после удаления всех его связей
+    """
+
+    def __init__(self, members=None, relationships=None):
+        self._members = {}
+        self._children = {}
+        self._parents = {}
+        self._relationships = {}
+        self._by_name_year = {}
+        self._max_id = 0
+        self._pair_counts = Counter()
+        self._spouses = {}
+        self._listeners = []
+        self._indexes = {}
+        # Индексы создаются и при чтении, когда хранилище читают несколько сессий
+        # одновременно; фабрика может сама запрашивать другие индексы, поэтому RLock
+        self._index_lock = threading.RLock()
+        self.revision = 0
+        self.version = ""
+
+        # Версия начальных данных считается одним хешем, а не цепочкой из N изменений
+        self._tracking = False
+        members = list(members or [])
+        relationships = list(relationships or [])
+        for member in members:
+            self.add_member(member)
+        for rel in relationships:
+            self.add_parent_link(rel["parent_id"], rel["child_id"])
+        self.version = self._digest(repr((members, relationships)))
+        self._tracking = True
+
+    # --- Чтение ---
+
+    @property
+    def members(self):
+        """Список членов семьи в порядке добавления"""
+        return list(self._members.values())
+
+    @property
+    def relationships(self):
+        """Список родительских связей в формате {"parent_id": ..., "child_id": ...}"""
+        return [{"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in self._relationships]
+
+    @property
+    def next_id(self):
+        """Следующий свободный ID для нового члена семьи"""
+        return self._max_id + 1
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, member_id):
+        return member_id in self._members
+
+    def __iter__(self):
+        return iter(self._members.values())
+
+    def ids(self):
+        """Возвращает ID всех членов семьи"""
+        return self._members.keys()
+
+    def get(self, member_id, default=None):
+        """Находит члена семьи по ID"""
+        return self._members.get(member_id, default)
+
+    def find_member(self, name, birth_year):
+        """Находит члена семьи по имени и году рождения"""
+        member_id = self._by_name_year.get((name, birth_year))
+        return self._members.get(member_id) if member_id is not None else None
+
+    def parents_of(self, member_id):
+        """Возвращает список ID родителей"""
+        return list(self._parents.get(member_id, ()))
+
+    def children_of(self, member_id):
+        """Возвращает список ID детей"""
+        return list(self._children.get(member_id, ()))
+
+    def has_parent_link(self, parent_id, child_id):
+        """Проверяет наличие родительской связи"""
+        return (parent_id, child_id) in self._relationships
+
+    def edges(self):
+        """Возвращает пары (parent_id, child_id) всех связей"""
+        return self._relationships.keys()
+
+    def marriage_pairs(self):
+        """Возвращает супружеские пары (id1, id2), id1 < id2, - родителей общих детей"""
+        return list(self._pair_counts)
+
+    def spouses_of(self, member_id):
+        """Возвращает список ID супругов (других родителей общих детей)"""
+        return list(self._spouses.get(member_id, ()))
+
+    def common_children_count(self, id1, id2):
+        """Возвращает число общих детей пары"""
+        return self._pair_counts.get(self._pair(id1, id2), 0)
+
+    # --- Производные индексы ---
+
+    def subscribe(self, listener):
+        """Подписывает обработчик на изменения данных"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Отменяет подписку обработчика"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def index(self, name, factory):
+        """
+        Возвращает производный индекс по имени, создавая его через factory(store)
+        при первом обращении. Индекс живет столько же, сколько хранилище.
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            with self._index_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = factory(self)
+        return index
+
+    # --- Изменение ---
+
+    def add_member(self, member):
+        """Добавляет члена семьи. ID должен быть уникальным."""
+        member_id = member["id"]
+        if member_id in self._members:
+            raise ValueError(f"Член семьи с ID={member_id} уже существует")
+
+        self._members[member_id] = member
+        self._by_name_year.setdefault((member["name"], member["birth_year"]), member_id)
+        self._max_id = max(self._max_id, member_id)
+        self._touch("add_member", member)
+        return member
+
+    def add_parent_link(self, parent_id, child_id):
+        """Добавляет родительскую связь. Повторное добавление игнорируется."""
+        key = (parent_id, child_id)
+        if key in self._relationships:
+            return False
+
+        self._relationships[key] = None
+        for other_parent_id in self._parents.get(child_id, ()):
+            self._link_spouses(parent_id, other_parent_id)
+
+        # Словари используются как упорядоченные множества
+        self._children.setdefault(parent_id, {})[child_id] = None
+        self._parents.setdefault(child_id, {})[parent_id] = None
+        self._touch("add_parent_link", key)
+        return True
+
+    def remove_parent_link(self, parent_id, child_id):
+        """Удаляет родительскую связь"""
+        key = (parent_id, child_id)
+        if key not in self._relationships:
+            return False
+
+        del self._relationships[key]
+        self._discard(self._children, parent_id, child_id)
+        self._discard(self._parents, child_id, parent_id)
+        for other_parent_id in self._parents.get(child_id, ()):
+            self._unlink_spouses(parent_id, other_parent_id)
+        self._touch("remove_parent_link", key)
+        return True
+
+    def remove_member(self, member_id):
+        """Удаляет члена семьи вместе со всеми его связями"""
+        member = self._members.pop(member_id, None)
+        if member is None:
+            return None
+
+        for child_id in self.children_of(member_id):
+            self.remove_parent_link(member_id, child_id)
+        for parent_id in self.parents_of(member_id):
+            self.remove_parent_link(parent_id, member_id)
+
+        name_key = (member["name"], member["birth_year"])
+        if self._by_name_year.get(name_key) == member_id:
+            del self._by_name_year[name_key]
+        self._touch("remove_member", member)
+        return member
+
+    def _touch(self, operation, payload):
+        if not self._tracking:
+            return
+        previous_version = self.version
+        change = (operation, payload)
+        self.revision += 1
+        self.version = self._digest(repr((previous_version, change)))
+        for listener in list(self._listeners):
+            listener(self, change, previous_version)
+
+    def _link_spouses(self, id1, id2):
+        pair = self._pair(id1, id2)
+        self._pair_counts[pair] += 1
+        if self._pair_counts[pair] == 1:
+            self._spouses.setdefault(id1, {})[id2] = None
+            self._spouses.setdefault(id2, {})[id1] = None
+
+    def _unlink_spouses(self, id1, id2):
+        pair = self._pair(id1, id2)
+        self._pair_counts[pair] -= 1
+        if self._pair_counts[pair] <= 0:
+            del self._pair_counts[pair]
+            self._discard(self._spouses, id1, id2)
+            self._discard(self._spouses, id2, id1)
+
+    @staticmethod
+    def _pair(id1, id2):
+        return (id1, id2) if id1 < id2 else (id2, id1)
+
+    @staticmethod
+    def _digest(text):
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _discard(index, key, value):
+        neighbours = index.get(key)
+        if neighbours is not None:
+            neighbours.pop(value, None)
+            if not neighbours:
+                del index[key]
@@ -0,0 +1,87 @@
+"""
+Общий для всех сессий кеш готовых фигур концентрического древа.
+
+Ключ фигуры - версия данных (FamilyStore.version), центральный человек и все
+параметры отображения. Перезапуск скрипта Streamlit без изменения данных и
+настроек (нажатие кнопки меню, раскрытие блока) возвращает уже построенную
+фигуру без повторного расчета раскладки и подписей.
+
+В кеше хранится не сам объект go.Figure, а его описание (figure.to_dict()):
+каждое обращение получает новую фигуру, поэтому правка фигуры в одной сессии
+(например, при передаче в st.plotly_chart) не меняет ее у других.
+"""
+
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+import streamlit as st
+
+_MISSING = object()
+
+
+class FigureCache:
+    """
+    LRU-кеш фигур plotly со счетчиками попаданий и промахов.
+
+    Хранит не более max_entries описаний фигур, вытесняя давно не использованные.
+    При попадании фигура заново создается из описания.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Возвращает фигуру по ключу, строя ее вызовом build() при промахе.
+
+        Args:
+            key: Хешируемый ключ (версия данных, центр, параметры отображения)
+            build: Функция без аргументов, строящая фигуру
+
+        Returns:
+            Новая фигура plotly или None, если build() вернула None
+        """
+        with self._lock:
+            cached = self._figures.get(key, _MISSING)
+            if cached is not _MISSING:
+                self._figures.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not _MISSING:
+            # Новая фигура из описания: сессии не делят один изменяемый объект
+            return go.Figure(cached) if cached is not None else None
+
+        figure = build()
+        cached = figure.to_dict() if figure is not None else None
+
+        with self._lock:
+            self._figures[key] = cached
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return figure
+
+    def stats(self):
+        """Возвращает словарь со счетчиками попаданий, промахов и размером кеша"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._figures)}
+
+    def clear(self):
+        """Удаляет все фигуры, не сбрасывая счетчики"""
+        with self._lock:
+            self._figures.clear()
+
+    def __len__(self):
+        return len(self._figures)
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    """Возвращает кеш фигур, общий для всех сессий процесса"""
+    return FigureCache()
@@ -0,0 +1,312 @@
+"""
+Потоковый импорт файлов GEDCOM из других программ генеалогии.
+
+Файл читается построчно: записи нулевого уровня (INDI, FAM) собираются по одной
+и сразу преобразуются, поэтому разбор не держит в памяти весь файл или его
+дерево разбора. Записи INDI становятся членами семьи, записи FAM - связями
+"родитель -> ребенок" (HUSB и WIFE с каждым CHIL).
+
+Проверка выполняется для всех связей сразу, а не по одной через
+check_relationship_validity: ссылки на отсутствующих людей, порядок годов
+рождения и число родителей проверяются векторно в NumPy, циклы - одной
+топологической сортировкой (reachability.find_cycle_edges). Ошибочные связи
+отбрасываются и попадают в отчет. Данные записываются одним пакетом: новым
+снимком (journal.write_store) или одной транзакцией SQLite.
+
+Люди без имени, года рождения или пола (SEX M/F) не импортируются и
+перечисляются в отчете.
+
+Использование (приложение должно быть остановлено или перезапущено после импорта):
+    python gedcom.py import tree.ged [data]
+    python gedcom.py import tree.ged --sqlite [data/family.db]
+    python gedcom.py bench [число людей]
+"""
+
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from journal import DATA_DIR, read_store, write_store
+from reachability import find_cycle_edges
+
+GENDERS = {"M": "Мужской", "F": "Женский"}
+
+# Сколько примеров каждой ошибки сохранять в отчете
+REPORT_EXAMPLES = 20
+
+_YEAR = re.compile(r"\b(\d{3,4})\b")
+
+
+def iter_records(lines):
+    """
+    Группирует строки GEDCOM в записи нулевого уровня.
+
+    Yields:
+        tuple: (тег, xref, [(уровень, тег, значение), ...]) для каждой записи
+    """
+    tag = xref = None
+    body = []
+    for line in lines:
+        parts = line.strip().split(" ", 2)
+        if len(parts) < 2:
+            continue
+        level = parts[0]
+        if level == "0":
+            if tag is not None:
+                yield tag, xref, body
+            if parts[1].startswith("@"):
+                xref = parts[1]
+                tag = parts[2].split(" ", 1)[0] if len(parts) > 2 else ""
+            else:
+                xref = None
+                tag = parts[1]
+            body = []
+        elif level.isdigit():
+            body.append((int(level), parts[1], parts[2] if len(parts) > 2 else ""))
+    if tag is not None:
+        yield tag, xref, body
+
+
+def parse_individual(body):
+    """Имя, год рождения и пол из записи INDI (None для отсутствующих значений)"""
+    name = birth_year = gender = None
+    context = None
+    for level, tag, value in body:
+        if level == 1:
+            context = tag
+            if tag == "NAME" and name is None:
+                # "Иван Петрович /Петров/" -> "Иван Петрович Петров"
+                name = " ".join(value.replace("/", " ").split()) or None
+            elif tag == "SEX":
+                gender = GENDERS.get(value.strip()[:1].upper())
+        elif level == 2 and context == "BIRT" and tag == "DATE" and birth_year is None:
+            match = _YEAR.search(value)
+            if match:
+                birth_year = int(match.group(1))
+    return name, birth_year, gender
+
+
+def parse_family(body):
+    """Родители (HUSB, WIFE) и дети (CHIL) из записи FAM"""
+    parents = []
+    children = []
+    for level, tag, value in body:
+        if level == 1:
+            if tag in ("HUSB", "WIFE"):
+                parents.append(value.strip())
+            elif tag == "CHIL":
+                children.append(value.strip())
+    return parents, children
+
+
+def read_gedcom(path, first_id=1):
+    """
+    Разбирает файл GEDCOM и проверяет связи.
+
+    Args:
+        path: Путь к файлу GEDCOM (UTF-8)
+        first_id: ID, который получит первый импортированный член семьи
+
+    Returns:
+        tuple: (members, relationships, report) - члены семьи и связи в формате
+            JSON-файлов и отчет о пропущенных людях и отброшенных связях
+    """
+    ids = {}
+    members = []
+    skipped = []
+    parent_refs = []
+    child_refs = []
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for tag, xref, body in iter_records(f):
+            if tag == "INDI":
+                name, birth_year, gender = parse_individual(body)
+                if name and birth_year is not None and gender:
+                    ids[xref] = first_id + len(members)
+                    members.append({"id": ids[xref], "name": name, "birth_year": birth_year, "gender": gender})
+                else:
+                    skipped.append(xref)
+            elif tag == "FAM":
+                parents, children = parse_family(body)
+                for child in children:
+                    for parent in parents:
+                        parent_refs.append(parent)
+                        child_refs.append(child)
+
+    relationships, report = validate_links(members, ids, parent_refs, child_refs, first_id)
+    report["skipped_members"] = {"count": len(skipped), "examples": skipped[:REPORT_EXAMPLES]}
+    return members, relationships, report
+
+
+def validate_links(members, ids, parent_refs, child_refs, first_id):
+    """
+    Проверяет все связи импорта сразу и отбрасывает ошибочные.
+
+    Проверки: ссылки на отсутствующих (или пропущенных) людей, повторы,
+    родитель не старше ребенка, больше двух родителей, циклы.
+
+    Returns:
+        tuple: (relationships, report)
+    """
+    report = {}
+    parents = np.fromiter((ids.get(ref, -1) for ref in parent_refs), dtype=np.int64, count=len(parent_refs))
+    children = np.fromiter((ids.get(ref, -1) for ref in child_refs), dtype=np.int64, count=len(child_refs))
+
+    dangling = (parents < 0) | (children < 0)
+    report["dangling"] = _report(
+        [(parent_refs[i], child_refs[i]) for i in np.flatnonzero(dangling)[:REPORT_EXAMPLES]],
+        int(dangling.sum()),
+    )
+    parents = parents[~dangling]
+    children = children[~dangling]
+
+    # Повторы (одна пара в нескольких семьях) - оставляем первое вхождение
+    if len(parents):
+        _, first = np.unique(np.stack([parents, children], axis=1), axis=0, return_index=True)
+        first.sort()
+        parents = parents[first]
+        children = children[first]
+
+    years = np.fromiter((member["birth_year"] for member in members), dtype=np.int64, count=len(members))
+    too_young = years[parents - first_id] >= years[children - first_id]
+    report["birth_order"] = _report(_pairs(parents[too_young], children[too_young]), int(too_young.sum()))
+    parents = parents[~too_young]
+    children = children[~too_young]
+
+    # Больше двух родителей (ребенок в нескольких семьях) - оставляем первых двух
+    order = np.argsort(children, kind="stable")
+    sorted_children = children[order]
+    starts = np.flatnonzero(np.r_[True, sorted_children[1:] != sorted_children[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    extra = np.zeros(len(order), dtype=bool)
+    extra[order[rank >= 2]] = True
+    report["extra_parents"] = _report(_pairs(parents[extra], children[extra]), int(extra.sum()))
+    parents = parents[~extra]
+    children = children[~extra]
+
+    edges = _pairs(parents, children)
+    cycles = set(find_cycle_edges(edges))
+    report["cycles"] = _report(sorted(cycles), len(cycles))
+    relationships = [
+        {"parent_id": parent_id, "child_id": child_id}
+        for parent_id, child_id in edges
+        if (parent_id, child_id) not in cycles
+    ]
+    return relationships, report
+
+
+def _pairs(parents, children):
+    return list(zip(parents.tolist(), children.tolist()))
+
+
+def _report(examples, count):
+    return {"count": count, "examples": [list(example) for example in examples[:REPORT_EXAMPLES]]}
+
+
+def import_gedcom(path, data_dir=DATA_DIR, db_path=None):
+    """
+    Импортирует файл GEDCOM, добавляя людей и связи к существующим данным.
+
+    Args:
+        path: Путь к файлу GEDCOM
+        data_dir: Каталог снимка и журнала (если db_path не задан)
+        db_path: Путь к базе SQLite; если задан, данные записываются в нее
+
+    Returns:
+        dict: Отчет импорта
+    """
+    if db_path is not None:
+        from sqlite_store import SQLiteBackend
+
+        backend = SQLiteBackend(db_path)
+        existing_members, existing_relationships = backend.members(), backend.relationships()
+    else:
+        store, _ = read_store(data_dir)
+        existing_members, existing_relationships = store.members, store.relationships
+
+    first_id = max((member["id"] for member in existing_members), default=0) + 1
+    members, relationships, report = read_gedcom(path, first_id)
+
+    if db_path is not None:
+        backend.replace_all(existing_members + members, existing_relationships + relationships)
+        backend.close()
+    else:
+        write_store(data_dir, existing_members + members, existing_relationships + relationships)
+
+    report["members"] = len(members)
+    report["relationships"] = len(relationships)
+    return report
+
+
+def write_sample_gedcom(path, count, seed=0, generation_size=500):
+    """
+    Записывает синтетический файл GEDCOM из count людей (для замеров).
+
+    Люди идут поколениями по generation_size человек; пары соседних людей
+    поколения - родители двух людей следующего поколения.
+    """
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("0 HEAD\n1 CHAR UTF-8\n")
+        previous = []
+        family = 0
+        for start in range(1, count + 1, generation_size):
+            generation = list(range(start, min(start + generation_size, count + 1)))
+            year = 1600 + 25 * (start // generation_size % 16)
+            if year == 1600:
+                previous = []  # начинаем новую ветвь, чтобы годы оставались правдоподобными
+            for person in generation:
+                f.write(f"0 @I{person}@ INDI\n1 NAME Имя{person} /Фамилия{person % 997}/\n")
+                f.write(f"1 SEX {'M' if person % 2 else 'F'}\n1 BIRT\n2 DATE {rnd.randint(1, 28)} JAN {year}\n")
+            for i in range(0, min(len(previous), len(generation)) - 1, 2):
+                family += 1
+                f.write(f"0 @F{family}@ FAM\n1 HUSB @I{previous[i]}@\n1 WIFE @I{previous[i + 1]}@\n")
+                f.write(f"1 CHIL @I{generation[i]}@\n1 CHIL @I{generation[i + 1]}@\n")
+            previous = generation
+        f.write("0 TRLR\n")
+
+
+def benchmark(count=100000):
+    """Замеряет скорость разбора, проверки и записи синтетического файла GEDCOM"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, "sample.ged")
+        write_sample_gedcom(path, count)
+
+        start = time.perf_counter()
+        members, relationships, _ = read_gedcom(path)
+        parsed = time.perf_counter()
+        write_store(os.path.join(work_dir, "data"), members, relationships)
+        written = time.perf_counter()
+    finally:
+        shutil.rmtree(work_dir)
+
+    return {
+        "members": len(members),
+        "relationships": len(relationships),
+        "parse_and_validate_s": round(parsed - start, 3),
+        "write_s": round(written - parsed, 3),
+        "members_per_s": round(len(members) / (written - start)),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        result = benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "import":
+        if len(sys.argv) > 3 and sys.argv[3] == "--sqlite":
+            from sqlite_store import DB_FILE
+
+            result = import_gedcom(sys.argv[2], db_path=sys.argv[4] if len(sys.argv) > 4 else DB_FILE)
+        else:
+            result = import_gedcom(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else DATA_DIR)
+    else:
+        print(__doc__)
+        sys.exit(1)
+    print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,305 @@
+"""
+Проверка целостности всего набора данных древа.
+
+check_relationship_validity в приложении проверяет одну добавляемую связь;
+этот модуль проверяет уже сохраненные данные целиком и сообщает обо всех
+нарушениях сразу:
+    - повторяющиеся ID и пары (имя, год рождения)
+    - связи с отсутствующими членами семьи, связи с самим собой, повторы связей
+    - больше двух родителей у ребенка
+    - родитель не старше ребенка
+    - циклы
+
+Данные читаются без построения FamilyStore (оно не допускает повторных ID
+и объединяет повторы связей): колонки бинарного снимка открываются через
+mmap, JSON и SQLite читаются в массивы NumPy, журнал изменений
+воспроизводится над колонками. Все проверки выполняются над массивами целиком, циклы -
+одной топологической сортировкой (алгоритм Кана по слоям), поэтому набор
+из миллиона связей проверяется за секунды.
+
+Использование:
+    python integrity.py [data]
+    python integrity.py --sqlite [data/family.db]
+Код завершения 1 означает, что найдены нарушения.
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from journal import (
+    DATA_DIR,
+    JOURNAL_FILE,
+    MEMBERS_FILE,
+    OLD_JOURNAL_FILE,
+    RELATIONSHIPS_FILE,
+    SNAPSHOT_FILE,
+    read_journal,
+)
+from reachability import find_cycle_edges
+from snapshot import ColumnarSnapshot
+
+
+def load_columns(data_dir=DATA_DIR):
+    """
+    Читает данные каталога в колонки.
+
+    Данные читаются из снимка или, если его нет, из JSON-файлов; если есть
+    журнал изменений, он воспроизводится поверх них (replay_journal).
+
+    Returns:
+        dict: ids, names, birth_years, parent_ids, child_ids
+    """
+    snapshot_file = os.path.join(data_dir, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_file):
+        snapshot = ColumnarSnapshot(snapshot_file)
+        columns = {
+            "ids": snapshot.ids,
+            "names": snapshot.names(),
+            "birth_years": snapshot.birth_years,
+            "parent_ids": snapshot.parent_ids,
+            "child_ids": snapshot.child_ids,
+        }
+    else:
+        members = []
+        relationships = []
+        for name, target in ((MEMBERS_FILE, members), (RELATIONSHIPS_FILE, relationships)):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    target.extend(json.load(f))
+        columns = _columns(members, relationships)
+
+    # Журнал, для которого снимок не успел записаться, воспроизводится первым
+    records = read_journal(os.path.join(data_dir, OLD_JOURNAL_FILE))
+    records += read_journal(os.path.join(data_dir, JOURNAL_FILE))
+    if records:
+        columns = replay_journal(columns, records)
+    return columns
+
+
+def replay_journal(columns, records):
+    """
+    Воспроизводит записи журнала над колонками.
+
+    Записи применяются так же, как journal.apply_record применяет их к
+    FamilyStore: добавление существующего члена семьи или связи пропускается,
+    удаление члена семьи удаляет и его связи. Но повторы, уже бывшие в данных,
+    сохраняются, чтобы проверка могла о них сообщить.
+
+    Returns:
+        dict: Новые колонки (ids, names, birth_years, parent_ids, child_ids)
+    """
+    ids = np.asarray(columns["ids"]).tolist()
+    names = list(columns["names"])
+    birth_years = np.asarray(columns["birth_years"]).tolist()
+    parents = np.asarray(columns["parent_ids"]).tolist()
+    children = np.asarray(columns["child_ids"]).tolist()
+    member_alive = [True] * len(ids)
+    link_alive = [True] * len(parents)
+
+    # Живые строки по ID и по связи, связи по концам - чтобы удаление не перебирало все колонки
+    member_rows = {}
+    for row, member_id in enumerate(ids):
+        member_rows.setdefault(member_id, []).append(row)
+    link_rows = {}
+    member_links = {}
+    for row, key in enumerate(zip(parents, children)):
+        link_rows.setdefault(key, []).append(row)
+        for member_id in key:
+            member_links.setdefault(member_id, set()).add(key)
+
+    for record in records:
+        operation = record["op"]
+        if operation == "add_member":
+            member = record["member"]
+            if member_rows.get(member["id"]):
+                continue
+            member_rows[member["id"]] = [len(ids)]
+            ids.append(member["id"])
+            names.append(member["name"])
+            birth_years.append(member["birth_year"])
+            member_alive.append(True)
+        elif operation == "remove_member":
+            rows = member_rows.pop(record["id"], ())
+            if not rows:
+                continue
+            for row in rows:
+                member_alive[row] = False
+            for key in member_links.pop(record["id"], ()):
+                for row in link_rows.pop(key, ()):
+                    link_alive[row] = False
+        elif operation == "add_parent_link":
+            key = (record["parent_id"], record["child_id"])
+            if link_rows.get(key):
+                continue
+            link_rows[key] = [len(parents)]
+            for member_id in key:
+                member_links.setdefault(member_id, set()).add(key)
+            parents.append(key[0])
+            children.append(key[1])
+            link_alive.append(True)
+        elif operation == "remove_parent_link":
+            for row in link_rows.pop((record["parent_id"], record["child_id"]), ()):
+                link_alive[row] = False
+        else:
+            raise ValueError(f"Неизвестная операция журнала: {operation}")
+
+    member_alive = np.array(member_alive, dtype=bool)
+    link_alive = np.array(link_alive, dtype=bool)
+    return {
+        "ids": np.array(ids, dtype=np.int64).reshape(-1)[member_alive],
+        "names": [name for name, alive in zip(names, member_alive) if alive],
+        "birth_years": np.array(birth_years, dtype=np.int64).reshape(-1)[member_alive],
+        "parent_ids": np.array(parents, dtype=np.int64).reshape(-1)[link_alive],
+        "child_ids": np.array(children, dtype=np.int64).reshape(-1)[link_alive],
+    }
+
+
+def load_sqlite_columns(path):
+    """Читает колонки из базы SQLite"""
+    from sqlite_store import connect
+
+    connection = connect(path)
+    members = connection.execute("SELECT id, name, birth_year FROM members ORDER BY position").fetchall()
+    links = connection.execute("SELECT parent_id, child_id FROM parent_links ORDER BY position").fetchall()
+    connection.close()
+    member_array = np.array([(member_id, year) for member_id, _, year in members], dtype=np.int64).reshape(-1, 2)
+    link_array = np.array(links, dtype=np.int64).reshape(-1, 2)
+    return {
+        "ids": member_array[:, 0],
+        "names": [name for _, name, _ in members],
+        "birth_years": member_array[:, 1],
+        "parent_ids": link_array[:, 0],
+        "child_ids": link_array[:, 1],
+    }
+
+
+def _columns(members, relationships):
+    return {
+        "ids": np.array([member["id"] for member in members], dtype=np.int64),
+        "names": [member["name"] for member in members],
+        "birth_years": np.array([member["birth_year"] for member in members], dtype=np.int64),
+        "parent_ids": np.array([rel["parent_id"] for rel in relationships], dtype=np.int64),
+        "child_ids": np.array([rel["child_id"] for rel in relationships], dtype=np.int64),
+    }
+
+
+def _pairs(parents, children):
+    return np.stack([parents, children], axis=1).tolist()
+
+
+def topological_remainder(node_count, sources, targets):
+    """
+    Топологическая сортировка (алгоритм Кана) по слоям над массивами индексов.
+
+    На каждом шаге все вершины без входящих связей снимаются разом, поэтому
+    число шагов равно числу поколений, а не числу вершин.
+
+    Returns:
+        numpy.ndarray: Маска вершин, оставшихся после сортировки (лежащих на циклах или ниже них)
+    """
+    in_degree = np.bincount(targets, minlength=node_count)
+    order = np.argsort(sources, kind="stable")
+    sorted_targets = targets[order]
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+
+    remaining = np.ones(node_count, dtype=bool)
+    frontier = np.flatnonzero(in_degree == 0)
+    while len(frontier):
+        remaining[frontier] = False
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        # Индексы всех исходящих связей слоя: диапазоны [start, start + count)
+        edge_index = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        children = sorted_targets[edge_index]
+        np.subtract.at(in_degree, children, 1)
+        frontier = np.unique(children[in_degree[children] == 0])
+    return remaining
+
+
+def check_integrity(columns):
+    """
+    Проверяет набор данных и возвращает все найденные нарушения.
+
+    Args:
+        columns: Словарь колонок (ids, names, birth_years, parent_ids, child_ids)
+
+    Returns:
+        dict: Нарушения по видам; пустые списки означают отсутствие нарушений
+    """
+    ids = np.asarray(columns["ids"], dtype=np.int64)
+    birth_years = np.asarray(columns["birth_years"], dtype=np.int64)
+    parents = np.asarray(columns["parent_ids"], dtype=np.int64)
+    children = np.asarray(columns["child_ids"], dtype=np.int64)
+    report = {"members": len(ids), "relationships": len(parents)}
+
+    unique_ids, first_index, id_counts = np.unique(ids, return_index=True, return_counts=True)
+    report["duplicate_ids"] = unique_ids[id_counts > 1].tolist()
+
+    frame = pd.DataFrame({"id": ids, "name": columns["names"], "birth_year": birth_years})
+    duplicates = frame[frame.duplicated(["name", "birth_year"], keep=False)]
+    report["duplicate_members"] = [
+        {"name": name, "birth_year": int(year), "ids": group.tolist()}
+        for (name, year), group in duplicates.groupby(["name", "birth_year"], sort=False)["id"]
+    ]
+
+    # Связи с отсутствующими членами семьи
+    orphan = ~np.isin(parents, unique_ids) | ~np.isin(children, unique_ids)
+    report["orphan_links"] = _pairs(parents[orphan], children[orphan])
+
+    self_link = ~orphan & (parents == children)
+    report["self_links"] = _pairs(parents[self_link], children[self_link])
+
+    # Связь кодируется одним числом по индексам членов семьи в отсортированном
+    # массиве ID (при повторах ID - первое вхождение), чтобы искать повторы одномерной сортировкой
+    valid = ~orphan & ~self_link
+    node_count = len(unique_ids)
+    keys = np.searchsorted(unique_ids, parents[valid]) * node_count + np.searchsorted(unique_ids, children[valid])
+    keys, key_counts = np.unique(keys, return_counts=True)
+    parent_index, child_index = np.divmod(keys, max(node_count, 1))
+    parents, children = unique_ids[parent_index], unique_ids[child_index]
+    duplicate = key_counts > 1
+    report["duplicate_links"] = _pairs(parents[duplicate], children[duplicate])
+
+    child_ids, parent_counts = np.unique(children, return_counts=True)
+    crowded = np.isin(children, child_ids[parent_counts > 2])
+    report["too_many_parents"] = [
+        {"child_id": int(child_id), "parent_ids": group.tolist()}
+        for child_id, group in pd.Series(parents[crowded]).groupby(children[crowded])
+    ]
+
+    years = birth_years[first_index]
+    not_older = years[parent_index] >= years[child_index]
+    report["parent_not_older"] = _pairs(parents[not_older], children[not_older])
+
+    remaining = topological_remainder(node_count, parent_index, child_index)
+    inside = remaining[parent_index] & remaining[child_index]
+    report["cycles"] = sorted(map(list, find_cycle_edges(_pairs(parents[inside], children[inside]))))
+    return report
+
+
+def has_violations(report):
+    """Проверяет, есть ли в отчете нарушения"""
+    return any(isinstance(value, list) and value for value in report.values())
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    if len(sys.argv) > 1 and sys.argv[1] == "--sqlite":
+        from sqlite_store import DB_FILE
+
+        result = check_integrity(load_sqlite_columns(sys.argv[2] if len(sys.argv) > 2 else DB_FILE))
+    elif len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print(__doc__)
+        sys.exit(0)
+    else:
+        result = check_integrity(load_columns(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR))
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(result, ensure_ascii=False))
+    sys.exit(1 if has_violations(result) else 0)
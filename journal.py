@@ -0,0 +1,308 @@
+"""
+Хранение данных фамильного древа: снимок + журнал изменений.
+
+Снимок - это колоночный бинарный файл data/family.snap (snapshot.py),
+который открывается через mmap без разбора JSON. Если его нет, читаются
+прежние файлы data/members.json и data/relationships.json. Каждое изменение FamilyStore дописывается одной строкой в data/journal.jsonl,
+поэтому сохранение правки стоит O(1) операций ввода-вывода вместо перезаписи
+всех данных. Сброс на диск (fsync) и запись снимков выполняются в фоновом
+потоке с объединением частых запросов; после заданного числа записей журнал
+сворачивается в новый снимок. Снимок записывается во временный файл и
+атомарно заменяет прежний (os.replace).
+
+При загрузке читается снимок и поверх него воспроизводится журнал.
+Воспроизведение идемпотентно, а оборванная последняя строка журнала
+(сбой во время записи) пропускается, поэтому данные остаются согласованными
+после аварийного завершения.
+"""
+
+import json
+import os
+import threading
+
+from family_store import FamilyStore
+from snapshot import read_snapshot, write_snapshot
+from writer import BackgroundWriter
+
+DATA_DIR = "data"
+MEMBERS_FILE = "members.json"
+RELATIONSHIPS_FILE = "relationships.json"
+SNAPSHOT_FILE = "family.snap"
+JOURNAL_FILE = "journal.jsonl"
+OLD_JOURNAL_FILE = "journal.jsonl.old"
+
+
+def write_json_atomic(path, data):
+    """Записывает JSON во временный файл и атомарно заменяет им целевой файл"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def change_record(change):
+    """Преобразует изменение FamilyStore в запись журнала"""
+    operation, payload = change
+    if operation == "add_member":
+        return {"op": operation, "member": payload}
+    if operation == "remove_member":
+        return {"op": operation, "id": payload["id"]}
+    parent_id, child_id = payload
+    return {"op": operation, "parent_id": parent_id, "child_id": child_id}
+
+
+def apply_record(store, record):
+    """Применяет запись журнала к хранилищу; повторное применение ничего не меняет"""
+    operation = record["op"]
+    if operation == "add_member":
+        if record["member"]["id"] not in store:
+            store.add_member(record["member"])
+    elif operation == "remove_member":
+        store.remove_member(record["id"])
+    elif operation == "add_parent_link":
+        store.add_parent_link(record["parent_id"], record["child_id"])
+    elif operation == "remove_parent_link":
+        store.remove_parent_link(record["parent_id"], record["child_id"])
+    else:
+        raise ValueError(f"Неизвестная операция журнала: {operation}")
+
+
+def read_journal(path):
+    """Читает записи журнала, останавливаясь на оборванной последней строке"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def read_store(data_dir=DATA_DIR):
+    """
+    Читает снимок и воспроизводит поверх него журнал, не подписываясь на изменения.
+
+    Returns:
+        tuple: (хранилище FamilyStore, список воспроизведенных записей журнала)
+    """
+    members = []
+    relationships = []
+    snapshot_file = os.path.join(data_dir, SNAPSHOT_FILE)
+    members_file = os.path.join(data_dir, MEMBERS_FILE)
+    relationships_file = os.path.join(data_dir, RELATIONSHIPS_FILE)
+    if os.path.exists(snapshot_file):
+        members, relationships = read_snapshot(snapshot_file)
+    else:
+        if os.path.exists(members_file):
+            with open(members_file, "r", encoding="utf-8") as f:
+                members = json.load(f)
+        if os.path.exists(relationships_file):
+            with open(relationships_file, "r", encoding="utf-8") as f:
+                relationships = json.load(f)
+
+    store = FamilyStore(members, relationships)
+    # Журнал, для которого снимок не успел записаться, воспроизводится первым
+    records = read_journal(os.path.join(data_dir, OLD_JOURNAL_FILE))
+    records += read_journal(os.path.join(data_dir, JOURNAL_FILE))
+    for record in records:
+        apply_record(store, record)
+    return store, records
+
+
+class FamilyJournal:
+    """
+    Журнал изменений одного хранилища.
+
+    Подписывается на изменения FamilyStore и дописывает их в файл журнала.
+    Сброс журнала на диск (fsync) и запись снимков выполняются в фоновом
+    потоке BackgroundWriter: частые запросы объединяются, а обработчик правки
+    не ждет диска. flush() дожидается завершения всей отложенной записи.
+
+    После compact_after записей журнал сворачивается в снимок. Текущий журнал
+    при этом переименовывается в journal.jsonl.old, и новые записи идут в
+    новый файл, поэтому снимок можно записывать в фоне, не теряя правок,
+    сделанных во время записи.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, compact_after=1000, writer=None):
+        self.data_dir = data_dir
+        self.compact_after = compact_after
+        self._writer = writer or BackgroundWriter()
+        self._store = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._records = 0  # записей в журнале после последнего снимка
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def load(self):
+        """Загружает снимок, воспроизводит журнал и подписывается на изменения хранилища"""
+        store, records = read_store(self.data_dir)
+        self._attach(store, len(records))
+        old_journal = self._path(OLD_JOURNAL_FILE)
+        if os.path.exists(old_journal) or not _journal_complete(self._path(JOURNAL_FILE), len(records)):
+            # Объединяем журналы и отбрасываем оборванный хвост, чтобы новые записи
+            # начинались с новой строки; целый журнал не перезаписывается
+            self._rewrite_journal(records)
+            _remove(old_journal)
+        return store
+
+    def attach(self, store):
+        """
+        Подписывается на изменения хранилища, данные которого еще не записаны на диск.
+        Текущее состояние записывается как снимок.
+        """
+        self._attach(store, 0)
+        self.snapshot()
+        return self
+
+    def _attach(self, store, records):
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._store = store
+        self._records = records
+        store.subscribe(self._on_change)
+
+    def _on_change(self, store, change, previous_version):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path(JOURNAL_FILE), "a", encoding="utf-8")
+            self._file.write(json.dumps(change_record(change), ensure_ascii=False) + "\n")
+            self._records += 1
+
+        if self._records >= self.compact_after:
+            self.snapshot()
+        else:
+            self.sync()
+
+    def sync(self):
+        """Ставит сброс журнала на диск в очередь фоновой записи"""
+        self._writer.submit(("sync", self.data_dir), self._sync_now)
+
+    def _sync_now(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def snapshot(self):
+        """
+        Ставит запись снимка текущего состояния в очередь фоновой записи.
+
+        Данные для снимка берутся сразу, журнал переименовывается: записи, сделанные
+        после этого момента, попадут в новый журнал и не будут потеряны.
+        """
+        old_journal = self._path(OLD_JOURNAL_FILE)
+        if os.path.exists(old_journal):
+            # Предыдущий снимок еще записывается - дожидаемся его, чтобы не потерять старый журнал
+            self.flush()
+
+        members = self._store.members
+        relationships = self._store.relationships
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            journal = self._path(JOURNAL_FILE)
+            if os.path.exists(journal):
+                if os.path.exists(old_journal):
+                    # Прошлый снимок не записался - дописываем журнал к старому, ничего не теряя
+                    with open(journal, "r", encoding="utf-8") as src, open(old_journal, "a", encoding="utf-8") as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(journal)
+                else:
+                    os.replace(journal, old_journal)
+            self._records = 0
+
+        self._writer.submit(("snapshot", self.data_dir), lambda: self._write_snapshot(members, relationships))
+
+    def _write_snapshot(self, members, relationships):
+        write_snapshot(self._path(SNAPSHOT_FILE), members, relationships)
+        _remove(self._path(OLD_JOURNAL_FILE))
+
+    def _rewrite_journal(self, records):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            tmp_path = self._path(JOURNAL_FILE) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(JOURNAL_FILE))
+
+    def flush(self, timeout=None):
+        """
+        Дожидается завершения отложенной записи (сброса журнала и снимков).
+
+        Returns:
+            bool: True, если вся запись завершена до истечения timeout
+        """
+        return self._writer.flush(timeout)
+
+    def close(self):
+        """Дописывает все на диск и закрывает файл журнала"""
+        self.sync()
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _journal_complete(path, record_count):
+    """Проверяет, что файл журнала состоит ровно из record_count целых строк"""
+    if not os.path.exists(path):
+        return record_count == 0
+    with open(path, "rb") as f:
+        data = f.read()
+    return data.count(b"\n") == record_count and data.endswith(b"\n") == bool(data)
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_store(data_dir, members, relationships):
+    """
+    Записывает данные целиком одним снимком и удаляет журналы (пакетная запись при импорте).
+
+    Приложение, уже загрузившее данные из data_dir, увидит их после перезапуска.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    write_snapshot(os.path.join(data_dir, SNAPSHOT_FILE), members, relationships)
+    clear_journal(data_dir)
+
+
+def clear_journal(data_dir=DATA_DIR):
+    """Удаляет журналы после записи снимка, уже содержащего все их изменения"""
+    _remove(os.path.join(data_dir, JOURNAL_FILE))
+    _remove(os.path.join(data_dir, OLD_JOURNAL_FILE))
+
+
+def load_store(data_dir=DATA_DIR):
+    """Загружает хранилище из снимка и журнала; изменения хранилища записываются в журнал"""
+    journal = FamilyJournal(data_dir)
+    store = journal.load()
+    store.index("journal", lambda _: journal)
+    return store
+
+
+def get_journal(store, data_dir=DATA_DIR):
+    """
+    Возвращает журнал хранилища. Если хранилище создано не из файлов,
+    его текущее состояние сначала записывается как снимок.
+    """
+    return store.index("journal", lambda s: FamilyJournal(data_dir).attach(s))
@@ -0,0 +1,256 @@
+"""
+Обобщенное определение степени родства между любыми двумя членами семьи.
+
+Родство описывается парой (up, down): сколько поколений нужно подняться от
+центрального человека до ближайшего общего предка и сколько затем спуститься
+до второго человека. Например, (1, 0) - родитель, (1, 1) - брат/сестра,
+(2, 2) - двоюродный брат/сестра, (3, 2) - троюродный дедушка/бабушка.
+
+В древе у человека два родителя, поэтому общий предок не единственный и
+классические структуры LCA для деревьев (эйлеров обход, двоичные подъемы)
+неприменимы. Вместо них для пары выполняется встречный обход вверх по
+поколениям от обоих людей: каждый раз раскрывается отстающая сторона, и обход
+останавливается, как только ни один еще не найденный общий предок не может
+дать более близкого родства. Число просмотренных людей ограничено предками
+обоих до глубины найденного родства, а не размером древа или полным
+замыканием предков, поэтому и при "схлопнутой" родословной (браки
+родственников) запрос о близком родстве просматривает десятки человек.
+"""
+
+import heapq
+
+from reachability import walk_up
+
+SELF_RELATION = "Это я"
+DEFAULT_RELATION = "Родственник"
+SPOUSE_LABELS = ("Муж", "Жена")
+
+# Основы прилагательных "двоюродный", "троюродный" и т.д. по степени родства
+_COLLATERAL_STEMS = {
+    2: "двоюродн",
+    3: "троюродн",
+    4: "четвероюродн",
+    5: "пятиюродн",
+    6: "шестиюродн",
+    7: "семиюродн",
+    8: "восьмиюродн",
+    9: "девятиюродн",
+    10: "десятиюродн",
+}
+
+# Приоритет отношений ближайшего окружения, если человек связан с центром несколькими путями
+_PRIORITY = {(1, 0): 0, (0, 1): 1, (1, 1): 2, (2, 0): 3, (2, 1): 4, (2, 2): 5, (1, 2): 6}
+
+
+def _adjective(stem, is_male):
+    return stem + ("ый" if is_male else "ая")
+
+
+def _collateral(degree, is_male):
+    """Прилагательное степени родства: "" для 1, "двоюродный" для 2 и т.д."""
+    if degree <= 1:
+        return ""
+    return _adjective(_COLLATERAL_STEMS[degree], is_male) + " "
+
+
+def _great(count):
+    """Приставка "пра" для прародителей и праправнуков"""
+    return "пра" * count
+
+
+def kinship_label(up, down, gender):
+    """
+    Строит название родства по числу поколений вверх и вниз от центрального человека.
+
+    Args:
+        up: Число поколений от центрального человека до общего предка
+        down: Число поколений от общего предка до второго человека
+        gender: Пол второго человека
+
+    Returns:
+        str: Название родства или None, если степень слишком дальняя для названия
+    """
+    is_male = gender == "Мужской"
+
+    if up == 0 and down == 0:
+        return SELF_RELATION
+
+    if down == 0:
+        # Прямые предки: отец, дедушка, прадедушка, прапрадедушка...
+        if up == 1:
+            label = "отец" if is_male else "мать"
+        else:
+            label = _great(up - 2) + ("дедушка" if is_male else "бабушка")
+    elif up == 0:
+        # Прямые потомки: сын, внук, правнук, праправнук...
+        if down == 1:
+            label = "сын" if is_male else "дочь"
+        else:
+            label = _great(down - 2) + ("внук" if is_male else "внучка")
+    elif up == down:
+        # Братья и сестры одного поколения: родные, двоюродные, троюродные...
+        if up not in _COLLATERAL_STEMS and up != 1:
+            return None
+        label = _collateral(up, is_male) + ("брат" if is_male else "сестра")
+    elif up > down:
+        # Старшее поколение: дядя, двоюродный дядя, двоюродный дедушка...
+        generations = up - down
+        if generations == 1:
+            degree = down
+            base = "дядя" if is_male else "тетя"
+        else:
+            degree = down + 1
+            base = _great(generations - 2) + ("дедушка" if is_male else "бабушка")
+        if degree > 1 and degree not in _COLLATERAL_STEMS:
+            return None
+        label = _collateral(degree, is_male) + base
+    else:
+        # Младшее поколение: племянник, внучатый племянник, двоюродный племянник...
+        generations = down - up
+        if up > 1 and up not in _COLLATERAL_STEMS:
+            return None
+        if generations == 1:
+            grand = ""
+        elif generations == 2:
+            grand = _adjective("внучат", is_male) + " "
+        else:
+            grand = _great(generations - 3) + _adjective("правнучат", is_male) + " "
+        label = _collateral(up, is_male) + grand + ("племянник" if is_male else "племянница")
+
+    return label[0].upper() + label[1:]
+
+
+def spouse_label(gender):
+    """Возвращает название супруга с учетом пола"""
+    male, female = SPOUSE_LABELS
+    return male if gender == "Мужской" else female
+
+
+def _rank(distances):
+    """Ключ выбора родства: сначала ближайшее окружение по приоритету, затем по общей дальности"""
+    up, down = distances
+    if distances in _PRIORITY:
+        return (0, _PRIORITY[distances], 0)
+    return (1, up + down, up)
+
+
+class KinshipEngine:
+    """
+    Определение родства для любой пары членов семьи.
+
+    Ничего не кеширует и читает только связи хранилища, поэтому отдельного
+    обновления при изменении данных не требует.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def distances(self, central_id, person_id):
+        """
+        Возвращает родство (up, down) второго человека относительно центрального
+        или None, если общих предков нет.
+        """
+        if central_id == person_id:
+            return (0, 0)
+
+        candidates = self._candidates(central_id, person_id)
+        if not candidates:
+            return None
+        return min(candidates, key=_rank)
+
+    def relation(self, central_id, person_id):
+        """Возвращает название отношения человека к центральному узлу"""
+        if central_id == person_id:
+            return SELF_RELATION
+
+        person = self._store.get(person_id)
+        if person is None:
+            return DEFAULT_RELATION
+
+        candidates = self._candidates(central_id, person_id)
+        # Родитель важнее супруга, супруг - важнее остальных кровных связей
+        if (1, 0) not in candidates and person_id in self._store.spouses_of(central_id):
+            return spouse_label(person["gender"])
+        if not candidates:
+            return DEFAULT_RELATION
+
+        up, down = min(candidates, key=_rank)
+        return kinship_label(up, down, person["gender"]) or DEFAULT_RELATION
+
+    def _candidates(self, central_id, person_id):
+        """
+        Пары (up, down) через общих предков, включая прямое родство, найденные
+        встречным обходом вверх; среди них всегда есть лучшая по _rank.
+        """
+        parents_of = self._store.parents_of
+        # Для каждой стороны: {id: число поколений вверх от ее начала}, фронт и глубина
+        reached = ({central_id: 0}, {person_id: 0})
+        frontiers = [[central_id], [person_id]]
+        depths = [0, 0]
+        candidates = set()
+        best = None
+        while frontiers[0] or frontiers[1]:
+            # Глубина, до которой обе стороны раскрыты полностью
+            explored = min(depths[side] if frontiers[side] else float("inf") for side in (0, 1))
+            # Ближайшее окружение (_PRIORITY) лежит не выше второго поколения с каждой стороны,
+            # а еще не найденные общие предки дают родство не ближе explored + 1 поколений
+            if explored >= 2 and (
+                any(pair in _PRIORITY for pair in candidates) or (best is not None and explored >= best)
+            ):
+                break
+            side = min((side for side in (0, 1) if frontiers[side]), key=lambda side: (depths[side], len(frontiers[side])))
+            own, other = reached[side], reached[1 - side]
+            depth = depths[side] + 1
+            next_frontier = []
+            for member_id in frontiers[side]:
+                for parent_id in parents_of(member_id):
+                    if parent_id in own:
+                        continue
+                    own[parent_id] = depth
+                    next_frontier.append(parent_id)
+                    if parent_id in other:
+                        pair = (depth, other[parent_id]) if side == 0 else (other[parent_id], depth)
+                        candidates.add(pair)
+                        best = sum(pair) if best is None else min(best, sum(pair))
+            frontiers[side] = next_frontier
+            depths[side] = depth
+        return candidates
+
+    def classify_all(self, central_id, touched=None):
+        """
+        Определяет родство всех кровных родственников центрального человека за один проход.
+
+        Выполняет многоисточниковый поиск от центрального человека и всех его предков
+        вниз по древу, выбирая для каждого человека пару (up, down) с наименьшей
+        суммой поколений.
+
+        Args:
+            central_id: ID центрального человека
+            touched: Необязательное множество, в которое добавляются ID членов семьи,
+                чьи связи были прочитаны
+
+        Returns:
+            dict: Словарь {id: (up, down)} для всех кровных родственников, включая центр
+        """
+        heap = [(0, 0, central_id)]
+        heap.extend((up, up, ancestor_id) for ancestor_id, up in walk_up(self._store, central_id).items())
+        heapq.heapify(heap)
+
+        found = {}
+        while heap:
+            total, up, member_id = heapq.heappop(heap)
+            if member_id in found:
+                continue
+            found[member_id] = (up, total - up)
+            for child_id in self._store.children_of(member_id):
+                if child_id not in found:
+                    heapq.heappush(heap, (total + 1, up, child_id))
+
+        if touched is not None:
+            touched.update(found)
+        return found
+
+
+def get_kinship_engine(store):
+    """Возвращает движок определения родства, привязанный к хранилищу"""
+    return store.index("kinship", KinshipEngine)
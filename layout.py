@@ -0,0 +1,165 @@
+"""
+Векторизованная раскладка концентрического древа на NumPy.
+
+Радиусы кругов, угловые позиции и координаты всех узлов, а также координаты
+линий связей вычисляются операциями над массивами, без циклов Python по узлам.
+"""
+
+import numpy as np
+
+# Начальные углы групп отношений на первых кругах
+START_ANGLES = {
+    1: {  # Прямая семья (родители - верхний полукруг, дети - нижний)
+        "parents": 45,      # Родители в верхней части
+        "children": 225,    # Дети в нижней части
+        "spouse": 135       # Супруги справа
+    },
+    2: {  # Расширенная семья
+        "grandparents": 30,  # Бабушки/дедушки вверху
+        "siblings": 100,     # Братья/сестры справа
+        "niblings": 260      # Племянники внизу-справа
+    }
+}
+
+# Минимальное число позиций на круге для предотвращения перекрытий
+MIN_SLOTS = 20
+
+# Единичная окружность с шагом в 1 градус для фоновых кругов
+_UNIT_CIRCLE_ANGLES = np.radians(np.arange(0, 361, dtype=float))
+_UNIT_CIRCLE_X = np.cos(_UNIT_CIRCLE_ANGLES)
+_UNIT_CIRCLE_Y = np.sin(_UNIT_CIRCLE_ANGLES)
+
+
+def radius_step_for(max_level):
+    """Расстояние между соседними кругами при радиусе внешнего круга 1"""
+    return 1.0 / max_level if max_level > 0 else 1.0
+
+
+def concentric_layout(levels, groups, start_angles=START_ANGLES, min_slots=MIN_SLOTS):
+    """
+    Вычисляет координаты узлов на концентрических кругах.
+
+    Узлы одного круга делятся на группы по типу отношения; каждая группа
+    начинается со своего угла и занимает подряд идущие позиции в порядке
+    следования узлов во входных массивах.
+
+    Args:
+        levels: Массив номеров кругов узлов (0 - центр)
+        groups: Массив названий групп отношений узлов
+        start_angles: Начальные углы групп {круг: {группа: угол}}
+        min_slots: Минимальное число позиций на круге
+
+    Returns:
+        tuple: (x, y, max_level) - массивы координат и номер внешнего круга
+    """
+    levels = np.asarray(levels, dtype=np.int64)
+    count = len(levels)
+    if count == 0:
+        return np.empty(0), np.empty(0), 0
+
+    group_names, group_codes = np.unique(np.asarray(groups, dtype=object).astype(str), return_inverse=True)
+    group_codes = group_codes.reshape(-1)
+    max_level = int(levels.max())
+
+    # Порядковый номер узла внутри своей пары (круг, группа) с сохранением исходного порядка
+    keys = levels * len(group_names) + group_codes
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    block_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    block_sizes = np.diff(np.r_[block_starts, count])
+    ranks = np.empty(count, dtype=np.int64)
+    ranks[order] = np.arange(count) - np.repeat(block_starts, block_sizes)
+
+    # Начальный угол для каждой пары (круг, группа), которых немного
+    block_keys = sorted_keys[block_starts]
+    block_angles = np.array([
+        start_angles.get(int(key // len(group_names)), {}).get(group_names[key % len(group_names)], 0)
+        for key in block_keys
+    ], dtype=float)
+    start = block_angles[np.searchsorted(block_keys, keys)]
+
+    # Шаг угла зависит от числа узлов на круге
+    level_sizes = np.bincount(levels)
+    angle_step = 360 / np.maximum(min_slots, level_sizes[levels])
+
+    angles = np.radians((start + ranks * angle_step) % 360)
+    radius = levels * radius_step_for(max_level)
+    return radius * np.cos(angles), radius * np.sin(angles), max_level
+
+
+def ring_coordinates(radius):
+    """Координаты фонового круга заданного радиуса (361 точка)"""
+    return radius * _UNIT_CIRCLE_X, radius * _UNIT_CIRCLE_Y
+
+
+def merged_ring_coordinates(radii):
+    """
+    Координаты нескольких фоновых кругов для одной линии plotly.
+
+    Круги разделяются значениями NaN, поэтому рисуются одной трассой.
+    """
+    radii = np.asarray(radii, dtype=float).reshape(-1, 1)
+    gap = np.full((len(radii), 1), np.nan)
+    xs = np.hstack((radii * _UNIT_CIRCLE_X, gap)).ravel()
+    ys = np.hstack((radii * _UNIT_CIRCLE_Y, gap)).ravel()
+    return xs, ys
+
+
+def index_edges(node_ids, edges):
+    """
+    Переводит пары ID в пары индексов узлов.
+
+    Args:
+        node_ids: Массив ID узлов в порядке раскладки
+        edges: Массив формы (E, 2) пар ID
+
+    Returns:
+        tuple: (source, target) - массивы индексов для связей, оба конца которых есть среди узлов
+    """
+    node_ids = np.asarray(node_ids)
+    edges = np.asarray(edges, dtype=node_ids.dtype if len(node_ids) else np.int64).reshape(-1, 2)
+    if len(node_ids) == 0 or len(edges) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    sorter = np.argsort(node_ids, kind="stable")
+    positions = np.searchsorted(node_ids, edges, sorter=sorter)
+    positions = np.minimum(positions, len(node_ids) - 1)
+    indices = sorter[positions]
+    found = (node_ids[indices] == edges).all(axis=1)
+    return indices[found, 0], indices[found, 1]
+
+
+def collapse_edges(source, target, node_of):
+    """
+    Переводит связи между членами семьи в связи между узлами фигуры.
+
+    Используется, когда несколько членов семьи представлены одним узлом (группой):
+    связи внутри узла отбрасываются, повторяющиеся связи между узлами объединяются.
+
+    Args:
+        source, target: Массивы индексов членов семьи
+        node_of: Массив номеров узлов для каждого члена семьи
+
+    Returns:
+        tuple: (source, target) - массивы индексов узлов без повторов
+    """
+    source, target = node_of[source], node_of[target]
+    keep = source != target
+    pairs = np.unique(np.column_stack((source[keep], target[keep])), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def segment_coordinates(x, y, source, target):
+    """
+    Строит координаты отрезков для одной линии plotly.
+
+    Отрезки разделяются значениями NaN, поэтому все связи рисуются одной трассой.
+
+    Returns:
+        tuple: (xs, ys) - массивы вида [x0, x1, NaN, x0, x1, NaN, ...]
+    """
+    gap = np.full(len(source), np.nan)
+    xs = np.column_stack((x[source], x[target], gap)).ravel()
+    ys = np.column_stack((y[source], y[target], gap)).ravel()
+    return xs, ys
@@ -0,0 +1,119 @@
+"""
+Уровни родства (номера концентрических кругов) относительно центрального человека.
+
+Уровень - это число шагов от центрального человека по связям родитель-ребенок
+и супружеским связям, то есть расстояние в неориентированном "графе родства".
+Уровни вычисляются одним обходом в ширину и кешируются для пары
+(версия данных, центр), общей для всех сессий.
+"""
+
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+# Максимальная глубина обхода по умолчанию: дальше все попадают на внешний круг
+DEFAULT_MAX_DEPTH = 4
+
+
+def kinship_neighbours(store, member_id):
+    """Соседи в неориентированном графе родства: родители, дети и супруги"""
+    yield from store.parents_of(member_id)
+    yield from store.children_of(member_id)
+    yield from store.spouses_of(member_id)
+
+
+def compute_relation_levels(store, central_ids, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Вычисляет уровни родства обходом в ширину от одного или нескольких центров.
+
+    Args:
+        store: Хранилище FamilyStore
+        central_ids: ID центрального человека или список ID (все получают уровень 0)
+        max_depth: Максимальный уровень; более дальние родственники не попадают в результат
+
+    Returns:
+        dict: Словарь {id: уровень}; пустой, если центр не задан (None)
+    """
+    if central_ids is None:
+        return {}
+    if isinstance(central_ids, int):
+        central_ids = [central_ids]
+
+    levels = {member_id: 0 for member_id in central_ids}
+    frontier = list(levels)
+    for level in range(1, max_depth + 1):
+        next_frontier = []
+        for member_id in frontier:
+            for neighbour_id in kinship_neighbours(store, member_id):
+                if neighbour_id not in levels:
+                    levels[neighbour_id] = level
+                    next_frontier.append(neighbour_id)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return levels
+
+
+def window_edges(store, levels):
+    """
+    Связи подграфа, индуцированного окном родства (результатом compute_relation_levels).
+
+    Читает только связи членов семьи из окна, поэтому время работы
+    пропорционально размеру окна, а не всего древа.
+
+    Returns:
+        tuple: (parent_edges, marriage_pairs) - списки пар (parent_id, child_id)
+            и супружеских пар (id1, id2), id1 < id2
+    """
+    parent_edges = []
+    marriage_pairs = []
+    for member_id in levels:
+        for child_id in store.children_of(member_id):
+            if child_id in levels:
+                parent_edges.append((member_id, child_id))
+        for spouse_id in store.spouses_of(member_id):
+            if member_id < spouse_id and spouse_id in levels:
+                marriage_pairs.append((member_id, spouse_id))
+    return parent_edges, marriage_pairs
+
+
+class LevelCache:
+    """
+    Кеш уровней родства с ключом (версия данных, центр, глубина).
+
+    Хранит не более max_entries результатов, вытесняя давно не использованные.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._levels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, store, central_id, max_depth=DEFAULT_MAX_DEPTH, compute=compute_relation_levels):
+        """
+        Возвращает уровни родства, вычисляя их при необходимости.
+
+        compute(store, central_id, max_depth) вычисляет уровни при промахе
+        (например, запросом к базе вместо обхода хранилища).
+        """
+        key = (store.version, central_id, max_depth)
+        with self._lock:
+            levels = self._levels.get(key)
+            if levels is not None:
+                self._levels.move_to_end(key)
+                return levels
+
+        levels = compute(store, central_id, max_depth)
+
+        with self._lock:
+            self._levels[key] = levels
+            while len(self._levels) > self.max_entries:
+                self._levels.popitem(last=False)
+        return levels
+
+
+@st.cache_resource(show_spinner=False)
+def get_level_cache():
+    """Возвращает кеш уровней родства, общий для всех сессий процесса"""
+    return LevelCache()
@@ -0,0 +1,230 @@
+"""
+Поисковый индекс имен членов семьи для выбора человека по первым буквам
+и с учетом опечаток.
+
+Имена разбиваются на слова и нормализуются: регистр не учитывается, "ё"
+приравнивается к "е". Для поиска по началу слова различные слова хранятся в
+отсортированном списке (аналог префиксного дерева, поиск - двоичный в
+диапазоне [префикс, префикс + "\\uffff")). Для нечеткого поиска по каждому
+слову строится набор триграмм, похожие слова находятся по доле общих триграмм.
+В коротком слове одна опечатка портит большую часть триграмм, поэтому слова
+запроса не длиннее SHORT_WORD букв дополнительно сравниваются с кандидатами
+по расстоянию редактирования: слово, отличающееся одной заменой, вставкой,
+удалением или перестановкой соседних букв ("юрй" - "юрий"), считается похожим.
+Запрос, набранный в латинской раскладке ("bdfy"), дополнительно ищется
+в русской ("иван").
+
+Индекс привязан к хранилищу и обновляется при добавлении и удалении членов
+семьи без полной перестройки.
+"""
+
+import bisect
+import heapq
+import re
+from collections import Counter
+
+# Минимальная доля общих триграмм, при которой слова считаются похожими
+MIN_SIMILARITY = 0.3
+
+# Сколько самых похожих слов учитывать для каждого слова запроса
+MAX_SIMILAR_WORDS = 50
+
+# Слова запроса не длиннее этого сравниваются с кандидатами и по расстоянию редактирования
+SHORT_WORD = 4
+
+# Сходство слова, отличающегося от короткого слова запроса одной правкой
+EDIT_SIMILARITY = 0.5
+
+_WORD = re.compile(r"[^\W_]+")
+_FOLD = str.maketrans({"ё": "е"})
+_LAYOUT = str.maketrans(
+    "qwertyuiop[]asdfghjkl;'zxcvbnm,.`",
+    "йцукенгшщзхъфывапролджэячсмитьбюё",
+)
+_LATIN = re.compile(r"[a-z\[\];',.`]")
+
+
+def name_words(text):
+    """Нормализованные слова имени: нижний регистр, "ё" заменена на "е" """
+    return _WORD.findall(text.casefold().translate(_FOLD))
+
+
+def trigrams(word):
+    """Триграммы слова с отступами по краям, чтобы начало слова весило больше"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _one_edit(a, b):
+    """Проверяет, что слова различаются не более чем одной заменой, вставкой, удалением или перестановкой соседних букв"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    a, b = a[start:], b[start:]
+    if len(a) == len(b):
+        return a[1:] == b[1:] or (a[2:] == b[2:] and a[:2] == b[1::-1])
+    return a[1:] == b or a == b[1:]
+
+
+class NameIndex:
+    """
+    Индекс имен хранилища FamilyStore.
+
+    search(query, limit) возвращает ID подходящих членов семьи: сначала тех,
+    у кого каждое слово запроса - начало одного из слов имени, затем похожих
+    с учетом опечаток.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._words = []            # отсортированный список различных слов
+        self._word_ids = {}         # слово -> {id: None}
+        self._word_trigrams = {}    # слово -> набор триграмм
+        self._postings = {}         # триграмма -> набор слов
+        self._member_words = {}     # id -> слова имени
+        for member in store:
+            self._add(member)
+        store.subscribe(self._on_change)
+
+    # --- Запросы ---
+
+    def search(self, query, limit=20):
+        """
+        Ищет членов семьи по имени.
+
+        Args:
+            query: Строка запроса (одно или несколько слов, можно начало слов)
+            limit: Максимальное число результатов
+
+        Returns:
+            list: ID найденных членов семьи, лучшие совпадения первыми
+        """
+        found = self._search(name_words(query), limit)
+        if len(found) < limit and _LATIN.search(query.casefold()):
+            seen = set(found)
+            for member_id in self._search(name_words(query.casefold().translate(_LAYOUT)), limit):
+                if member_id not in seen and len(found) < limit:
+                    found.append(member_id)
+        return found
+
+    def _search(self, words, limit):
+        if not words or limit <= 0:
+            return []
+        found = self.prefix_search(words, limit)
+        if len(found) < limit:
+            seen = set(found)
+            found += [member_id for member_id in self.fuzzy_search(words, limit + len(found))
+                      if member_id not in seen][:limit - len(found)]
+        return found
+
+    def prefix_search(self, words, limit):
+        """ID членов семьи, у которых каждое слово из words - начало какого-либо слова имени"""
+        # Перебираем членов семьи со словом, начинающимся с того слова запроса,
+        # которое дает меньше всего кандидатов; остальные проверяем по словам имени
+        pivot = pivot_words = fewest = None
+        for query_word in words:
+            start = bisect.bisect_left(self._words, query_word)
+            end = bisect.bisect_left(self._words, query_word + "\uffff")
+            count = 0
+            if len(words) > 1:
+                for word in self._words[start:end]:
+                    count += len(self._word_ids[word])
+                    if fewest is not None and count >= fewest:
+                        break
+            if fewest is None or count < fewest:
+                pivot, pivot_words, fewest = query_word, self._words[start:end], count
+        others = list(words)
+        others.remove(pivot)
+        found = {}
+        for word in pivot_words:
+            for member_id in self._word_ids[word]:
+                if member_id in found:
+                    continue
+                member_words = self._member_words[member_id]
+                if all(any(name_word.startswith(other) for name_word in member_words) for other in others):
+                    found[member_id] = None
+                    if len(found) >= limit:
+                        return list(found)
+        return list(found)
+
+    def fuzzy_search(self, words, limit):
+        """ID членов семьи с похожими словами имени, упорядоченные по убыванию сходства"""
+        similar = [found for found in map(self.similar_words, dict.fromkeys(words)) if found]
+        if not similar:
+            return []
+        # Кандидаты берутся по самому редкому слову запроса (частые имена вроде
+        # "Иван" дали бы десятки тысяч кандидатов), остальные слова проверяются по словам имени
+        rarest = min(similar, key=lambda found: sum(len(self._word_ids[word]) for word in found))
+        candidates = set()
+        for word in rarest:
+            candidates.update(self._word_ids[word])
+        scores = {
+            member_id: sum(
+                max(found.get(name_word, 0) for name_word in self._member_words[member_id])
+                for found in similar
+            )
+            for member_id in candidates
+        }
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+    def similar_words(self, query_word):
+        """Не более MAX_SIMILAR_WORDS самых похожих на query_word слов индекса: {слово: сходство}"""
+        query_trigrams = trigrams(query_word)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._postings.get(trigram, ()))
+        short = len(query_word) <= SHORT_WORD
+        similar = []
+        for word, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(self._word_trigrams[word]) - count)
+            if short and similarity < EDIT_SIMILARITY and _one_edit(query_word, word):
+                similarity = EDIT_SIMILARITY
+            if similarity >= MIN_SIMILARITY:
+                similar.append((similarity, word))
+        return {word: similarity for similarity, word in heapq.nlargest(MAX_SIMILAR_WORDS, similar)}
+
+    def __len__(self):
+        return len(self._member_words)
+
+    # --- Обновление ---
+
+    def _on_change(self, store, change, previous_version):
+        operation, payload = change
+        if operation == "add_member":
+            self._add(payload)
+        elif operation == "remove_member":
+            self._remove(payload["id"])
+
+    def _add(self, member):
+        words = tuple(dict.fromkeys(name_words(member["name"])))
+        self._member_words[member["id"]] = words
+        for word in words:
+            ids = self._word_ids.get(word)
+            if ids is None:
+                ids = self._word_ids[word] = {}
+                bisect.insort(self._words, word)
+                word_trigrams = self._word_trigrams[word] = trigrams(word)
+                for trigram in word_trigrams:
+                    self._postings.setdefault(trigram, set()).add(word)
+            ids[member["id"]] = None
+
+    def _remove(self, member_id):
+        for word in self._member_words.pop(member_id, ()):
+            ids = self._word_ids[word]
+            ids.pop(member_id, None)
+            if ids:
+                continue
+            del self._word_ids[word]
+            del self._words[bisect.bisect_left(self._words, word)]
+            for trigram in self._word_trigrams.pop(word):
+                postings = self._postings[trigram]
+                postings.discard(word)
+                if not postings:
+                    del self._postings[trigram]
+
+
+def get_name_index(store):
+    """Возвращает поисковый индекс имен, привязанный к хранилищу"""
+    return store.index("names", NameIndex)
@@ -0,0 +1,176 @@
+"""
+Запросы по родословной: предки и потомки члена семьи по поколениям.
+
+Обход идет по связям "родитель -> ребенок" в одну сторону (вверх к предкам
+или вниз к потомкам) слоями-поколениями и выполняется лениво: итератор
+раскрывает следующее поколение только тогда, когда до него дошло чтение,
+поэтому вопрос "первые три поколения предков" не обходит всю родословную.
+
+Раскрытые поколения запоминаются для пары (член семьи, направление): запрос
+на N поколений использует уже раскрытые поколения более раннего запроса и
+дополняет их, а запрос на меньшую глубину берет готовое начало. Если человек
+достижим несколькими путями (браки родственников), он учитывается один раз -
+в ближайшем поколении.
+
+Изменение связи сбрасывает только затронутые записи: для предков - записи, в
+обход которых попал ребенок связи, для потомков - записи, в обход которых
+попал родитель. Индекс привязан к хранилищу и обновляется по его изменениям.
+"""
+
+import threading
+from collections import OrderedDict
+
+UP = "up"
+DOWN = "down"
+
+
+class _Closure:
+    """Раскрытые поколения обхода от одного члена семьи в одну сторону"""
+
+    def __init__(self, member_id):
+        self.layers = []
+        self.seen = {member_id}
+        self.frontier = (member_id,)
+        self.complete = False
+        self.stale = False
+
+
+class PedigreeIndex:
+    """
+    Ленивые итераторы предков и потомков с запоминанием раскрытых поколений.
+
+    Хранит не более max_entries обходов, вытесняя давно не использованные.
+    Итератор, начатый до изменения данных, после изменения прерывается
+    с RuntimeError, как итерация по изменившемуся словарю.
+    """
+
+    def __init__(self, store, max_entries=256):
+        self._store = store
+        self.max_entries = max_entries
+        self._closures = OrderedDict()
+        self._lock = threading.Lock()
+        store.subscribe(self._on_change)
+
+    # --- Запросы ---
+
+    def ancestors(self, member_id, max_generations=None):
+        """
+        Предки члена семьи, ближайшие поколения первыми.
+
+        Yields:
+            tuple: (id предка, поколение): 1 - родители, 2 - бабушки и дедушки и т.д.
+        """
+        for generation, layer in self.generations(member_id, UP, max_generations):
+            for ancestor_id in layer:
+                yield ancestor_id, generation
+
+    def descendants(self, member_id, max_generations=None):
+        """
+        Потомки члена семьи, ближайшие поколения первыми.
+
+        Yields:
+            tuple: (id потомка, поколение): 1 - дети, 2 - внуки и т.д.
+        """
+        for generation, layer in self.generations(member_id, DOWN, max_generations):
+            for descendant_id in layer:
+                yield descendant_id, generation
+
+    def generations(self, member_id, direction, max_generations=None):
+        """
+        Поколения предков (direction=UP) или потомков (direction=DOWN).
+
+        Args:
+            member_id: ID члена семьи
+            direction: UP или DOWN
+            max_generations: Сколько поколений обойти (None - все)
+
+        Yields:
+            tuple: (номер поколения, кортеж ID членов семьи этого поколения)
+        """
+        closure = self._closure(member_id, direction)
+        generation = 0
+        while max_generations is None or generation < max_generations:
+            layer = self._layer(closure, direction, generation)
+            if layer is None:
+                return
+            generation += 1
+            yield generation, layer
+
+    def ancestor_counts(self, member_id, max_generations=None):
+        """Число предков в каждом поколении: [родителей, бабушек и дедушек, ...]"""
+        return [len(layer) for _, layer in self.generations(member_id, UP, max_generations)]
+
+    def descendant_counts(self, member_id, max_generations=None):
+        """Число потомков в каждом поколении: [детей, внуков, ...]"""
+        return [len(layer) for _, layer in self.generations(member_id, DOWN, max_generations)]
+
+    def __len__(self):
+        return len(self._closures)
+
+    # --- Раскрытие поколений ---
+
+    def _closure(self, member_id, direction):
+        key = (member_id, direction)
+        with self._lock:
+            closure = self._closures.get(key)
+            if closure is None:
+                closure = self._closures[key] = _Closure(member_id)
+                while len(self._closures) > self.max_entries:
+                    self._closures.popitem(last=False)
+            else:
+                self._closures.move_to_end(key)
+            return closure
+
+    def _layer(self, closure, direction, generation):
+        """Поколение с номером generation + 1 (раскрывается при первом обращении) или None"""
+        if closure.stale:
+            raise RuntimeError("Данные древа изменились во время обхода родословной")
+        if generation < len(closure.layers):
+            return closure.layers[generation]
+
+        with self._lock:
+            # Пока ждали блокировку, другой поток мог раскрыть это поколение
+            while len(closure.layers) <= generation and not closure.complete:
+                self._expand(closure, direction)
+            if generation < len(closure.layers):
+                return closure.layers[generation]
+            return None
+
+    def _expand(self, closure, direction):
+        neighbours = self._store.parents_of if direction == UP else self._store.children_of
+        seen = closure.seen
+        layer = []
+        for member_id in closure.frontier:
+            for neighbour_id in neighbours(member_id):
+                if neighbour_id not in seen:
+                    seen.add(neighbour_id)
+                    layer.append(neighbour_id)
+        if layer:
+            closure.layers.append(tuple(layer))
+            closure.frontier = closure.layers[-1]
+        else:
+            closure.complete = True
+            closure.frontier = ()
+
+    # --- Обновление ---
+
+    def _on_change(self, store, change, previous_version):
+        operation, payload = change
+        if operation in ("add_parent_link", "remove_parent_link"):
+            parent_id, child_id = payload
+            # Предки меняются у всех, в чей обход вверх попал ребенок,
+            # потомки - у всех, в чей обход вниз попал родитель
+            self._invalidate(lambda key, closure: (child_id if key[1] == UP else parent_id) in closure.seen)
+        elif operation == "remove_member":
+            member_id = payload["id"]
+            self._invalidate(lambda key, closure: key[0] == member_id)
+
+    def _invalidate(self, affected):
+        with self._lock:
+            for key in [key for key, closure in self._closures.items() if affected(key, closure)]:
+                self._closures.pop(key).stale = True
+
+
+def get_pedigree_index(store):
+    """Возвращает индекс родословной, привязанный к хранилищу"""
+    return store.index("pedigree", PedigreeIndex)
@@ -0,0 +1,413 @@
+"""
+Индекс достижимости (транзитивное замыкание по предкам) для проверки циклов.
+
+Предки каждого члена семьи хранятся битовым множеством - целым числом Python,
+в котором бит с номером позиции предка установлен. Позиции выдаются в
+топологическом порядке (предки раньше потомков), поэтому число у члена семьи
+занимает не больше битов, чем людей до него в этом порядке: даже при
+"схлопнутой" родословной (браки родственников, у всех общие предки) замыкание
+древа из N человек занимает не больше N² бит, а не словарь на каждую пару.
+Вопрос "является ли A предком B" - проверка одного бита.
+
+Число поколений до предка не хранится, а считается по запросу обходом вверх,
+ограниченным предками-потомками A. Индекс обновляется при изменениях
+FamilyStore без полной перестройки.
+
+Замер на родословной, где у каждого ребенка два случайных родителя из
+предыдущего поколения:
+    python reachability.py bench [число людей] [число поколений]
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from types import MappingProxyType
+
+import networkx as nx
+import numpy as np
+
+
+class AncestorIndex:
+    """
+    Транзитивное замыкание графа "родитель -> ребенок" по предкам в виде битовых множеств.
+
+    Построение выполняется лениво при первом обращении: одна топологическая
+    сортировка и по одному побитовому ИЛИ на каждую связь. Добавление связи
+    дописывает биты потомкам ребенка, останавливаясь на тех, у кого эти предки
+    уже есть; удаление пересчитывает потомков ребенка в топологическом порядке,
+    пропуская тех, у чьих родителей замыкание не изменилось. Если в данные
+    попал цикл или позиций удаленных людей накопилось слишком много, индекс
+    перестраивается при следующем запросе.
+
+    Построение и обновление выполняются под блокировкой, поэтому сессии,
+    одновременно читающие хранилище, строят индекс один раз и не видят его
+    недостроенным.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._bits = None       # id -> битовое множество предков
+        self._positions = None  # id -> номер бита
+        self._ids = None        # номер бита -> id
+        self._lock = threading.Lock()
+        store.subscribe(self._on_change)
+
+    # --- Запросы ---
+
+    def ancestors(self, member_id):
+        """Возвращает множество ID всех предков члена семьи"""
+        with self._lock:
+            bits = self._index().get(member_id, 0)
+            ids = self._ids
+        return frozenset(ids[position] for position in _bit_positions(bits))
+
+    def ancestor_distances(self, member_id):
+        """Возвращает словарь {id предка: число поколений по кратчайшему пути} только для чтения"""
+        return MappingProxyType(walk_up(self._store, member_id))
+
+    def generations(self, ancestor_id, descendant_id):
+        """Возвращает число поколений между предком и потомком или None, если это не предок"""
+        if not self.is_ancestor(ancestor_id, descendant_id):
+            return None
+        # Обход вверх только по людям, через которых проходит путь к предку
+        seen = {descendant_id}
+        frontier = [descendant_id]
+        generation = 0
+        while frontier:
+            generation += 1
+            next_frontier = []
+            for member_id in frontier:
+                for parent_id in self._store.parents_of(member_id):
+                    if parent_id == ancestor_id:
+                        return generation
+                    if parent_id not in seen and self.is_ancestor(ancestor_id, parent_id):
+                        seen.add(parent_id)
+                        next_frontier.append(parent_id)
+            frontier = next_frontier
+        return None
+
+    def is_ancestor(self, ancestor_id, descendant_id):
+        """Проверяет, является ли ancestor_id предком descendant_id"""
+        with self._lock:
+            bits = self._index().get(descendant_id, 0)
+            position = self._positions.get(ancestor_id)
+        return position is not None and bits >> position & 1 == 1
+
+    def would_create_cycle(self, parent_id, child_id):
+        """Проверяет, создаст ли связь parent_id -> child_id цикл в древе"""
+        return parent_id == child_id or self.is_ancestor(child_id, parent_id)
+
+    def memory_bytes(self):
+        """Размер битовых множеств в байтах (для замеров)"""
+        with self._lock:
+            return sum(sys.getsizeof(bits) for bits in self._index().values())
+
+    # --- Построение и обновление ---
+
+    def _index(self):
+        """Битовые множества предков; вызывается под блокировкой"""
+        if self._bits is None:
+            self._build()
+        return self._bits
+
+    def _build(self):
+        store = self._store
+        nodes = set(store.ids())
+        for parent_id, child_id in store.edges():
+            nodes.add(parent_id)
+            nodes.add(child_id)
+
+        order = _topological_order(store, nodes)
+        # Узлы, оставшиеся вне топологического порядка, лежат на циклах или ниже них
+        cyclic = nodes.difference(order)
+        self._ids = order + list(cyclic)
+        self._positions = {member_id: position for position, member_id in enumerate(self._ids)}
+        self._bits = {}
+        for member_id in order:
+            self._bits[member_id] = self._collect(member_id)
+        for member_id in cyclic:
+            bits = 0
+            for ancestor_id in walk_up(store, member_id):
+                bits |= 1 << self._positions[ancestor_id]
+            self._bits[member_id] = bits
+
+    def _collect(self, member_id):
+        """Предки члена семьи по уже посчитанным предкам его родителей"""
+        bits = 0
+        for parent_id in self._store.parents_of(member_id):
+            bits |= self._bits.get(parent_id, 0) | 1 << self._position(parent_id)
+        return bits
+
+    def _position(self, member_id):
+        position = self._positions.get(member_id)
+        if position is None:
+            position = self._positions[member_id] = len(self._ids)
+            self._ids.append(member_id)
+            self._bits.setdefault(member_id, 0)
+        return position
+
+    def _on_change(self, store, change, previous_version):
+        with self._lock:
+            self._apply_change(store, change)
+
+    def _apply_change(self, store, change):
+        if self._bits is None:
+            return
+
+        operation, payload = change
+        if operation == "add_member":
+            self._position(payload["id"])
+        elif operation == "remove_member":
+            # Связи удаленного уже удалены, его бит ни у кого не установлен;
+            # позиция не переиспользуется, а при большом числе пропусков индекс перестраивается
+            self._bits.pop(payload["id"], None)
+            if len(self._ids) > 2 * len(self._bits) + 64:
+                self._bits = None
+        elif operation == "add_parent_link":
+            parent_id, child_id = payload
+            parent_bits = self._bits.get(parent_id, 0)
+            if child_id == parent_id or (child_id in self._positions and parent_bits >> self._positions[child_id] & 1):
+                # Связь образовала цикл - замыкание будет перестроено при следующем запросе
+                self._bits = None
+                return
+            added = parent_bits | 1 << self._position(parent_id)
+            # Если у потомка эти предки уже есть, они есть и у всех его потомков
+            seen = {child_id}
+            queue = deque([child_id])
+            while queue:
+                member_id = queue.popleft()
+                bits = self._bits.get(member_id, 0)
+                if bits | added == bits:
+                    continue
+                self._position(member_id)
+                self._bits[member_id] = bits | added
+                for grandchild_id in store.children_of(member_id):
+                    if grandchild_id not in seen:
+                        seen.add(grandchild_id)
+                        queue.append(grandchild_id)
+        elif operation == "remove_parent_link":
+            self._recompute_below(payload[1])
+
+    def _recompute_below(self, member_id):
+        """Пересчитывает предков member_id и тех его потомков, у чьих родителей они изменились"""
+        affected = {node_id for node_id, _ in _descendants(self._store, member_id, include_self=True)}
+        order = _topological_order(self._store, affected)
+        if len(order) < len(affected):
+            self._bits = None
+            return
+        changed = set()
+        for node_id in order:
+            if node_id != member_id and changed.isdisjoint(self._store.parents_of(node_id)):
+                continue
+            bits = self._collect(node_id)
+            if bits != self._bits.get(node_id):
+                self._bits[node_id] = bits
+                changed.add(node_id)
+
+
+def _bit_positions(bits):
+    """Номера установленных битов целого числа"""
+    if not bits:
+        return []
+    data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little")).tolist()
+
+
+def _descendants(store, member_id, include_self=False):
+    """Обход потомков в ширину без рекурсии, возвращает пары (id, число поколений)"""
+    seen = {member_id}
+    queue = deque([(member_id, 0)])
+    if include_self:
+        yield member_id, 0
+    while queue:
+        node_id, depth = queue.popleft()
+        for child_id in store.children_of(node_id):
+            if child_id not in seen:
+                seen.add(child_id)
+                queue.append((child_id, depth + 1))
+                yield child_id, depth + 1
+
+
+def walk_up(store, member_id):
+    """Собирает всех предков обходом вверх без рекурсии: {id предка: число поколений}"""
+    found = {}
+    queue = deque((parent_id, 1) for parent_id in store.parents_of(member_id))
+    while queue:
+        parent_id, distance = queue.popleft()
+        if parent_id not in found:
+            found[parent_id] = distance
+            queue.extend((grandparent_id, distance + 1) for grandparent_id in store.parents_of(parent_id))
+    return found
+
+
+def _topological_order(store, nodes):
+    """
+    Топологическая сортировка (алгоритм Кана) подграфа на узлах nodes.
+    Узлы, лежащие на циклах или ниже них, в результат не попадают.
+    """
+    in_degree = {node_id: 0 for node_id in nodes}
+    for node_id in nodes:
+        for child_id in store.children_of(node_id):
+            if child_id in in_degree:
+                in_degree[child_id] += 1
+
+    queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        node_id = queue.popleft()
+        order.append(node_id)
+        for child_id in store.children_of(node_id):
+            if child_id in in_degree:
+                in_degree[child_id] -= 1
+                if in_degree[child_id] == 0:
+                    queue.append(child_id)
+    return order
+
+
+def find_cycle_edges(edges):
+    """
+    Пакетная проверка списка связей на циклы.
+
+    Выполняет одну топологическую сортировку всего списка и возвращает связи,
+    лежащие на циклах. Подходит для проверки импортируемых данных целиком,
+    без проверки каждой связи по отдельности.
+
+    Args:
+        edges: Итерируемый набор пар (parent_id, child_id)
+
+    Returns:
+        list: Связи (parent_id, child_id), входящие в циклы
+    """
+    children = {}
+    in_degree = {}
+    for parent_id, child_id in edges:
+        children.setdefault(parent_id, []).append(child_id)
+        in_degree.setdefault(parent_id, 0)
+        in_degree[child_id] = in_degree.get(child_id, 0) + 1
+
+    queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
+    while queue:
+        node_id = queue.popleft()
+        for child_id in children.get(node_id, ()):
+            in_degree[child_id] -= 1
+            if in_degree[child_id] == 0:
+                queue.append(child_id)
+
+    # Оставшиеся узлы лежат на циклах или ниже них - выделяем сами циклы
+    remaining = {node_id for node_id, degree in in_degree.items() if degree > 0}
+    if not remaining:
+        return []
+
+    G = nx.DiGraph()
+    for parent_id in remaining:
+        for child_id in children.get(parent_id, ()):
+            if child_id in remaining:
+                G.add_edge(parent_id, child_id)
+
+    cycle_edges = []
+    for component in nx.strongly_connected_components(G):
+        if len(component) > 1 or any(G.has_edge(node_id, node_id) for node_id in component):
+            cycle_edges.extend(G.subgraph(component).edges())
+    return cycle_edges
+
+
+def validate_edges(store, edges):
+    """
+    Проверяет импортируемый список связей вместе с уже существующими связями.
+
+    Returns:
+        list: Связи (parent_id, child_id) из edges, которые образуют циклы
+    """
+    edges = list(edges)
+    new_edges = set(edges)
+    cycle_edges = find_cycle_edges(list(store.edges()) + edges)
+    return [edge for edge in cycle_edges if edge in new_edges]
+
+
+def get_ancestor_index(store):
+    """Возвращает индекс предков, привязанный к хранилищу"""
+    return store.index("ancestors", AncestorIndex)
+
+
+def collapsed_pedigree(count, generations, seed=0):
+    """
+    Синтетическая "схлопнутая" родословная для замеров: count человек в
+    generations поколениях, у каждого ребенка два случайных родителя из
+    предыдущего поколения, поэтому уже через несколько поколений у всех
+    общие предки.
+
+    Returns:
+        tuple: (members, relationships) в формате JSON-файлов
+    """
+    rnd = random.Random(seed)
+    size = max(2, count // generations)
+    members = []
+    relationships = []
+    previous = []
+    for generation in range(generations):
+        current = []
+        for _ in range(size if generation < generations - 1 else count - len(members)):
+            member_id = len(members) + 1
+            members.append({
+                "id": member_id,
+                "name": f"Член семьи {member_id}",
+                "birth_year": 1500 + 25 * generation,
+                "gender": "Мужской" if member_id % 2 else "Женский",
+            })
+            if len(previous) >= 2:
+                for parent_id in rnd.sample(previous, 2):
+                    relationships.append({"parent_id": parent_id, "child_id": member_id})
+            current.append(member_id)
+        previous = current
+    return members, relationships
+
+
+def benchmark(count=40000, generations=20):
+    """Замеряет построение индекса предков, его размер и обновление на схлопнутой родословной"""
+    from family_store import FamilyStore
+
+    members, relationships = collapsed_pedigree(count, generations)
+    store = FamilyStore(members, relationships)
+    index = get_ancestor_index(store)
+
+    start = time.perf_counter()
+    index.is_ancestor(1, len(members))
+    built = time.perf_counter()
+    memory = index.memory_bytes()
+
+    # Новый основатель рода над первым поколением меняет предков почти у всех
+    founder_id = len(members) + 1
+    store.add_member({"id": founder_id, "name": "Основатель", "birth_year": 1400, "gender": "Мужской"})
+    store.add_parent_link(founder_id, 1)
+    added = time.perf_counter()
+    store.remove_parent_link(founder_id, 1)
+    removed = time.perf_counter()
+
+    checks = 1000
+    rnd = random.Random(1)
+    pairs = [(rnd.randint(1, len(members)), rnd.randint(1, len(members))) for _ in range(checks)]
+    check_start = time.perf_counter()
+    for parent_id, child_id in pairs:
+        index.would_create_cycle(parent_id, child_id)
+    checked = time.perf_counter()
+
+    return {
+        "members": len(members),
+        "relationships": len(relationships),
+        "generations": generations,
+        "build_s": round(built - start, 3),
+        "memory_mb": round(memory / 2 ** 20, 1),
+        "add_link_near_top_s": round(added - built, 3),
+        "remove_link_near_top_s": round(removed - added, 3),
+        "cycle_check_us": round((checked - check_start) / checks * 1e6, 1),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        print(__doc__)
+        sys.exit(1)
+    print(json.dumps(benchmark(*(int(arg) for arg in sys.argv[2:4])), ensure_ascii=False))
@@ -0,0 +1,233 @@
+"""
+Определение родственных отношений всех членов семьи относительно центрального узла.
+"""
+
+import threading
+from collections import OrderedDict
+
+from kinship import (
+    DEFAULT_RELATION,
+    SELF_RELATION,
+    get_kinship_engine,
+    kinship_label,
+    spouse_label,
+)
+
+# Отношения ближайшего окружения как число поколений (вверх, вниз) от центрального узла
+RELATION_DISTANCES = {
+    "parent": (1, 0),
+    "child": (0, 1),
+    "sibling": (1, 1),
+    "grandparent": (2, 0),
+    "uncle_aunt": (2, 1),
+    "cousin": (2, 2),
+    "nibling": (1, 2),
+}
+
+
+def relation_label(kind, gender):
+    """Возвращает название отношения с учетом пола"""
+    if kind == "spouse":
+        return spouse_label(gender)
+    return kinship_label(*RELATION_DISTANCES[kind], gender)
+
+
+def classify_neighbourhood(store, central_id, touched=None):
+    """
+    Определяет отношения ближайшего окружения центрального узла за один проход.
+
+    Обходит только предков до второго колена, их потомков и детей центрального узла,
+    поэтому время работы пропорционально размеру окружения, а не всего древа.
+
+    Args:
+        store: Хранилище FamilyStore
+        central_id: ID центрального человека
+        touched: Необязательное множество, в которое добавляются ID членов семьи,
+            чьи связи были прочитаны. Изменение связей этих людей может изменить результат.
+
+    Returns:
+        dict: Словарь {id: отношение} только для членов семьи с известным отношением
+    """
+    relations = {central_id: SELF_RELATION}
+
+    def assign(member_ids, kind):
+        for member_id in member_ids:
+            if member_id in relations:
+                continue
+            member = store.get(member_id)
+            if member is not None:
+                relations[member_id] = relation_label(kind, member["gender"])
+
+    parents = store.parents_of(central_id)
+    children = store.children_of(central_id)
+
+    # Супруги - другие родители общих детей
+    spouses = store.spouses_of(central_id)
+
+    siblings = {
+        child_id: None
+        for parent_id in parents
+        for child_id in store.children_of(parent_id)
+        if child_id != central_id
+    }
+
+    grandparents = {}
+    uncles_aunts = {}
+    for parent_id in parents:
+        for grandparent_id in store.parents_of(parent_id):
+            grandparents[grandparent_id] = None
+            for uncle_aunt_id in store.children_of(grandparent_id):
+                if uncle_aunt_id != parent_id:
+                    uncles_aunts[uncle_aunt_id] = None
+
+    cousins = {cousin_id: None for ua_id in uncles_aunts for cousin_id in store.children_of(ua_id)}
+    niblings = {child_id: None for sibling_id in siblings for child_id in store.children_of(sibling_id)}
+
+    # Порядок назначения задает приоритет отношений
+    assign(parents, "parent")
+    assign(spouses, "spouse")
+    assign(children, "child")
+    assign(siblings, "sibling")
+    assign(grandparents, "grandparent")
+    assign(uncles_aunts, "uncle_aunt")
+    assign(cousins, "cousin")
+    assign(niblings, "nibling")
+
+    if touched is not None:
+        touched.add(central_id)
+        touched.update(parents, children, spouses, siblings, grandparents, uncles_aunts, cousins, niblings)
+
+    return relations
+
+
+def classify_all_relations(store, central_id, touched=None):
+    """
+    Определяет отношение каждого члена семьи к центральному узлу.
+
+    Ближайшее окружение классифицируется с приоритетами classify_neighbourhood,
+    остальные кровные родственники получают название по числу поколений
+    (троюродный брат, двоюродный дедушка и т.д.) за один проход KinshipEngine.
+
+    Args:
+        store: Хранилище FamilyStore
+        central_id: ID центрального человека
+        touched: Необязательное множество для ID членов семьи, чьи связи были прочитаны
+
+    Returns:
+        dict: Словарь {id: отношение} для всех членов семьи
+    """
+    neighbourhood = classify_neighbourhood(store, central_id, touched)
+    distances = get_kinship_engine(store).classify_all(central_id, touched)
+
+    relations = {}
+    for member in store:
+        member_id = member["id"]
+        relation = neighbourhood.get(member_id)
+        if relation is None and member_id in distances:
+            relation = kinship_label(*distances[member_id], member["gender"])
+        relations[member_id] = relation or DEFAULT_RELATION
+    return relations
+
+
+def classify_relations(store, central_id, member_ids):
+    """
+    Определяет отношения к центральному узлу только для указанных членов семьи.
+
+    В отличие от classify_all_relations не обходит всех кровных родственников:
+    ближайшее окружение классифицируется одним проходом, остальные - попарными
+    запросами KinshipEngine, поэтому время работы пропорционально числу member_ids.
+
+    Returns:
+        dict: Словарь {id: отношение} для членов семьи из member_ids
+    """
+    neighbourhood = classify_neighbourhood(store, central_id)
+    engine = get_kinship_engine(store)
+
+    relations = {}
+    for member_id in member_ids:
+        relation = neighbourhood.get(member_id)
+        if relation is None:
+            member = store.get(member_id)
+            distances = engine.distances(central_id, member_id) if member is not None else None
+            if distances is not None:
+                relation = kinship_label(*distances, member["gender"])
+        relations[member_id] = relation or DEFAULT_RELATION
+    return relations
+
+
+class RelationCache:
+    """
+    Кеш отношений для центральных узлов, привязанный к хранилищу.
+
+    Для каждого центра запоминается, связи каких членов семьи были прочитаны.
+    При добавлении или удалении связи сбрасываются только центры, зависящие
+    от ее концов, - за O(степени узла), без пересчета остальных центров.
+    """
+
+    def __init__(self, store, max_centers=16):
+        self.max_centers = max_centers
+        self._store = store
+        self._relations = OrderedDict()  # центр -> (отношения, прочитанные узлы)
+        self._dependents = {}  # член семьи -> центры, зависящие от его связей
+        # Кеш заполняют одновременно несколько читающих сессий
+        self._lock = threading.Lock()
+        store.subscribe(self._on_change)
+
+    def classify_all(self, central_id):
+        """Возвращает отношения всех членов семьи к центральному узлу"""
+        with self._lock:
+            entry = self._relations.get(central_id)
+            if entry is not None:
+                self._relations.move_to_end(central_id)
+                return entry[0]
+
+        touched = set()
+        relations = classify_all_relations(self._store, central_id, touched)
+
+        with self._lock:
+            entry = self._relations.get(central_id)
+            if entry is not None:
+                # Другая сессия успела вычислить отношения раньше
+                return entry[0]
+            self._relations[central_id] = (relations, touched)
+            for member_id in touched:
+                self._dependents.setdefault(member_id, set()).add(central_id)
+
+            while len(self._relations) > self.max_centers:
+                self._drop(next(iter(self._relations)))
+        return relations
+
+    def _drop(self, central_id):
+        entry = self._relations.pop(central_id, None)
+        if entry is None:
+            return
+        for member_id in entry[1]:
+            centers = self._dependents.get(member_id)
+            if centers is not None:
+                centers.discard(central_id)
+                if not centers:
+                    del self._dependents[member_id]
+
+    def _on_change(self, store, change, previous_version):
+        operation, payload = change
+        with self._lock:
+            if operation in ("add_parent_link", "remove_parent_link"):
+                member_ids = payload
+            else:
+                member_ids = (payload["id"],)
+                # Член семьи без связей не влияет на остальных - достаточно поправить словари
+                for relations, _ in self._relations.values():
+                    if operation == "add_member":
+                        relations[payload["id"]] = DEFAULT_RELATION
+                    else:
+                        relations.pop(payload["id"], None)
+
+            for member_id in member_ids:
+                self._drop(member_id)
+                for central_id in list(self._dependents.get(member_id, ())):
+                    self._drop(central_id)
+
+
+def get_relation_cache(store):
+    """Возвращает кеш отношений, привязанный к хранилищу"""
+    return store.index("relations", RelationCache)
@@ -0,0 +1,103 @@
+"""
+Данные фамильного древа, общие для всех сессий процесса.
+
+Хранилище FamilyStore создается один раз на процесс (объект SharedFamilyData
+живет в st.cache_resource), а сессии хранят только ссылку на него и свои
+настройки отображения. Каждое изменение хранилища меняет его версию
+(FamilyStore.version), поэтому общие кеши уровней, отношений, графов и фигур,
+ключом которых служит версия, остаются корректными для всех сессий.
+
+Правки выполняются под исключительной блокировкой, а построение древа - под
+разделяемой: сессия видит данные либо до правки, либо после нее, но никогда
+в промежуточном состоянии, а две сессии не могут одновременно выдать один
+и тот же ID новому члену семьи.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Блокировка "много читателей или один писатель".
+
+    Ожидающий писатель не пропускает новых читателей вперед, поэтому
+    постоянный поток просмотров не откладывает правку бесконечно.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class SharedFamilyData:
+    """
+    Общее для процесса хранилище данных древа.
+
+    Хранилище создается функцией loader при первом обращении. reading() и
+    editing() - контекстные менеджеры, возвращающие хранилище под разделяемой
+    и исключительной блокировкой соответственно.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._store = None
+        self._load_lock = threading.Lock()
+        self._lock = ReadWriteLock()
+
+    @property
+    def store(self):
+        """Текущее хранилище; при первом обращении загружается через loader"""
+        if self._store is None:
+            with self._load_lock:
+                if self._store is None:
+                    self._store = self._loader()
+        return self._store
+
+    @property
+    def version(self):
+        """Версия текущих данных"""
+        return self.store.version
+
+    @contextmanager
+    def reading(self):
+        """Хранилище, которое не изменится до выхода из блока"""
+        with self._lock.read():
+            yield self.store
+
+    @contextmanager
+    def editing(self):
+        """Хранилище для правки; другие сессии не читают и не правят его до выхода из блока"""
+        with self._lock.write():
+            yield self.store
@@ -0,0 +1,218 @@
+"""
+Компактный колоночный бинарный снимок данных фамильного древа.
+
+Формат файла (little-endian, все секции выровнены по 8 байт):
+    заголовок    MAGIC (8 байт), затем uint64: число членов семьи, число связей,
+                 размер таблицы полов, размер блока имен
+    таблица      JSON-список названий полов (код пола - индекс в списке)
+    ids          int64[N]
+    birth_years  int32[N]
+    genders      uint8[N]
+    name_offsets uint64[N + 1] - смещения имен в блоке имен
+    names        UTF-8 имена подряд
+    parent_ids   int64[M]
+    child_ids    int64[M]
+
+Файл открывается через mmap, а колонки ColumnarSnapshot - через
+numpy.frombuffer без копирования: проверка целостности (integrity.py)
+работает прямо с этими массивами. Загрузка в FamilyStore
+(read_snapshot, to_store) по-прежнему создает словарь на каждого члена семьи
+и каждую связь, но без разбора JSON: числа берутся из колонок целиком
+(tolist), а имена декодируются из одного блока.
+
+Преобразование в JSON и обратно:
+    python snapshot.py export family.snap каталог
+    python snapshot.py import каталог family.snap
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from family_store import FamilyStore
+
+MAGIC = b"FTSNAP01"
+_HEADER = struct.Struct("<8s4Q")
+_ALIGN = 8
+
+
+def _padding(size):
+    return -size % _ALIGN
+
+
+def write_snapshot(path, members, relationships):
+    """
+    Записывает членов семьи и связи в колоночный снимок (временный файл + os.replace).
+
+    Args:
+        path: Путь к файлу снимка
+        members: Список членов семьи в формате members.json
+        relationships: Список связей в формате relationships.json
+    """
+    write_columns(
+        path,
+        ids=[member["id"] for member in members],
+        names=[member["name"] for member in members],
+        birth_years=[member["birth_year"] for member in members],
+        genders=[member["gender"] for member in members],
+        parent_ids=[rel["parent_id"] for rel in relationships],
+        child_ids=[rel["child_id"] for rel in relationships],
+    )
+
+
+def write_columns(path, ids, names, birth_years, genders, parent_ids, child_ids):
+    """
+    Записывает снимок из готовых колонок (списков, массивов NumPy или столбцов pandas).
+
+    Колонки членов семьи должны быть одинаковой длины, как и parent_ids и child_ids.
+    """
+    gender_table, codes = np.unique(np.asarray(genders, dtype=object).astype(str), return_inverse=True)
+    if len(gender_table) > 255:
+        raise ValueError("Слишком много различных значений пола для снимка")
+
+    encoded_names = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded_names) + 1, dtype="<u8")
+    np.cumsum([len(name) for name in encoded_names], out=offsets[1:])
+    names = b"".join(encoded_names)
+    gender_table = json.dumps(gender_table.tolist(), ensure_ascii=False).encode("utf-8")
+
+    sections = [
+        gender_table,
+        np.asarray(ids, dtype="<i8").tobytes(),
+        np.asarray(birth_years, dtype="<i4").tobytes(),
+        codes.astype(np.uint8).tobytes(),
+        offsets.tobytes(),
+        names,
+        np.asarray(parent_ids, dtype="<i8").tobytes(),
+        np.asarray(child_ids, dtype="<i8").tobytes(),
+    ]
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(encoded_names), len(sections[6]) // 8, len(gender_table), len(names)))
+        f.write(b"\0" * _padding(_HEADER.size))
+        for section in sections:
+            f.write(section)
+            f.write(b"\0" * _padding(len(section)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ColumnarSnapshot:
+    """
+    Снимок, открытый через mmap. Колонки - массивы numpy поверх отображенного файла.
+
+    Атрибуты ids, birth_years, genders, name_offsets, parent_ids, child_ids -
+    массивы только для чтения; имена декодируются по запросу. Файл остается
+    отображенным в память, пока существуют объект снимка или его массивы.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"Файл {path} не является снимком фамильного древа")
+
+        magic, count, link_count, table_size, names_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Файл {path} не является снимком фамильного древа")
+
+        offset = _HEADER.size + _padding(_HEADER.size)
+        self.gender_names = json.loads(bytes(self._mmap[offset:offset + table_size]).decode("utf-8"))
+        offset += table_size + _padding(table_size)
+
+        self.ids, offset = self._column(offset, "<i8", count)
+        self.birth_years, offset = self._column(offset, "<i4", count)
+        self.genders, offset = self._column(offset, "u1", count)
+        self.name_offsets, offset = self._column(offset, "<u8", count + 1)
+        self._names_start = offset
+        offset += names_size + _padding(names_size)
+        self.parent_ids, offset = self._column(offset, "<i8", link_count)
+        self.child_ids, offset = self._column(offset, "<i8", link_count)
+
+    def _column(self, offset, dtype, count):
+        column = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+        size = column.nbytes
+        return column, offset + size + _padding(size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name(self, index):
+        """Имя члена семьи с порядковым номером index"""
+        start = self._names_start + int(self.name_offsets[index])
+        end = self._names_start + int(self.name_offsets[index + 1])
+        return bytes(self._mmap[start:end]).decode("utf-8")
+
+    def names(self):
+        """Все имена в порядке членов семьи"""
+        blob = bytes(self._mmap[self._names_start:self._names_start + int(self.name_offsets[-1])])
+        bounds = self.name_offsets.tolist()
+        return [blob[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+    def members(self):
+        """Список членов семьи в формате members.json"""
+        gender_names = self.gender_names
+        return [
+            {"id": member_id, "name": name, "birth_year": birth_year, "gender": gender_names[code]}
+            for member_id, name, birth_year, code in zip(
+                self.ids.tolist(), self.names(), self.birth_years.tolist(), self.genders.tolist()
+            )
+        ]
+
+    def relationships(self):
+        """Список связей в формате relationships.json"""
+        return [
+            {"parent_id": parent_id, "child_id": child_id}
+            for parent_id, child_id in zip(self.parent_ids.tolist(), self.child_ids.tolist())
+        ]
+
+    def to_store(self):
+        """Создает FamilyStore с данными снимка"""
+        return FamilyStore(self.members(), self.relationships())
+
+
+def read_snapshot(path):
+    """Читает снимок и возвращает (members, relationships) в формате JSON-файлов"""
+    snapshot = ColumnarSnapshot(path)
+    return snapshot.members(), snapshot.relationships()
+
+
+def export_json(snapshot_path, data_dir):
+    """Сохраняет снимок как members.json и relationships.json в каталоге data_dir"""
+    from journal import MEMBERS_FILE, RELATIONSHIPS_FILE, write_json_atomic
+
+    members, relationships = read_snapshot(snapshot_path)
+    os.makedirs(data_dir, exist_ok=True)
+    write_json_atomic(os.path.join(data_dir, MEMBERS_FILE), members)
+    write_json_atomic(os.path.join(data_dir, RELATIONSHIPS_FILE), relationships)
+    return len(members), len(relationships)
+
+
+def import_json(data_dir, snapshot_path):
+    """Создает снимок из members.json и relationships.json каталога data_dir"""
+    from journal import MEMBERS_FILE, RELATIONSHIPS_FILE
+
+    with open(os.path.join(data_dir, MEMBERS_FILE), "r", encoding="utf-8") as f:
+        members = json.load(f)
+    with open(os.path.join(data_dir, RELATIONSHIPS_FILE), "r", encoding="utf-8") as f:
+        relationships = json.load(f)
+    write_snapshot(snapshot_path, members, relationships)
+    return len(members), len(relationships)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("export", "import"):
+        print(__doc__)
+        sys.exit(1)
+    command, source, target = sys.argv[1:]
+    convert = export_json if command == "export" else import_json
+    member_count, link_count = convert(source, target)
+    print(json.dumps({"members": member_count, "relationships": link_count}, ensure_ascii=False))
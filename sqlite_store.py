@@ -0,0 +1,265 @@
+"""
+Хранение данных фамильного древа в SQLite.
+
+Необязательная альтернатива JSON-снимку с журналом (journal.py): члены семьи
+и родительские связи хранятся в таблицах с индексами по id, parent_id,
+child_id и имени, база работает в режиме WAL. Каждое изменение FamilyStore
+записывается отдельной короткой транзакцией.
+
+Кроме загрузки всего древа модуль умеет отвечать на запросы без его
+материализации: предки и потомки (рекурсивные CTE), окно родства вокруг
+человека, поиск по началу имени.
+
+Перенос данных из JSON:
+    python sqlite_store.py migrate [data] [data/family.db]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from family_store import FamilyStore
+from journal import DATA_DIR, read_store
+
+DB_FILE = os.path.join(DATA_DIR, "family.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    birth_year INTEGER NOT NULL,
+    gender TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parent_links (
+    parent_id INTEGER NOT NULL,
+    child_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (parent_id, child_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parent_links_child ON parent_links (child_id, parent_id);
+CREATE INDEX IF NOT EXISTS members_name ON members (name, birth_year);
+"""
+
+_MEMBER_COLUMNS = ("id", "name", "birth_year", "gender")
+
+# Предки до max_depth поколений: (id, число поколений по кратчайшему пути)
+_ANCESTORS_SQL = """
+WITH RECURSIVE ancestors(id, depth) AS (
+    SELECT parent_id, 1 FROM parent_links WHERE child_id = :id
+    UNION
+    SELECT p.parent_id, a.depth + 1 FROM parent_links p JOIN ancestors a ON p.child_id = a.id
+    WHERE a.depth < :max_depth
+)
+SELECT id, MIN(depth) FROM ancestors GROUP BY id ORDER BY MIN(depth), id
+"""
+
+_DESCENDANTS_SQL = """
+WITH RECURSIVE descendants(id, depth) AS (
+    SELECT child_id, 1 FROM parent_links WHERE parent_id = :id
+    UNION
+    SELECT p.child_id, d.depth + 1 FROM parent_links p JOIN descendants d ON p.parent_id = d.id
+    WHERE d.depth < :max_depth
+)
+SELECT id, MIN(depth) FROM descendants GROUP BY id ORDER BY MIN(depth), id
+"""
+
+# Окно родства: члены семьи не дальше max_depth шагов по связям родитель-ребенок
+# и супружеским связям (супруги - другие родители общих детей), как в levels.compute_relation_levels.
+# Несколько рекурсивных SELECT в одном CTE поддерживаются с SQLite 3.34
+_WINDOW_SQL = """
+WITH RECURSIVE window(id, depth) AS (
+    SELECT :id, 0
+    UNION
+    SELECT p.parent_id, w.depth + 1 FROM window w JOIN parent_links p ON p.child_id = w.id
+    WHERE w.depth < :max_depth
+    UNION
+    SELECT p.child_id, w.depth + 1 FROM window w JOIN parent_links p ON p.parent_id = w.id
+    WHERE w.depth < :max_depth
+    UNION
+    SELECT s.parent_id, w.depth + 1 FROM window w
+    JOIN parent_links p ON p.parent_id = w.id
+    JOIN parent_links s ON s.child_id = p.child_id AND s.parent_id <> w.id
+    WHERE w.depth < :max_depth
+)
+SELECT id, MIN(depth) FROM window GROUP BY id ORDER BY MIN(depth), id
+"""
+
+
+def connect(path=DB_FILE):
+    """Открывает базу в режиме WAL и создает таблицы при необходимости"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class SQLiteBackend:
+    """
+    Хранилище в SQLite, синхронизируемое с FamilyStore.
+
+    После attach() каждое изменение хранилища записывается в базу;
+    запросы ancestors/descendants/window выполняются в базе без загрузки древа.
+    Запросы приходят одновременно из нескольких читающих сессий, поэтому
+    соединение используется под блокировкой.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._connection = connect(path)
+        self._lock = threading.Lock()
+        self._position = self._next_position()
+
+    def _next_position(self):
+        row = self._connection.execute(
+            "SELECT MAX(p) FROM (SELECT MAX(position) AS p FROM members UNION ALL SELECT MAX(position) FROM parent_links)"
+        ).fetchone()
+        return (row[0] or 0) + 1
+
+    # --- Загрузка и запись ---
+
+    def load(self):
+        """Загружает все древо в FamilyStore и подписывается на его изменения"""
+        store = FamilyStore(self.members(), self.relationships())
+        store.subscribe(self._on_change)
+        return store
+
+    def attach(self, store):
+        """Записывает текущее состояние хранилища в базу и подписывается на его изменения"""
+        self.replace_all(store.members, store.relationships)
+        store.subscribe(self._on_change)
+        return self
+
+    def replace_all(self, members, relationships):
+        """Заменяет содержимое базы переданными данными одной транзакцией"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM members")
+            self._connection.execute("DELETE FROM parent_links")
+            self._connection.executemany(
+                "INSERT INTO members (id, name, birth_year, gender, position) VALUES (?, ?, ?, ?, ?)",
+                ((m["id"], m["name"], m["birth_year"], m["gender"], position) for position, m in enumerate(members)),
+            )
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO parent_links (parent_id, child_id, position) VALUES (?, ?, ?)",
+                ((r["parent_id"], r["child_id"], position) for position, r in enumerate(relationships)),
+            )
+        self._position = self._next_position()
+
+    def _on_change(self, store, change, previous_version):
+        operation, payload = change
+        position = self._position
+        self._position += 1
+        with self._lock, self._connection:
+            if operation == "add_member":
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO members (id, name, birth_year, gender, position) VALUES (?, ?, ?, ?, ?)",
+                    (payload["id"], payload["name"], payload["birth_year"], payload["gender"], position),
+                )
+            elif operation == "remove_member":
+                self._connection.execute("DELETE FROM members WHERE id = ?", (payload["id"],))
+            elif operation == "add_parent_link":
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO parent_links (parent_id, child_id, position) VALUES (?, ?, ?)",
+                    (payload[0], payload[1], position),
+                )
+            elif operation == "remove_parent_link":
+                self._connection.execute(
+                    "DELETE FROM parent_links WHERE parent_id = ? AND child_id = ?", payload
+                )
+
+    def sync(self):
+        """Каждое изменение уже зафиксировано транзакцией; метод нужен для совместимости с журналом"""
+
+    def flush(self, timeout=None):
+        """Отложенной записи нет; метод нужен для совместимости с журналом"""
+        return True
+
+    # --- Запросы ---
+
+    def members(self):
+        """Список всех членов семьи в порядке добавления"""
+        rows = self._query("SELECT id, name, birth_year, gender FROM members ORDER BY position")
+        return [dict(zip(_MEMBER_COLUMNS, row)) for row in rows]
+
+    def relationships(self):
+        """Список всех родительских связей в порядке добавления"""
+        rows = self._query("SELECT parent_id, child_id FROM parent_links ORDER BY position")
+        return [{"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in rows]
+
+    def get(self, member_id):
+        """Находит члена семьи по ID"""
+        rows = self._query("SELECT id, name, birth_year, gender FROM members WHERE id = ?", (member_id,))
+        return dict(zip(_MEMBER_COLUMNS, rows[0])) if rows else None
+
+    def find_by_name(self, prefix, limit=20):
+        """Члены семьи, имя которых начинается с prefix (использует индекс по имени)"""
+        rows = self._query(
+            "SELECT id, name, birth_year, gender FROM members WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+            (prefix, prefix + "\uffff", limit),
+        )
+        return [dict(zip(_MEMBER_COLUMNS, row)) for row in rows]
+
+    def ancestors(self, member_id, max_depth=64):
+        """Словарь {id предка: число поколений} до max_depth поколений вверх"""
+        return dict(self._query(_ANCESTORS_SQL, {"id": member_id, "max_depth": max_depth}))
+
+    def descendants(self, member_id, max_depth=64):
+        """Словарь {id потомка: число поколений} до max_depth поколений вниз"""
+        return dict(self._query(_DESCENDANTS_SQL, {"id": member_id, "max_depth": max_depth}))
+
+    def window(self, member_id, max_depth):
+        """Словарь {id: число шагов} для членов семьи не дальше max_depth шагов по связям родства"""
+        return dict(self._query(_WINDOW_SQL, {"id": member_id, "max_depth": max_depth}))
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+
+def load_store(path=DB_FILE):
+    """Загружает хранилище из базы; изменения хранилища записываются в базу"""
+    backend = SQLiteBackend(path)
+    store = backend.load()
+    store.index("sqlite", lambda _: backend)
+    return store
+
+
+def get_backend(store, path=DB_FILE):
+    """
+    Возвращает SQLite-хранилище, связанное с FamilyStore. Если хранилище создано
+    не из базы, его текущее состояние сначала записывается в базу.
+    """
+    return store.index("sqlite", lambda s: SQLiteBackend(path).attach(s))
+
+
+def migrate_from_json(data_dir=DATA_DIR, path=DB_FILE):
+    """
+    Переносит данные из снимка (family.snap или JSON) и журнала изменений в базу SQLite.
+
+    Returns:
+        tuple: (число членов семьи, число связей)
+    """
+    store, _ = read_store(data_dir)
+    backend = SQLiteBackend(path)
+    backend.replace_all(store.members, store.relationships)
+    backend.close()
+    return len(store.members), len(store.relationships)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[2] if len(sys.argv) > 2 else DATA_DIR
+    target = sys.argv[3] if len(sys.argv) > 3 else DB_FILE
+    member_count, link_count = migrate_from_json(source, target)
+    print(json.dumps({"members": member_count, "relationships": link_count, "database": target}, ensure_ascii=False))
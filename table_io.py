@@ -0,0 +1,342 @@
+"""
+Массовый импорт и экспорт данных древа в CSV и Parquet через pandas.
+
+Данные хранятся в двух таблицах: члены семьи (id, name, birth_year, gender)
+и родительские связи (parent_id, child_id). Формат определяется по
+расширению файла: .csv или .parquet (для Parquet нужен pyarrow).
+
+Файлы читаются частями по CHUNK_ROWS строк, и каждая часть сразу приводится
+к типам MEMBER_COLUMNS и LINK_COLUMNS, поэтому исходный текст файла не
+держится в памяти целиком. Проверки выполняются над таблицами целиком, без
+построчных циклов: повторы ID и пар (имя, год рождения), ссылки на
+отсутствующих людей, порядок годов рождения (через слияние таблиц),
+больше двух родителей у ребенка; циклы ищутся одной топологической
+сортировкой (reachability.find_cycle_edges). Ошибочные строки отбрасываются
+и попадают в отчет.
+
+Импортированные данные добавляются к существующим и записываются одним
+пакетом: колонками в новый снимок (snapshot.write_columns) или одной
+транзакцией SQLite.
+
+Ограничение по памяти: чтение частями экономит только на тексте файла.
+Проверенные части склеиваются в таблицы целиком (read_typed), существующие
+данные загружаются полностью (FamilyStore из снимка и журнала или все
+строки SQLite, _existing_tables), а поиск циклов получает список всех
+связей в виде кортежей. Поэтому импорт держит в памяти все существующие и
+все импортируемые данные сразу: около 0,7 ГБ на 500 тыс. членов семьи и
+1 млн связей в пустой каталог и около 1,5 ГБ на добавление даже одной
+строки к древу такого размера. Проверки и запись по частям не выполняются.
+
+Использование (приложение должно быть остановлено или перезапущено после импорта):
+    python table_io.py import members.csv relationships.csv [data]
+    python table_io.py export members.parquet relationships.parquet [data]
+    python table_io.py import members.csv relationships.csv --sqlite [data/family.db]
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+from journal import DATA_DIR, SNAPSHOT_FILE, clear_journal, read_store
+from reachability import find_cycle_edges
+from snapshot import write_columns
+
+MEMBER_COLUMNS = {"id": "int64", "name": "string", "birth_year": "int32", "gender": "category"}
+LINK_COLUMNS = {"parent_id": "int64", "child_id": "int64"}
+GENDERS = ["Мужской", "Женский"]
+
+# Число строк, читаемых из файла за один раз
+CHUNK_ROWS = 200_000
+
+# Сколько примеров каждой ошибки сохранять в отчете
+REPORT_EXAMPLES = 20
+
+
+# --- Чтение и запись файлов ---
+
+def _is_parquet(path):
+    return path.lower().endswith(".parquet")
+
+
+def read_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    """Читает таблицу CSV или Parquet частями по chunk_rows строк"""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=list(columns), dtype=str, chunksize=chunk_rows)
+
+
+def write_table(frame, path):
+    """Записывает таблицу в CSV или Parquet в зависимости от расширения файла"""
+    if _is_parquet(path):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def _integers(column):
+    """Целые значения колонки; нечисловые и дробные значения становятся пропусками"""
+    numbers = pd.to_numeric(column, errors="coerce")
+    return numbers.where(numbers == numbers.round())
+
+
+def _typed_members(chunk):
+    """Приводит часть таблицы членов семьи к MEMBER_COLUMNS; возвращает (таблица, маска годных строк)"""
+    ids = _integers(chunk["id"])
+    birth_years = _integers(chunk["birth_year"])
+    names = chunk["name"].astype("string").str.strip()
+    genders = chunk["gender"].astype("string").str.strip()
+    valid = (
+        (ids > 0)
+        & birth_years.notna()
+        & (names.str.len() > 0).fillna(False)
+        & genders.isin(GENDERS).fillna(False)
+    ).to_numpy(dtype=bool)
+    frame = pd.DataFrame({
+        "id": ids[valid].astype(MEMBER_COLUMNS["id"]),
+        "name": names[valid].astype(MEMBER_COLUMNS["name"]),
+        "birth_year": birth_years[valid].astype(MEMBER_COLUMNS["birth_year"]),
+        "gender": pd.Categorical(genders[valid], categories=GENDERS),
+    })
+    return frame, valid
+
+
+def _typed_links(chunk):
+    """Приводит часть таблицы связей к LINK_COLUMNS; возвращает (таблица, маска годных строк)"""
+    parent_ids = _integers(chunk["parent_id"])
+    child_ids = _integers(chunk["child_id"])
+    valid = (parent_ids.notna() & child_ids.notna()).to_numpy(dtype=bool)
+    frame = pd.DataFrame({
+        "parent_id": parent_ids[valid].astype(LINK_COLUMNS["parent_id"]),
+        "child_id": child_ids[valid].astype(LINK_COLUMNS["child_id"]),
+    })
+    return frame, valid
+
+
+def read_typed(path, columns, convert, chunk_rows=CHUNK_ROWS):
+    """
+    Читает таблицу частями и приводит каждую часть к нужным типам.
+
+    Returns:
+        tuple: (таблица годных строк, отчет о строках с некорректными значениями)
+    """
+    frames = []
+    invalid = []
+    invalid_count = 0
+    offset = 0
+    for chunk in read_chunks(path, columns, chunk_rows):
+        frame, valid = convert(chunk)
+        frames.append(frame)
+        bad_rows = (~valid).nonzero()[0]
+        invalid_count += len(bad_rows)
+        # Номер строки данных в файле (без заголовка), начиная с 1
+        invalid.extend((offset + bad_rows[:REPORT_EXAMPLES - len(invalid)] + 1).tolist())
+        offset += len(chunk)
+    if not frames:
+        return _empty(columns), {"count": 0, "examples": []}
+    return pd.concat(frames, ignore_index=True), {"count": invalid_count, "examples": invalid}
+
+
+def _empty(columns):
+    return pd.DataFrame({
+        name: pd.Categorical([], categories=GENDERS) if dtype == "category" else pd.Series([], dtype=dtype)
+        for name, dtype in columns.items()
+    })
+
+
+# --- Проверка ---
+
+def _report(frame, mask, columns):
+    """Отчет об отброшенных строках: их число и несколько примеров"""
+    examples = frame.loc[mask, columns].head(REPORT_EXAMPLES)
+    return {"count": int(mask.sum()), "examples": examples.astype(object).values.tolist()}
+
+
+def _in_frame(frame, other, columns):
+    """Маска строк frame, значения columns которых есть в other (слиянием таблиц)"""
+    if other.empty or frame.empty:
+        return pd.Series(False, index=frame.index)
+    keys = other[columns].drop_duplicates()
+    merged = frame[columns].merge(keys, on=columns, how="left", indicator=True)
+    return pd.Series(merged["_merge"].to_numpy() == "both", index=frame.index)
+
+
+def validate_members(members, existing):
+    """
+    Отбрасывает повторы ID и пар (имя, год рождения) внутри импорта и
+    относительно существующих данных.
+
+    Returns:
+        tuple: (members, report)
+    """
+    report = {}
+    existing = existing.astype({"name": "string", "birth_year": MEMBER_COLUMNS["birth_year"]})
+
+    duplicate_ids = members.duplicated("id") | members["id"].isin(existing["id"])
+    report["duplicate_ids"] = _report(members, duplicate_ids, ["id", "name"])
+    members = members[~duplicate_ids]
+
+    name_year = ["name", "birth_year"]
+    duplicate_names = members.duplicated(name_year) | _in_frame(members, existing, name_year)
+    report["duplicate_members"] = _report(members, duplicate_names, ["id", "name", "birth_year"])
+    return members[~duplicate_names].reset_index(drop=True), report
+
+
+def validate_links(links, members, existing_members, existing_links):
+    """
+    Проверяет импортируемые связи вместе с существующими данными.
+
+    Проверки: связь с самим собой, повторы, ссылки на отсутствующих людей,
+    родитель не старше ребенка, больше двух родителей, циклы.
+
+    Returns:
+        tuple: (links, report)
+    """
+    report = {}
+    pair = ["parent_id", "child_id"]
+
+    self_links = links["parent_id"] == links["child_id"]
+    report["self_links"] = _report(links, self_links, pair)
+    links = links[~self_links]
+
+    duplicates = links.duplicated(pair) | _in_frame(links, existing_links, pair)
+    report["duplicate_links"] = _report(links, duplicates, pair)
+    links = links[~duplicates]
+
+    years = pd.concat([existing_members[["id", "birth_year"]], members[["id", "birth_year"]]], ignore_index=True)
+    years = years.astype({"birth_year": "int64"})
+    dangling = ~links["parent_id"].isin(years["id"]) | ~links["child_id"].isin(years["id"])
+    report["dangling"] = _report(links, dangling, pair)
+    links = links[~dangling]
+
+    # Годы рождения родителя и ребенка подставляются слиянием таблиц
+    merged = (
+        links
+        .merge(years.rename(columns={"id": "parent_id", "birth_year": "parent_year"}), on="parent_id", how="left")
+        .merge(years.rename(columns={"id": "child_id", "birth_year": "child_year"}), on="child_id", how="left")
+    )
+    too_young = pd.Series((merged["parent_year"] >= merged["child_year"]).to_numpy(), index=links.index)
+    report["birth_order"] = _report(links, too_young, pair)
+    links = links[~too_young]
+
+    # Существующие родители считаются первыми; лишние импортируемые связи отбрасываются
+    all_children = pd.concat([existing_links["child_id"], links["child_id"]], ignore_index=True)
+    rank = all_children.groupby(all_children).cumcount().to_numpy()[len(existing_links):]
+    extra = pd.Series(rank >= 2, index=links.index)
+    report["extra_parents"] = _report(links, extra, pair)
+    links = links[~extra]
+
+    all_edges = list(zip(
+        pd.concat([existing_links["parent_id"], links["parent_id"]]).tolist(),
+        pd.concat([existing_links["child_id"], links["child_id"]]).tolist(),
+    ))
+    cycle_edges = pd.DataFrame(find_cycle_edges(all_edges), columns=pair, dtype="int64")
+    cycles = _in_frame(links, cycle_edges, pair)
+    report["cycles"] = _report(links, cycles, pair)
+    return links[~cycles].reset_index(drop=True), report
+
+
+# --- Импорт и экспорт ---
+
+def _existing_tables(data_dir, db_path):
+    """Существующие данные в виде таблиц и (для SQLite) открытое хранилище"""
+    backend = None
+    if db_path is not None:
+        from sqlite_store import SQLiteBackend
+
+        backend = SQLiteBackend(db_path)
+        members, relationships = backend.members(), backend.relationships()
+    else:
+        store, _ = read_store(data_dir)
+        members, relationships = store.members, store.relationships
+    return (
+        pd.DataFrame(members, columns=list(MEMBER_COLUMNS)),
+        pd.DataFrame(relationships, columns=list(LINK_COLUMNS)),
+        backend,
+    )
+
+
+def import_tables(members_path, relationships_path, data_dir=DATA_DIR, db_path=None, chunk_rows=CHUNK_ROWS):
+    """
+    Импортирует таблицы членов семьи и связей, добавляя их к существующим данным.
+
+    Args:
+        members_path: Файл CSV/Parquet с колонками id, name, birth_year, gender
+        relationships_path: Файл CSV/Parquet с колонками parent_id, child_id (или None)
+        data_dir: Каталог снимка и журнала (если db_path не задан)
+        db_path: Путь к базе SQLite; если задан, данные записываются в нее
+        chunk_rows: Число строк, читаемых за один раз
+
+    Returns:
+        dict: Отчет импорта
+    """
+    existing_members, existing_links, backend = _existing_tables(data_dir, db_path)
+
+    members, invalid_members = read_typed(members_path, MEMBER_COLUMNS, _typed_members, chunk_rows)
+    if relationships_path:
+        links, invalid_links = read_typed(relationships_path, LINK_COLUMNS, _typed_links, chunk_rows)
+    else:
+        links, invalid_links = _empty(LINK_COLUMNS), {"count": 0, "examples": []}
+
+    members, report = validate_members(members, existing_members)
+    links, link_report = validate_links(links, members, existing_members, existing_links)
+    report = {"invalid_members": invalid_members, "invalid_links": invalid_links, **report, **link_report}
+
+    all_members = pd.concat([existing_members.astype({"gender": "string"}), members.astype({"gender": "string"})],
+                            ignore_index=True)
+    all_links = pd.concat([existing_links, links], ignore_index=True)
+    if backend is not None:
+        backend.replace_all(all_members.to_dict("records"), all_links.to_dict("records"))
+        backend.close()
+    else:
+        os.makedirs(data_dir, exist_ok=True)
+        write_columns(
+            os.path.join(data_dir, SNAPSHOT_FILE),
+            ids=all_members["id"].to_numpy(),
+            names=all_members["name"].tolist(),
+            birth_years=all_members["birth_year"].to_numpy(),
+            genders=all_members["gender"].to_numpy(),
+            parent_ids=all_links["parent_id"].to_numpy(),
+            child_ids=all_links["child_id"].to_numpy(),
+        )
+        clear_journal(data_dir)
+
+    report["members"] = len(members)
+    report["relationships"] = len(links)
+    return report
+
+
+def export_tables(members_path, relationships_path, data_dir=DATA_DIR, db_path=None):
+    """
+    Выгружает членов семьи и связи в файлы CSV или Parquet.
+
+    Returns:
+        dict: Число выгруженных членов семьи и связей
+    """
+    members, links, backend = _existing_tables(data_dir, db_path)
+    if backend is not None:
+        backend.close()
+    write_table(members.astype(MEMBER_COLUMNS), members_path)
+    write_table(links.astype(LINK_COLUMNS), relationships_path)
+    return {"members": len(members), "relationships": len(links)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] not in ("import", "export"):
+        print(__doc__)
+        sys.exit(1)
+    command, members_file, relationships_file = sys.argv[1:4]
+    target = sys.argv[4:]
+    if target and target[0] == "--sqlite":
+        from sqlite_store import DB_FILE
+
+        options = {"db_path": target[1] if len(target) > 1 else DB_FILE}
+    else:
+        options = {"data_dir": target[0] if target else DATA_DIR}
+    convert = import_tables if command == "import" else export_tables
+    print(json.dumps(convert(members_file, relationships_file, **options), ensure_ascii=False))
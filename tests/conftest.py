@@ -0,0 +1,17 @@
+"""Общие настройки тестов: модули приложения лежат в корне репозитория"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def demo_store():
+    """Новое хранилище с демонстрационным древом для каждого теста"""
+    from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+    from family_store import FamilyStore
+
+    return FamilyStore([dict(member) for member in DEMO_MEMBERS], DEMO_RELATIONSHIPS)
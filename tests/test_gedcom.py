@@ -0,0 +1,142 @@
+"""Тесты потокового импорта GEDCOM (gedcom.py)"""
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from gedcom import import_gedcom, iter_records, read_gedcom
+from journal import read_store, write_store
+from sqlite_store import SQLiteBackend
+
+SEX = {"Мужской": "M", "Женский": "F"}
+
+
+def demo_gedcom(path):
+    """Записывает демонстрационное древо в формате GEDCOM: семья - пара родителей со всеми общими детьми"""
+    families = {}
+    for member in DEMO_MEMBERS:
+        parents = tuple(rel["parent_id"] for rel in DEMO_RELATIONSHIPS if rel["child_id"] == member["id"])
+        if parents:
+            families.setdefault(parents, []).append(member["id"])
+    lines = ["0 HEAD", "1 CHAR UTF-8"]
+    for member in DEMO_MEMBERS:
+        first, *rest = member["name"].split()
+        name = f"{first} /{rest[-1]}/" if rest else first
+        lines += [f"0 @I{member['id']}@ INDI", f"1 NAME {name}", f"1 SEX {SEX[member['gender']]}",
+                  "1 BIRT", f"2 DATE 1 JAN {member['birth_year']}"]
+    for number, (parents, children) in enumerate(families.items(), 1):
+        lines.append(f"0 @F{number}@ FAM")
+        lines += [f"1 HUSB @I{parent_id}@" for parent_id in parents]
+        lines += [f"1 CHIL @I{child_id}@" for child_id in children]
+    lines.append("0 TRLR")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+BAD_GEDCOM = """0 HEAD
+0 @I1@ INDI
+1 NAME Иван /Петров/
+1 SEX M
+1 BIRT
+2 DATE ABT 1950
+0 @I2@ INDI
+1 NAME Мария /Петрова/
+1 SEX F
+1 BIRT
+2 DATE 3 MAR 1952
+0 @I3@ INDI
+1 NAME Олег /Петров/
+1 SEX M
+1 BIRT
+2 DATE 1980
+0 @I4@ INDI
+1 NAME Безымянный пол
+1 BIRT
+2 DATE 1985
+0 @I5@ INDI
+1 NAME Старый /Сын/
+1 SEX M
+1 BIRT
+2 DATE 1900
+0 @I6@ INDI
+1 NAME Третий /Родитель/
+1 SEX M
+1 BIRT
+2 DATE 1940
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+1 CHIL @I5@
+1 CHIL @I4@
+0 @F2@ FAM
+1 HUSB @I1@
+1 CHIL @I3@
+0 @F3@ FAM
+1 HUSB @I6@
+1 CHIL @I3@
+1 CHIL @I9@
+0 TRLR
+"""
+
+
+def test_iter_records():
+    records = list(iter_records(["0 HEAD", "1 CHAR UTF-8", "0 @I1@ INDI", "1 NAME Иван /Петров/", "", "0 TRLR"]))
+    assert records == [
+        ("HEAD", None, [(1, "CHAR", "UTF-8")]),
+        ("INDI", "@I1@", [(1, "NAME", "Иван /Петров/")]),
+        ("TRLR", None, []),
+    ]
+
+
+def test_demo_tree_round_trip(tmp_path):
+    members, relationships, report = read_gedcom(demo_gedcom(tmp_path / "demo.ged"))
+    assert [(m["id"], m["birth_year"], m["gender"]) for m in members] == [
+        (m["id"], m["birth_year"], m["gender"]) for m in DEMO_MEMBERS
+    ]
+    assert members[2]["name"] == "Георгий Богданов"
+    assert sorted((r["parent_id"], r["child_id"]) for r in relationships) == sorted(
+        (r["parent_id"], r["child_id"]) for r in DEMO_RELATIONSHIPS
+    )
+    assert all(section["count"] == 0 for section in report.values())
+
+
+def test_bad_dataset(tmp_path):
+    path = tmp_path / "bad.ged"
+    path.write_text(BAD_GEDCOM, encoding="utf-8")
+    members, relationships, report = read_gedcom(path, first_id=10)
+
+    assert [(m["id"], m["name"], m["birth_year"]) for m in members] == [
+        (10, "Иван Петров", 1950), (11, "Мария Петрова", 1952), (12, "Олег Петров", 1980),
+        (13, "Старый Сын", 1900), (14, "Третий Родитель", 1940),
+    ]
+    assert report["skipped_members"] == {"count": 1, "examples": ["@I4@"]}
+    # Ссылки на пропущенного и несуществующего человека
+    assert report["dangling"] == {"count": 3, "examples": [["@I1@", "@I4@"], ["@I2@", "@I4@"], ["@I6@", "@I9@"]]}
+    assert report["birth_order"] == {"count": 2, "examples": [[10, 13], [11, 13]]}
+    # Повтор связи Иван -> Олег из второй семьи отброшен, третий родитель - лишний
+    assert report["extra_parents"] == {"count": 1, "examples": [[14, 12]]}
+    assert report["cycles"]["count"] == 0
+    assert relationships == [{"parent_id": 10, "child_id": 12}, {"parent_id": 11, "child_id": 12}]
+
+
+def test_import_appends_to_existing_data(tmp_path):
+    data_dir = str(tmp_path / "data")
+    write_store(data_dir, [{"id": 1, "name": "Уже есть", "birth_year": 1920, "gender": "Женский"}], [])
+    report = import_gedcom(demo_gedcom(tmp_path / "demo.ged"), data_dir)
+    assert report["members"] == len(DEMO_MEMBERS)
+    assert report["relationships"] == len(DEMO_RELATIONSHIPS)
+
+    store, _ = read_store(data_dir)
+    assert len(store) == len(DEMO_MEMBERS) + 1
+    # Импортированные люди получают ID после существующих
+    assert store.get(4)["name"] == "Георгий Богданов"
+    assert sorted(store.children_of(2)) == [4, 5]
+
+
+def test_import_into_sqlite(tmp_path):
+    db_path = str(tmp_path / "family.db")
+    import_gedcom(demo_gedcom(tmp_path / "demo.ged"), db_path=db_path)
+    backend = SQLiteBackend(db_path)
+    try:
+        assert len(backend.members()) == len(DEMO_MEMBERS)
+        assert backend.ancestors(3) == {1: 1, 2: 1, 5: 2, 6: 2, 16: 2, 17: 2}
+    finally:
+        backend.close()
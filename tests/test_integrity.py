@@ -0,0 +1,122 @@
+"""Тесты проверки целостности integrity.py"""
+
+import json
+import os
+
+from integrity import check_integrity, has_violations, load_columns
+from journal import JOURNAL_FILE, MEMBERS_FILE, RELATIONSHIPS_FILE
+
+
+def member(member_id, name, birth_year, gender="Мужской"):
+    return {"id": member_id, "name": name, "birth_year": birth_year, "gender": gender}
+
+
+def link(parent_id, child_id):
+    return {"parent_id": parent_id, "child_id": child_id}
+
+
+def write_data(data_dir, members, relationships, journal=()):
+    for name, data in ((MEMBERS_FILE, members), (RELATIONSHIPS_FILE, relationships)):
+        with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    if journal:
+        with open(os.path.join(data_dir, JOURNAL_FILE), "w", encoding="utf-8") as f:
+            for record in journal:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def test_clean_data_has_no_violations(tmp_path):
+    write_data(
+        tmp_path,
+        [member(1, "Иван Петров", 1950), member(2, "Мария Петрова", 1952, "Женский"), member(3, "Олег Петров", 1980)],
+        [link(1, 3), link(2, 3)],
+    )
+    report = check_integrity(load_columns(tmp_path))
+    assert not has_violations(report)
+    assert report["members"] == 3
+    assert report["relationships"] == 2
+
+
+def test_bad_dataset(tmp_path):
+    write_data(
+        tmp_path,
+        [
+            member(1, "Иван Петров", 1950),
+            member(1, "Иван Петров", 1950),
+            member(2, "Олег Петров", 1975),
+            member(3, "Петр Петров", 1990),
+            member(4, "Анна Петрова", 1960, "Женский"),
+            member(5, "Павел Петров", 1940),
+        ],
+        [
+            link(1, 2),
+            link(1, 2),
+            link(2, 3),
+            link(3, 1),
+            link(9, 2),
+            link(4, 4),
+            link(4, 3),
+            link(5, 3),
+        ],
+    )
+    report = check_integrity(load_columns(tmp_path))
+    assert report["duplicate_ids"] == [1]
+    assert report["duplicate_members"] == [{"name": "Иван Петров", "birth_year": 1950, "ids": [1, 1]}]
+    assert report["orphan_links"] == [[9, 2]]
+    assert report["self_links"] == [[4, 4]]
+    assert report["duplicate_links"] == [[1, 2]]
+    assert report["too_many_parents"] == [{"child_id": 3, "parent_ids": [2, 4, 5]}]
+    assert report["parent_not_older"] == [[3, 1]]
+    assert report["cycles"] == [[1, 2], [2, 3], [3, 1]]
+    assert has_violations(report)
+
+
+def test_duplicate_ids_with_journal(tmp_path):
+    # Повторный ID не должен обрывать проверку, даже если есть журнал
+    write_data(
+        tmp_path,
+        [member(1, "Иван Петров", 1950), member(1, "Петр Иванов", 1955)],
+        [],
+        journal=[
+            {"op": "add_member", "member": member(2, "Олег Петров", 1980)},
+            {"op": "add_parent_link", "parent_id": 1, "child_id": 2},
+        ],
+    )
+    report = check_integrity(load_columns(tmp_path))
+    assert report["duplicate_ids"] == [1]
+    assert report["members"] == 3
+    assert report["relationships"] == 1
+
+
+def test_duplicate_links_with_journal(tmp_path):
+    write_data(
+        tmp_path,
+        [member(1, "Иван Петров", 1950), member(2, "Олег Петров", 1980), member(3, "Анна Петрова", 1982, "Женский")],
+        [link(1, 2), link(1, 2)],
+        journal=[
+            {"op": "add_member", "member": member(4, "Петр Петров", 2005)},
+            {"op": "add_parent_link", "parent_id": 2, "child_id": 4},
+            {"op": "add_parent_link", "parent_id": 2, "child_id": 4},
+        ],
+    )
+    report = check_integrity(load_columns(tmp_path))
+    assert report["duplicate_links"] == [[1, 2]]
+    assert report["relationships"] == 3
+
+
+def test_journal_removals(tmp_path):
+    write_data(
+        tmp_path,
+        [member(1, "Иван Петров", 1950), member(2, "Олег Петров", 1980), member(3, "Петр Петров", 2005)],
+        [link(1, 2), link(2, 3)],
+        journal=[
+            {"op": "remove_member", "id": 3},
+            {"op": "remove_parent_link", "parent_id": 1, "child_id": 2},
+            {"op": "add_member", "member": member(3, "Петр Петров", 2006)},
+        ],
+    )
+    columns = load_columns(tmp_path)
+    assert columns["ids"].tolist() == [1, 2, 3]
+    assert columns["birth_years"].tolist() == [1950, 1980, 2006]
+    assert columns["parent_ids"].tolist() == []
+    assert not has_violations(check_integrity(columns))
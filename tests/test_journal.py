@@ -0,0 +1,145 @@
+"""Тесты журнала изменений и восстановления после сбоя (journal.py)"""
+
+import os
+
+import journal
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from journal import (
+    JOURNAL_FILE,
+    OLD_JOURNAL_FILE,
+    SNAPSHOT_FILE,
+    FamilyJournal,
+    _journal_complete,
+    read_journal,
+    read_store,
+    write_store,
+)
+from writer import BackgroundWriter
+
+
+def state(store):
+    """Содержимое хранилища без учета порядка добавления"""
+    members = sorted(store.members, key=lambda member: member["id"])
+    relationships = sorted((rel["parent_id"], rel["child_id"]) for rel in store.relationships)
+    return members, relationships
+
+
+def open_journal(data_dir, compact_after=1000, delay=0.01):
+    """Записывает демо-данные и загружает их через журнал"""
+    if not os.path.exists(os.path.join(data_dir, SNAPSHOT_FILE)):
+        write_store(data_dir, DEMO_MEMBERS, DEMO_RELATIONSHIPS)
+    family_journal = FamilyJournal(data_dir, compact_after, BackgroundWriter(delay, max_delay=delay * 5))
+    return family_journal, family_journal.load()
+
+
+def make_edits(store, first_id, count):
+    """count правок разных видов, начиная с нового члена семьи first_id"""
+    for member_id in range(first_id, first_id + count):
+        store.add_member({"id": member_id, "name": f"Новый {member_id}", "birth_year": 2020, "gender": "Мужской"})
+        store.add_parent_link(1, member_id)
+        if member_id % 3 == 0:
+            store.remove_parent_link(1, member_id)
+        if member_id % 4 == 0:
+            store.remove_member(member_id)
+
+
+def journal_lines(data_dir, name=JOURNAL_FILE):
+    with open(os.path.join(data_dir, name), "rb") as f:
+        return f.read()
+
+
+def test_reload_gives_same_store(tmp_path):
+    family_journal, store = open_journal(tmp_path)
+    make_edits(store, 100, 10)
+    family_journal.close()
+
+    reloaded, records = read_store(tmp_path)
+    assert state(reloaded) == state(store)
+    assert len(records) == len(read_journal(os.path.join(tmp_path, JOURNAL_FILE)))
+
+    # Повторная загрузка целого журнала ничего не перезаписывает
+    before = journal_lines(tmp_path)
+    second_journal, second = open_journal(tmp_path)
+    assert state(second) == state(store)
+    assert journal_lines(tmp_path) == before
+    second_journal.close()
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    family_journal, store = open_journal(tmp_path)
+    make_edits(store, 100, 5)
+    family_journal.close()
+    expected = state(store)
+    path = os.path.join(tmp_path, JOURNAL_FILE)
+    count = len(read_journal(path))
+
+    # Сбой во время записи строки: последняя строка оборвана
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add_member", "member": {"id": 9')
+    assert len(read_journal(path)) == count
+    assert not _journal_complete(path, count)
+
+    family_journal, store = open_journal(tmp_path)
+    assert state(store) == expected
+    # Журнал переписан без оборванного хвоста, новые записи начинаются с новой строки
+    assert _journal_complete(path, count)
+    make_edits(store, 200, 2)
+    family_journal.close()
+    assert state(read_store(tmp_path)[0]) == state(store)
+
+
+def test_crash_before_old_journal_removed(tmp_path, monkeypatch):
+    family_journal, store = open_journal(tmp_path)
+    make_edits(store, 100, 8)
+    family_journal.flush()
+
+    # Снимок успевает замениться (os.replace), а удалить старый журнал - нет
+    def crash(path):
+        raise OSError("сбой перед удалением журнала")
+
+    monkeypatch.setattr(journal, "_remove", crash)
+    family_journal.snapshot()
+    family_journal.flush()
+    monkeypatch.undo()
+    assert isinstance(family_journal._writer.last_error, OSError)
+    assert os.path.exists(os.path.join(tmp_path, OLD_JOURNAL_FILE))
+    assert not os.path.exists(os.path.join(tmp_path, JOURNAL_FILE))
+
+    # Старый журнал воспроизводится поверх нового снимка, уже содержащего его правки
+    reloaded, records = read_store(tmp_path)
+    assert records
+    assert state(reloaded) == state(store)
+
+    second_journal, second = open_journal(tmp_path)
+    assert state(second) == state(store)
+    assert not os.path.exists(os.path.join(tmp_path, OLD_JOURNAL_FILE))
+    make_edits(second, 200, 3)
+    second_journal.close()
+    assert state(read_store(tmp_path)[0]) == state(second)
+
+
+def test_compaction_while_edits_continue(tmp_path):
+    # Длинная пауза записи: снимок остается в очереди, пока продолжаются правки
+    family_journal, store = open_journal(tmp_path, compact_after=6, delay=5)
+    make_edits(store, 100, 3)
+    assert os.path.exists(os.path.join(tmp_path, OLD_JOURNAL_FILE))
+    assert family_journal._writer.pending()
+
+    # Правки после сворачивания идут в новый журнал: после его сброса на диск
+    # сбой до записи снимка ничего не теряет
+    make_edits(store, 200, 1)
+    family_journal._sync_now()
+    assert family_journal._writer.pending()
+    assert read_journal(os.path.join(tmp_path, JOURNAL_FILE))
+    assert state(read_store(tmp_path)[0]) == state(store)
+
+    # Следующее сворачивание дожидается записи предыдущего снимка
+    make_edits(store, 300, 4)
+    assert family_journal.flush(timeout=10)
+    assert family_journal._writer.last_error is None
+    assert not os.path.exists(os.path.join(tmp_path, OLD_JOURNAL_FILE))
+    assert state(read_store(tmp_path)[0]) == state(store)
+
+    make_edits(store, 400, 2)
+    family_journal.close()
+    assert state(read_store(tmp_path)[0]) == state(store)
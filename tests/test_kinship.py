@@ -0,0 +1,147 @@
+"""Тесты определения родства (kinship.py, relations.py)"""
+
+import pytest
+
+from family_store import FamilyStore
+from kinship import DEFAULT_RELATION, SELF_RELATION, _rank, get_kinship_engine, kinship_label
+from reachability import collapsed_pedigree, walk_up
+from relations import classify_all_relations, classify_relations
+
+
+def make_store(links, genders=None):
+    """Хранилище из списка связей; все участники - мужчины, если не указано иное"""
+    genders = genders or {}
+    ids = sorted({member_id for link in links for member_id in link})
+    members = [
+        {"id": member_id, "name": f"Член семьи {member_id}", "birth_year": 1900 + member_id,
+         "gender": genders.get(member_id, "Мужской")}
+        for member_id in ids
+    ]
+    return FamilyStore(members, [{"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in links])
+
+
+def baseline_relation(store, central_id, person_id):
+    """Отношение так, как его определяла прежняя get_relation_to_person (только ближайшее окружение)"""
+    if central_id == person_id:
+        return SELF_RELATION
+    person = store.get(person_id)
+    male = person["gender"] == "Мужской"
+    parents = store.parents_of(central_id)
+    children = store.children_of(central_id)
+    siblings = [child_id for parent_id in parents for child_id in store.children_of(parent_id) if child_id != central_id]
+    grandparents = [grandparent_id for parent_id in parents for grandparent_id in store.parents_of(parent_id)]
+    uncles_aunts = [
+        uncle_aunt_id
+        for parent_id in parents
+        for grandparent_id in store.parents_of(parent_id)
+        for uncle_aunt_id in store.children_of(grandparent_id)
+        if uncle_aunt_id != parent_id
+    ]
+    cousins = [cousin_id for uncle_aunt_id in uncles_aunts for cousin_id in store.children_of(uncle_aunt_id)]
+    niblings = [child_id for sibling_id in siblings for child_id in store.children_of(sibling_id)]
+    for group, male_label, female_label in (
+        (parents, "Отец", "Мать"),
+        (store.spouses_of(central_id), "Муж", "Жена"),
+        (children, "Сын", "Дочь"),
+        (siblings, "Брат", "Сестра"),
+        (grandparents, "Дедушка", "Бабушка"),
+        (uncles_aunts, "Дядя", "Тетя"),
+        (cousins, "Двоюродный брат", "Двоюродная сестра"),
+        (niblings, "Племянник", "Племянница"),
+    ):
+        if person_id in group:
+            return male_label if male else female_label
+    return DEFAULT_RELATION
+
+
+def test_demo_relations_match_baseline(demo_store):
+    engine = get_kinship_engine(demo_store)
+    for central_id in demo_store.ids():
+        relations = classify_all_relations(demo_store, central_id)
+        for person_id in demo_store.ids():
+            expected = baseline_relation(demo_store, central_id, person_id)
+            if expected != DEFAULT_RELATION:
+                assert relations[person_id] == expected, (central_id, person_id)
+                assert engine.relation(central_id, person_id) == expected, (central_id, person_id)
+
+
+def test_demo_relations_beyond_baseline(demo_store):
+    relations = classify_all_relations(demo_store, 14)
+    # Прежде все они были просто "Родственник"
+    assert relations[3] == "Двоюродный брат"
+    assert relations[2] == DEFAULT_RELATION
+    assert relations[7] == DEFAULT_RELATION
+    assert classify_all_relations(demo_store, 21)[5] == DEFAULT_RELATION
+    assert classify_relations(demo_store, 3, [14, 21, 7]) == {14: "Двоюродный брат", 21: "Двоюродная сестра", 7: DEFAULT_RELATION}
+
+
+@pytest.mark.parametrize("distances, gender, label", [
+    ((1, 0), "Мужской", "Отец"),
+    ((3, 0), "Женский", "Прабабушка"),
+    ((0, 4), "Мужской", "Праправнук"),
+    ((1, 1), "Женский", "Сестра"),
+    ((3, 3), "Мужской", "Троюродный брат"),
+    ((2, 1), "Женский", "Тетя"),
+    ((3, 1), "Мужской", "Двоюродный дедушка"),
+    ((3, 2), "Мужской", "Двоюродный дядя"),
+    ((1, 3), "Женский", "Внучатая племянница"),
+    ((2, 3), "Мужской", "Двоюродный племянник"),
+    ((11, 11), "Мужской", None),
+])
+def test_kinship_label(distances, gender, label):
+    assert kinship_label(*distances, gender) == label
+
+
+def test_distant_relations():
+    # Два рода от общего предка 1: 1 -> 2 -> 4 -> 6 -> 8 и 1 -> 3 -> 5 -> 7 -> 9
+    store = make_store([(1, 2), (1, 3), (2, 4), (4, 6), (6, 8), (3, 5), (5, 7), (7, 9)], {5: "Женский"})
+    engine = get_kinship_engine(store)
+    assert engine.distances(8, 9) == (4, 4)
+    assert engine.relation(8, 9) == "Четвероюродный брат"
+    assert engine.relation(8, 7) == "Троюродный дядя"
+    assert engine.relation(8, 5) == "Троюродная бабушка"
+    assert engine.relation(8, 1) == "Прапрадедушка"
+    assert engine.relation(1, 8) == "Праправнук"
+    relations = classify_all_relations(store, 8)
+    assert relations[9] == "Четвероюродный брат"
+    assert relations[5] == "Троюродная бабушка"
+
+
+def test_nearest_common_ancestor_wins():
+    # Брак родственников: 4 и 5 - двоюродные, их сын 6 - правнук 1 по обеим линиям
+    store = make_store([(1, 2), (1, 3), (2, 4), (3, 5), (4, 6), (5, 6)], {5: "Женский"})
+    engine = get_kinship_engine(store)
+    assert engine.distances(6, 1) == (3, 0)
+    assert engine.relation(6, 5) == "Мать"
+    # Супружество важнее кровного родства, кроме родительского
+    assert engine.distances(4, 5) == (2, 2)
+    assert engine.relation(4, 5) == "Жена"
+
+
+def test_collapsed_pedigree_matches_brute_force():
+    # Встречный обход должен находить то же родство, что и пересечение полных множеств предков
+    store = FamilyStore(*collapsed_pedigree(600, 12))
+    engine = get_kinship_engine(store)
+    lineages = {member_id: {member_id: 0, **walk_up(store, member_id)} for member_id in store.ids()}
+    members = sorted(store.ids())
+    pairs = [(a, b) for a in members[::37] for b in members[::23]]
+    pairs += [(member_id, store.children_of(store.parents_of(member_id)[0])[-1]) for member_id in members[-40:]]
+    for central_id, person_id in pairs:
+        if central_id == person_id:
+            continue
+        central, person = lineages[central_id], lineages[person_id]
+        common = [(central[a], person[a]) for a in central if a in person]
+        expected = min(common, key=_rank) if common else None
+        assert engine.distances(central_id, person_id) == expected
+
+
+def test_unrelated_and_cyclic_data():
+    store = make_store([(1, 2), (3, 4), (5, 6), (6, 7), (7, 5)])
+    engine = get_kinship_engine(store)
+    assert engine.distances(2, 4) is None
+    assert engine.relation(2, 4) == DEFAULT_RELATION
+    assert engine.relation(2, 99) == DEFAULT_RELATION
+    # Цикл в данных не должен зацикливать определение родства
+    relations = classify_all_relations(store, 6)
+    assert relations[6] == SELF_RELATION
+    assert relations[2] == DEFAULT_RELATION
@@ -0,0 +1,90 @@
+"""Тесты поиска кратчайшего пути родства (kinship_path.py)"""
+
+import itertools
+import random
+
+import networkx as nx
+
+from family_store import FamilyStore
+from kinship_path import CHILD, PARENT, SPOUSE, KinshipPathFinder, get_kinship_path_finder, step_label
+from reachability import collapsed_pedigree
+
+
+def kinship_graph(store):
+    """Неориентированный граф связей родитель-ребенок и супружеских связей"""
+    graph = nx.Graph(list(store.edges()))
+    graph.add_nodes_from(store.ids())
+    graph.add_edges_from((member_id, spouse_id) for member_id in store.ids() for spouse_id in store.spouses_of(member_id))
+    return graph
+
+
+def assert_shortest(store, finder, pairs):
+    graph = kinship_graph(store)
+    for source_id, target_id in pairs:
+        path = finder.shortest_path(source_id, target_id)
+        if not nx.has_path(graph, source_id, target_id):
+            assert path is None
+            continue
+        assert path[0] == source_id and path[-1] == target_id
+        assert len(path) - 1 == nx.shortest_path_length(graph, source_id, target_id)
+        assert all(next_id in finder.neighbours(member_id) for member_id, next_id in zip(path, path[1:]))
+
+
+def test_demo_paths(demo_store):
+    finder = get_kinship_path_finder(demo_store)
+    assert_shortest(demo_store, finder, itertools.permutations(demo_store.ids(), 2))
+    assert finder.shortest_path(3, 3) == [3]
+    assert finder.steps([3, 2, 17]) == [PARENT, PARENT]
+    assert finder.describe([3, 2, 1]) == (
+        "Георгий Юрьевич Богданов → отец: Юрий Вячеславович Богданов → жена: Мария Ивановна Богданова"
+    )
+    assert finder.describe(finder.shortest_path(2, 3)) == "Юрий Вячеславович Богданов → сын: Георгий Юрьевич Богданов"
+
+
+def test_collapsed_pedigree_paths():
+    store = FamilyStore(*collapsed_pedigree(800, 12))
+    finder = KinshipPathFinder(store)
+    members = list(store.ids())
+    rng = random.Random(7)
+    assert_shortest(store, finder, [(rng.choice(members), rng.choice(members)) for _ in range(300)])
+
+
+def test_unrelated_and_missing_members():
+    members = [{"id": member_id, "name": f"Человек {member_id}", "birth_year": 1950, "gender": "Мужской"}
+               for member_id in range(1, 5)]
+    store = FamilyStore(members, [{"parent_id": 1, "child_id": 2}])
+    finder = KinshipPathFinder(store)
+    assert finder.shortest_path(1, 3) is None
+    assert finder.shortest_path(1, 99) is None
+    assert finder.shortest_path(99, 99) is None
+
+
+def test_cache_follows_store_changes(demo_store):
+    finder = get_kinship_path_finder(demo_store)
+    assert len(finder.shortest_path(14, 22)) > 3
+    assert finder.neighbours(14) == {13: PARENT, 12: PARENT}
+
+    # Новая связь: сразу появляются и ребенок, и супружество родителей
+    demo_store.add_member({"id": 23, "name": "Анна Овчинникова", "birth_year": 2020, "gender": "Женский"})
+    demo_store.add_parent_link(14, 23)
+    demo_store.add_parent_link(22, 23)
+    assert finder.neighbours(14)[23] == CHILD
+    assert finder.neighbours(14)[22] == SPOUSE
+    assert finder.shortest_path(14, 22) == [14, 22]
+    assert_shortest(demo_store, finder, itertools.permutations(demo_store.ids(), 2))
+
+    demo_store.remove_parent_link(22, 23)
+    assert 22 not in finder.neighbours(14)
+    assert finder.shortest_path(14, 22) != [14, 22]
+
+    demo_store.remove_member(23)
+    assert 23 not in finder.neighbours(14)
+    assert finder.shortest_path(14, 23) is None
+    assert_shortest(demo_store, finder, itertools.permutations(demo_store.ids(), 2))
+
+
+def test_step_label():
+    assert step_label(PARENT, "Мужской") == "Отец"
+    assert step_label(PARENT, "Женский") == "Мать"
+    assert step_label(CHILD, "Женский") == "Дочь"
+    assert step_label(SPOUSE, "Мужской") == "Муж"
@@ -0,0 +1,134 @@
+"""Тесты векторизованной раскладки концентрического древа (layout.py)"""
+
+import math
+
+import numpy as np
+import pytest
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from family_store import FamilyStore
+from layout import (
+    START_ANGLES,
+    collapse_edges,
+    concentric_layout,
+    index_edges,
+    merged_ring_coordinates,
+    ring_coordinates,
+    segment_coordinates,
+)
+from levels import compute_relation_levels
+from relations import classify_all_relations
+
+GROUPS = ["parents", "children", "spouse", "grandparents", "siblings", "niblings", "other"]
+
+
+def baseline_layout(node_ids, levels, groups):
+    """Раскладка так, как ее считал прежний цикл create_concentric_family_tree: {id: (x, y)}"""
+    nodes_by_level = {}
+    for node_id, level in zip(node_ids, levels):
+        nodes_by_level.setdefault(level, []).append(node_id)
+    group_of = dict(zip(node_ids, groups))
+    max_level = max(nodes_by_level)
+    radius_step = 1.0 / max_level if max_level > 0 else 1.0
+
+    positions = {}
+    for level, level_nodes in nodes_by_level.items():
+        if level == 0:
+            for node_id in level_nodes:
+                positions[node_id] = (0, 0)
+            continue
+        radius = level * radius_step
+        grouped_nodes = {}
+        for node_id in level_nodes:
+            grouped_nodes.setdefault(group_of[node_id], []).append(node_id)
+        for group, group_nodes in grouped_nodes.items():
+            start_angle = START_ANGLES.get(level, {}).get(group, 0)
+            angle_step = 360 / max(20, len(level_nodes))
+            for i, node_id in enumerate(group_nodes):
+                angle = (start_angle + i * angle_step) % 360
+                positions[node_id] = (radius * math.cos(math.radians(angle)), radius * math.sin(math.radians(angle)))
+    return positions
+
+
+def assert_matches_baseline(node_ids, levels, groups):
+    x, y, max_level = concentric_layout(levels, groups)
+    expected = baseline_layout(node_ids, levels, groups)
+    assert max_level == max(levels)
+    for node_id, node_x, node_y in zip(node_ids, x, y):
+        assert (node_x, node_y) == pytest.approx(expected[node_id], abs=1e-12), node_id
+
+
+def relation_group(relation):
+    """Упрощенная группировка отношений для проверки (в приложении - get_relation_group)"""
+    for group, words in (("parents", ("Отец", "Мать")), ("children", ("Сын", "Дочь")), ("spouse", ("Муж", "Жена")),
+                         ("grandparents", ("Дедушка", "Бабушка")), ("siblings", ("Брат", "Сестра")),
+                         ("niblings", ("Племянник", "Племянница"))):
+        if relation in words:
+            return group
+    return "other"
+
+
+def test_demo_layout_matches_baseline():
+    store = FamilyStore([dict(member) for member in DEMO_MEMBERS], DEMO_RELATIONSHIPS)
+    for central_id in (3, 1, 17, 21):
+        levels = compute_relation_levels(store, central_id)
+        relations = classify_all_relations(store, central_id)
+        node_ids = list(store.ids())
+        assert_matches_baseline(
+            node_ids,
+            [levels.get(member_id, 4) for member_id in node_ids],
+            [relation_group(relations[member_id]) for member_id in node_ids],
+        )
+
+
+def test_random_layout_matches_baseline():
+    rng = np.random.default_rng(7)
+    count = 2000
+    levels = rng.integers(1, 7, count)
+    levels[0] = 0
+    groups = rng.choice(GROUPS, count)
+    assert_matches_baseline(list(range(count)), levels.tolist(), groups.tolist())
+
+
+def test_empty_and_single_node_layout():
+    x, y, max_level = concentric_layout([], [])
+    assert len(x) == len(y) == 0 and max_level == 0
+    x, y, max_level = concentric_layout([0], ["other"])
+    assert (x.tolist(), y.tolist(), max_level) == ([0.0], [0.0], 0)
+
+
+def test_ring_coordinates_match_baseline():
+    radius = 0.75
+    xs, ys = ring_coordinates(radius)
+    expected_x = [radius * math.cos(math.radians(angle)) for angle in range(0, 361)]
+    expected_y = [radius * math.sin(math.radians(angle)) for angle in range(0, 361)]
+    assert xs == pytest.approx(expected_x) and ys == pytest.approx(expected_y)
+
+    xs, ys = merged_ring_coordinates([0.5, 1.0])
+    assert len(xs) == 2 * 362
+    assert np.isnan(xs[361]) and np.isnan(ys[-1])
+    assert xs[362:723] == pytest.approx(ring_coordinates(1.0)[0])
+
+
+def test_edges_skip_missing_nodes():
+    node_ids = np.array([10, 30, 20])
+    source, target = index_edges(node_ids, [(10, 20), (20, 30), (20, 99), (42, 10)])
+    assert source.tolist() == [0, 2] and target.tolist() == [2, 1]
+    source, target = index_edges(node_ids, [])
+    assert len(source) == len(target) == 0
+
+
+def test_segment_coordinates():
+    x = np.array([0.0, 1.0, 2.0])
+    y = np.array([0.0, -1.0, -2.0])
+    xs, ys = segment_coordinates(x, y, np.array([0, 1]), np.array([1, 2]))
+    assert xs[[0, 1, 3, 4]].tolist() == [0.0, 1.0, 1.0, 2.0]
+    assert ys[[0, 1, 3, 4]].tolist() == [0.0, -1.0, -1.0, -2.0]
+    assert np.isnan(xs[2]) and np.isnan(ys[5])
+
+
+def test_collapse_edges():
+    # Члены семьи 1 и 2 объединены в узел 1: связь внутри узла исчезает, повторы объединяются
+    node_of = np.array([0, 1, 1, 2])
+    source, target = collapse_edges(np.array([0, 0, 1, 1, 2]), np.array([1, 2, 2, 3, 3]), node_of)
+    assert list(zip(source.tolist(), target.tolist())) == [(0, 1), (1, 2)]
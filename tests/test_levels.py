@@ -0,0 +1,94 @@
+"""Тесты уровней родства (levels.py)"""
+
+from family_store import FamilyStore
+from levels import LevelCache, compute_relation_levels, window_edges
+
+
+def baseline_levels(store, central_id):
+    """
+    Уровни так, как их назначала прежняя calculate_relation_levels: 1 - родители,
+    дети и супруги, 2 - братья, сестры и бабушки с дедушками, 3 - дяди, тети,
+    племянники и двоюродные; остальные - без уровня.
+    """
+    levels = {central_id: 0}
+    parents = store.parents_of(central_id)
+    children = store.children_of(central_id)
+    spouses = [parent_id for child_id in children for parent_id in store.parents_of(child_id) if parent_id != central_id]
+    siblings = [child_id for parent_id in parents for child_id in store.children_of(parent_id) if child_id != central_id]
+    grandparents = [grandparent_id for parent_id in parents for grandparent_id in store.parents_of(parent_id)]
+    uncles_aunts = [
+        uncle_aunt_id
+        for parent_id in parents
+        for grandparent_id in store.parents_of(parent_id)
+        for uncle_aunt_id in store.children_of(grandparent_id)
+        if uncle_aunt_id != parent_id
+    ]
+    niblings = [child_id for sibling_id in siblings for child_id in store.children_of(sibling_id)]
+    cousins = [cousin_id for uncle_aunt_id in uncles_aunts for cousin_id in store.children_of(uncle_aunt_id)]
+    for level, group in ((1, parents + children + spouses), (2, siblings + grandparents), (3, uncles_aunts + niblings + cousins)):
+        for member_id in group:
+            levels[member_id] = level
+    return levels, set(cousins)
+
+
+def test_demo_levels_match_baseline(demo_store):
+    for central_id in demo_store.ids():
+        levels = compute_relation_levels(demo_store, central_id, max_depth=8)
+        expected, cousins = baseline_levels(demo_store, central_id)
+        for member_id, level in expected.items():
+            # Уровень - число шагов родства, поэтому двоюродные теперь на круг дальше
+            assert levels[member_id] == (4 if member_id in cousins - {central_id} else level), (central_id, member_id)
+
+
+def test_demo_levels_beyond_baseline(demo_store):
+    levels = compute_relation_levels(demo_store, 3, max_depth=8)
+    assert levels == {
+        3: 0,
+        1: 1, 2: 1,
+        4: 2, 5: 2, 6: 2, 16: 2, 17: 2,
+        12: 3, 18: 3, 19: 3,
+        13: 4, 14: 4, 15: 4, 20: 4, 21: 4, 22: 4,
+    }
+    assert compute_relation_levels(demo_store, 3, max_depth=2) == {3: 0, 1: 1, 2: 1, 4: 2, 5: 2, 6: 2, 16: 2, 17: 2}
+
+
+def test_several_centers(demo_store):
+    levels = compute_relation_levels(demo_store, [3, 21], max_depth=1)
+    assert levels == {3: 0, 21: 0, 1: 1, 2: 1, 19: 1, 20: 1}
+
+
+def test_bad_data():
+    store = FamilyStore(
+        [{"id": member_id, "name": f"Член семьи {member_id}", "birth_year": 1900, "gender": "Мужской"}
+         for member_id in range(1, 5)],
+        [{"parent_id": 1, "child_id": 2}, {"parent_id": 2, "child_id": 3}, {"parent_id": 3, "child_id": 1},
+         {"parent_id": 4, "child_id": 4}, {"parent_id": 3, "child_id": 9}],
+    )
+    # Циклы, связь с самим собой и связь с отсутствующим членом семьи не зацикливают обход
+    assert compute_relation_levels(store, 1) == {1: 0, 2: 1, 3: 1, 9: 2}
+    assert compute_relation_levels(store, 4) == {4: 0}
+    assert compute_relation_levels(store, 42) == {42: 0}
+    assert compute_relation_levels(store, None) == {}
+
+
+def test_window_edges(demo_store):
+    levels = compute_relation_levels(demo_store, 3, max_depth=1)
+    parent_edges, marriage_pairs = window_edges(demo_store, levels)
+    assert sorted(parent_edges) == [(1, 3), (2, 3)]
+    assert marriage_pairs == [(1, 2)]
+
+
+def test_level_cache_is_keyed_by_version(demo_store):
+    cache = LevelCache(max_entries=2)
+    calls = []
+
+    def compute(demo_store, central_id, max_depth):
+        calls.append(central_id)
+        return compute_relation_levels(demo_store, central_id, max_depth)
+
+    first = cache.get(demo_store, 3, compute=compute)
+    assert cache.get(demo_store, 3, compute=compute) is first
+    demo_store.add_member({"id": 23, "name": "Анна Богданова", "birth_year": 2030, "gender": "Женский"})
+    demo_store.add_parent_link(3, 23)
+    assert cache.get(demo_store, 3, compute=compute)[23] == 1
+    assert calls == [3, 3]
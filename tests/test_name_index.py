@@ -0,0 +1,106 @@
+"""Тесты поискового индекса имен (name_index.py)"""
+
+import pytest
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from family_store import FamilyStore
+from name_index import _one_edit, get_name_index, name_words
+
+
+def names(store, ids):
+    return [store.get(member_id)["name"] for member_id in ids]
+
+
+@pytest.fixture
+def demo_index():
+    store = FamilyStore(DEMO_MEMBERS, DEMO_RELATIONSHIPS)
+    return store, get_name_index(store)
+
+
+def many_names_store(count=3000):
+    """Много людей с повторяющимися именами, чтобы короткие имена встречались часто"""
+    first_names = ["Иван", "Инна", "Ирина", "Игорь", "Илья", "Юрий", "Олег", "Ян", "Ева", "Лев"]
+    surnames = ["Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов"]
+    members = [
+        {
+            "id": member_id,
+            "name": f"{first_names[member_id % len(first_names)]} {surnames[member_id % 7 % len(surnames)]}",
+            "birth_year": 1900 + member_id % 100,
+            "gender": "Мужской",
+        }
+        for member_id in range(1, count + 1)
+    ]
+    return FamilyStore(members)
+
+
+def test_name_words():
+    assert name_words("Алёна  Петрова-Водкина") == ["алена", "петрова", "водкина"]
+
+
+def test_prefix_search(demo_index):
+    store, index = demo_index
+    assert names(store, index.search("Георгий Бог")) == ["Георгий Юрьевич Богданов"]
+    # Слова запроса могут идти в любом порядке и быть началами слов
+    assert names(store, index.search("бог георг")) == ["Георгий Юрьевич Богданов"]
+    assert "Наталья Хомякова" in names(store, index.search("наталья"))
+    assert len(index.search("бог", limit=2)) == 2
+    assert index.search("") == []
+
+
+def test_folding_and_layout(demo_index):
+    store, index = demo_index
+    assert index.search("юрьевич") == index.search("ЮРЬЕВИЧ")
+    # Набор в латинской раскладке
+    assert names(store, index.search("ujhubq"))[0] == "Георгий Юрьевич Богданов"
+
+
+def test_typos_in_long_words(demo_index):
+    store, index = demo_index
+    assert names(store, index.search("Натлья"))[0].startswith("Наталья")
+    assert names(store, index.search("Гоергий")) == ["Георгий Юрьевич Богданов"]
+
+
+def test_typos_in_short_words(demo_index):
+    store, index = demo_index
+    # Одна опечатка в коротком слове портит большую часть триграмм
+    assert names(store, index.search("Юрй")) == ["Юрий Вячеславович Богданов"]
+    assert "Иван Петрович Шаньшеров" in names(store, index.search("Ивна"))
+
+
+def test_short_typos_among_many_names():
+    store = many_names_store()
+    index = get_name_index(store)
+    for query, expected in (("Ивна", "Иван"), ("Юрй", "Юрий"), ("Олге", "Олег"), ("Лве", "Лев")):
+        found = names(store, index.search(query, limit=50))
+        assert any(name.startswith(expected + " ") for name in found), query
+    # Совпадения по обоим словам идут первыми; "Инна" тоже отличается от "Ивна" одной правкой
+    assert set(names(store, index.search("Ивна Петров", limit=20))) <= {"Иван Петров", "Инна Петров"}
+    assert index.search("Зкщ") == []
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("иван", "иван", True),
+    ("юрй", "юрий", True),
+    ("ивна", "иван", True),
+    ("инна", "иван", False),
+    ("ивн", "иван", True),
+    ("лве", "лев", True),
+    ("кот", "ток", False),
+    ("ян", "", False),
+])
+def test_one_edit(a, b, expected):
+    assert _one_edit(a, b) == expected
+    assert _one_edit(b, a) == expected
+
+
+def test_index_follows_store_changes(demo_index):
+    store, index = demo_index
+    count = len(index)
+    store.add_member({"id": 500, "name": "Ёлкин Зиновий", "birth_year": 2000, "gender": "Мужской"})
+    assert index.search("елкин") == [500]
+    assert index.search("Зинвий") == [500]
+    assert len(index) == count + 1
+    store.remove_member(500)
+    assert index.search("елкин") == []
+    assert index.search("Зиновий") == []
+    assert len(index) == count
@@ -0,0 +1,106 @@
+"""Тесты ленивых запросов предков и потомков (pedigree.py)"""
+
+from collections import deque
+
+import pytest
+
+from family_store import FamilyStore
+from pedigree import DOWN, UP, PedigreeIndex, get_pedigree_index
+from reachability import collapsed_pedigree, walk_up
+
+
+def make_store(edges):
+    member_ids = sorted({member_id for edge in edges for member_id in edge})
+    members = [{"id": member_id, "name": f"Человек {member_id}", "birth_year": 1900 + member_id, "gender": "Мужской"}
+               for member_id in member_ids]
+    return FamilyStore(members, [{"parent_id": parent_id, "child_id": child_id} for parent_id, child_id in edges])
+
+
+def walk_down(store, member_id):
+    """Потомки обходом вниз: {id потомка: ближайшее поколение}"""
+    found = {}
+    queue = deque((child_id, 1) for child_id in store.children_of(member_id))
+    while queue:
+        child_id, generation = queue.popleft()
+        if child_id not in found and child_id != member_id:
+            found[child_id] = generation
+            queue.extend((grandchild_id, generation + 1) for grandchild_id in store.children_of(child_id))
+    return found
+
+
+def test_demo_counts(demo_store):
+    pedigree = get_pedigree_index(demo_store)
+    # Георгий Богданов: родители и две пары бабушек и дедушек, детей нет
+    assert pedigree.ancestor_counts(3) == [2, 4]
+    assert pedigree.descendant_counts(3) == []
+    assert pedigree.descendant_counts(17) == [3, 4]
+    assert pedigree.ancestor_counts(3, max_generations=1) == [2]
+    assert dict(pedigree.ancestors(3)) == walk_up(demo_store, 3)
+
+
+def test_collapsed_pedigree_matches_brute_force():
+    # Браки родственников: человек, достижимый несколькими путями, учитывается один раз
+    store = FamilyStore(*collapsed_pedigree(400, 10))
+    pedigree = get_pedigree_index(store)
+    for member_id in list(store.ids())[::7]:
+        assert dict(pedigree.ancestors(member_id)) == walk_up(store, member_id)
+        assert dict(pedigree.descendants(member_id)) == walk_down(store, member_id)
+        assert len(pedigree.ancestor_counts(member_id)) == max(walk_up(store, member_id).values(), default=0)
+
+
+def test_generations_are_expanded_lazily():
+    store = make_store([(member_id + 1, member_id) for member_id in range(1, 50)])
+    pedigree = PedigreeIndex(store)
+    first = next(pedigree.ancestors(1))
+    assert first == (2, 1)
+    assert len(pedigree._closures[(1, UP)].layers) == 1
+    # Более глубокий запрос дополняет уже раскрытые поколения
+    assert pedigree.ancestor_counts(1, max_generations=5) == [1] * 5
+    assert len(pedigree._closures[(1, UP)].layers) == 5
+    assert pedigree.ancestor_counts(1) == [1] * 49
+
+
+def test_link_changes_reset_only_affected_entries():
+    store = make_store([(1, 2), (2, 3), (4, 5)])
+    pedigree = PedigreeIndex(store)
+    assert pedigree.ancestor_counts(3) == [1, 1]
+    assert pedigree.descendant_counts(1) == [1, 1]
+    assert pedigree.ancestor_counts(5) == [1]
+
+    store.add_parent_link(4, 2)
+    assert (5, UP) in pedigree._closures
+    assert (3, UP) not in pedigree._closures
+    assert pedigree.ancestor_counts(3) == [1, 2]
+    assert pedigree.descendant_counts(4) == [2, 1]
+
+    store.remove_parent_link(1, 2)
+    assert pedigree.descendant_counts(1) == []
+    assert pedigree.ancestor_counts(3) == [1, 1]
+
+
+def test_iterator_fails_after_change():
+    store = make_store([(1, 2), (2, 3), (3, 4)])
+    pedigree = PedigreeIndex(store)
+    iterator = pedigree.generations(4, UP)
+    assert next(iterator) == (1, (3,))
+    store.add_parent_link(1, 3)
+    with pytest.raises(RuntimeError):
+        next(iterator)
+
+    descendants = pedigree.descendants(1)
+    next(descendants)
+    store.remove_member(1)
+    with pytest.raises(RuntimeError):
+        list(descendants)
+    assert pedigree.descendant_counts(1) == []
+
+
+def test_least_recently_used_entries_are_evicted():
+    store = make_store([(member_id, member_id + 1) for member_id in range(1, 20)])
+    pedigree = PedigreeIndex(store, max_entries=3)
+    for member_id in (1, 2, 3):
+        pedigree.descendant_counts(member_id)
+    pedigree.descendant_counts(1)
+    pedigree.descendant_counts(4)
+    assert len(pedigree) == 3
+    assert set(pedigree._closures) == {(3, DOWN), (1, DOWN), (4, DOWN)}
@@ -0,0 +1,133 @@
+"""Тесты индекса предков и пакетной проверки циклов (reachability.py)"""
+
+import networkx as nx
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from family_store import FamilyStore
+from reachability import (
+    AncestorIndex,
+    benchmark,
+    collapsed_pedigree,
+    find_cycle_edges,
+    get_ancestor_index,
+    validate_edges,
+)
+
+
+def brute_force_ancestors(store, member_id, graph=None):
+    """Предки обходом графа networkx: {id предка: число поколений по кратчайшему пути}"""
+    graph = graph if graph is not None else nx.DiGraph([(child_id, parent_id) for parent_id, child_id in store.edges()])
+    if member_id not in graph:
+        return {}
+    distances = nx.single_source_shortest_path_length(graph, member_id)
+    del distances[member_id]
+    return distances
+
+
+def assert_matches_brute_force(store, index):
+    graph = nx.DiGraph([(child_id, parent_id) for parent_id, child_id in store.edges()])
+    for member_id in store.ids():
+        expected = brute_force_ancestors(store, member_id, graph)
+        assert dict(index.ancestor_distances(member_id)) == expected
+        assert index.ancestors(member_id) == expected.keys()
+
+
+def test_closure_on_demo_data(demo_store):
+    index = get_ancestor_index(demo_store)
+    assert_matches_brute_force(demo_store, index)
+    assert index.ancestors(3) == {1, 2, 5, 6, 16, 17}
+    assert index.generations(17, 3) == 2
+    assert index.generations(3, 17) is None
+
+
+def test_cycle_checks(demo_store):
+    index = get_ancestor_index(demo_store)
+    # Внук не может стать родителем бабушки, а повторная связь с родителем цикла не создает
+    assert index.would_create_cycle(3, 5)
+    assert index.would_create_cycle(4, 4)
+    assert not index.would_create_cycle(5, 3)
+    assert not index.would_create_cycle(13, 21)
+
+
+def test_incremental_updates_match_rebuild(demo_store):
+    index = get_ancestor_index(demo_store)
+    index.ancestors(3)
+
+    demo_store.add_member({"id": 23, "name": "Анна Богданова", "birth_year": 2030, "gender": "Женский"})
+    demo_store.add_parent_link(3, 23)
+    demo_store.add_parent_link(21, 23)
+    assert_matches_brute_force(demo_store, index)
+    assert index.generations(17, 23) == 3
+
+    demo_store.remove_parent_link(2, 3)
+    assert_matches_brute_force(demo_store, index)
+    assert not index.is_ancestor(2, 23)
+    assert index.generations(17, 23) == 3
+
+    demo_store.remove_member(19)
+    assert_matches_brute_force(demo_store, index)
+    assert_matches_brute_force(demo_store, AncestorIndex(demo_store))
+
+
+def test_index_survives_a_cycle_in_data():
+    store = FamilyStore(
+        [{"id": member_id, "name": f"Член семьи {member_id}", "birth_year": 1900, "gender": "Мужской"}
+         for member_id in range(1, 5)],
+        [{"parent_id": 1, "child_id": 2}, {"parent_id": 2, "child_id": 3}, {"parent_id": 3, "child_id": 4}],
+    )
+    index = get_ancestor_index(store)
+    assert index.is_ancestor(1, 4)
+    # Связь мимо проверки создает цикл - индекс перестраивается при следующем запросе
+    store.add_parent_link(4, 1)
+    assert index.is_ancestor(4, 2)
+    assert index.would_create_cycle(2, 3)
+
+
+def test_find_cycle_edges():
+    edges = [(1, 2), (2, 3), (3, 1), (3, 4), (4, 5), (6, 6), (7, 8)]
+    assert sorted(find_cycle_edges(edges)) == [(1, 2), (2, 3), (3, 1), (6, 6)]
+    assert find_cycle_edges((rel["parent_id"], rel["child_id"]) for rel in DEMO_RELATIONSHIPS) == []
+
+
+def test_validate_edges_reports_only_new_links(demo_store):
+    assert validate_edges(demo_store, [(3, 23), (21, 23)]) == []
+    assert sorted(validate_edges(demo_store, [(3, 1), (13, 21)])) == [(3, 1)]
+
+
+def test_collapsed_pedigree():
+    store = FamilyStore(*collapsed_pedigree(600, 12))
+    index = get_ancestor_index(store)
+    assert_matches_brute_force(store, index)
+    # Через несколько поколений у всех общие предки
+    assert len(index.ancestors(600)) > 200
+    expected = brute_force_ancestors(store, 600)
+    assert {ancestor_id: index.generations(ancestor_id, 600) for ancestor_id in expected} == expected
+    assert index.generations(600, 1) is None
+
+    # Новый основатель рода над первым поколением и его удаление
+    store.add_member({"id": 601, "name": "Основатель", "birth_year": 1400, "gender": "Мужской"})
+    store.add_parent_link(601, 1)
+    store.add_parent_link(601, 2)
+    assert index.is_ancestor(601, 600) == (1 in expected or 2 in expected)
+    assert_matches_brute_force(store, index)
+    store.remove_parent_link(601, 1)
+    store.remove_parent_link(store.parents_of(300)[0], 300)
+    assert_matches_brute_force(store, index)
+    store.remove_member(601)
+    assert_matches_brute_force(store, index)
+    assert_matches_brute_force(store, AncestorIndex(store))
+
+
+def test_many_removals_trigger_rebuild():
+    store = FamilyStore(*collapsed_pedigree(200, 5))
+    index = get_ancestor_index(store)
+    index.ancestors(200)
+    for member_id in range(1, 101):
+        store.remove_member(member_id)
+    assert_matches_brute_force(store, index)
+
+
+def test_benchmark_report():
+    report = benchmark(1000, 8)
+    assert report["members"] == 1000
+    assert report["memory_mb"] >= 0 and report["build_s"] >= 0
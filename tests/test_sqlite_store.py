@@ -0,0 +1,54 @@
+"""Тесты запросов к базе SQLite (sqlite_store.py)"""
+
+import pytest
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from family_store import FamilyStore
+from levels import compute_relation_levels
+from pedigree import get_pedigree_index
+from sqlite_store import SQLiteBackend
+
+
+@pytest.fixture
+def demo(tmp_path):
+    store = FamilyStore([dict(member) for member in DEMO_MEMBERS], DEMO_RELATIONSHIPS)
+    backend = SQLiteBackend(str(tmp_path / "family.db")).attach(store)
+    yield store, backend
+    backend.close()
+
+
+@pytest.mark.parametrize("max_depth", [1, 2, 4, 8])
+def test_window_matches_relation_levels(demo, max_depth):
+    store, backend = demo
+    for member in store:
+        assert backend.window(member["id"], max_depth) == compute_relation_levels(store, member["id"], max_depth)
+
+
+def test_window_follows_store_changes(demo):
+    store, backend = demo
+    store.add_member({"id": 23, "name": "Анна Богданова", "birth_year": 2030, "gender": "Женский"})
+    store.add_parent_link(3, 23)
+    store.add_parent_link(21, 23)
+    assert backend.window(3, 2) == compute_relation_levels(store, 3, 2)
+    # Полина стала супругой Георгия через общего ребенка
+    assert backend.window(3, 1)[21] == 1
+
+    store.remove_parent_link(21, 23)
+    assert backend.window(3, 4) == compute_relation_levels(store, 3, 4)
+
+
+def test_ancestors_and_descendants_match_pedigree(demo):
+    store, backend = demo
+    pedigree = get_pedigree_index(store)
+    for member in store:
+        member_id = member["id"]
+        assert backend.ancestors(member_id) == dict(pedigree.ancestors(member_id))
+        assert backend.descendants(member_id) == dict(pedigree.descendants(member_id))
+
+
+def test_find_by_name(demo):
+    _, backend = demo
+    found = backend.find_by_name("Наталья")
+    assert [member["id"] for member in found] == [12, 7]
+    assert backend.find_by_name("Наталья Хомякова")[0]["birth_year"] == 1962
+    assert backend.find_by_name("Нет такого") == []
@@ -0,0 +1,107 @@
+"""Тесты массового импорта и экспорта таблиц (table_io.py)"""
+
+import pytest
+
+from demo_data import DEMO_MEMBERS, DEMO_RELATIONSHIPS
+from journal import read_store, write_store
+from table_io import export_tables, import_tables
+
+MEMBERS_CSV = """id,name,birth_year,gender
+1,Иван Петров,1950,Мужской
+2,Мария Петрова,1952,Женский
+3,Олег Петров,1980,Мужской
+abc,Без номера,1990,Мужской
+4,Дробный год,1990.5,Мужской
+5,Без пола,1990,
+3,Повтор номера,1981,Мужской
+6,Олег Петров,1980,Мужской
+7,Анна Петрова,2005,Женский
+8,Петр Петров,2007,Мужской
+100,Уже есть,1930,Женский
+9,Старый сын,1900,Мужской
+"""
+
+LINKS_CSV = """parent_id,child_id
+1,3
+2,3
+1,3
+3,3
+3,42
+3,7
+3,8
+7,8
+1,9
+x,3
+100,8
+"""
+
+
+def write_text(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    path = str(tmp_path / "data")
+    write_store(path, [{"id": 100, "name": "Уже есть", "birth_year": 1930, "gender": "Женский"}], [])
+    return path
+
+
+@pytest.mark.parametrize("chunk_rows", [3, 200_000])
+def test_bad_dataset(tmp_path, data_dir, chunk_rows):
+    report = import_tables(
+        write_text(tmp_path / "members.csv", MEMBERS_CSV),
+        write_text(tmp_path / "links.csv", LINKS_CSV),
+        data_dir,
+        chunk_rows=chunk_rows,
+    )
+    # Номера строк данных без заголовка: "abc", дробный год и пустой пол
+    assert report["invalid_members"] == {"count": 3, "examples": [4, 5, 6]}
+    assert report["invalid_links"] == {"count": 1, "examples": [10]}
+    assert report["duplicate_ids"]["examples"] == [[3, "Повтор номера"], [100, "Уже есть"]]
+    assert report["duplicate_members"]["examples"] == [[6, "Олег Петров", 1980]]
+    assert report["self_links"]["examples"] == [[3, 3]]
+    assert report["duplicate_links"]["examples"] == [[1, 3]]
+    assert report["dangling"]["examples"] == [[3, 42]]
+    assert report["birth_order"]["examples"] == [[1, 9]]
+    # У Петра уже два родителя (3 и 7) - связь с третьим отброшена
+    assert report["extra_parents"]["examples"] == [[100, 8]]
+    assert report["cycles"]["count"] == 0
+    assert (report["members"], report["relationships"]) == (6, 5)
+
+    store, _ = read_store(data_dir)
+    assert sorted(store.ids()) == [1, 2, 3, 7, 8, 9, 100]
+    assert store.get(100)["name"] == "Уже есть"
+    assert sorted((rel["parent_id"], rel["child_id"]) for rel in store.relationships) == [
+        (1, 3), (2, 3), (3, 7), (3, 8), (7, 8)
+    ]
+
+
+@pytest.mark.parametrize("extension", ["csv", "parquet"])
+def test_demo_round_trip(tmp_path, extension):
+    if extension == "parquet":
+        pytest.importorskip("pyarrow")
+    source_dir = str(tmp_path / "source")
+    target_dir = str(tmp_path / "target")
+    write_store(source_dir, [dict(member) for member in DEMO_MEMBERS], DEMO_RELATIONSHIPS)
+
+    members_path = str(tmp_path / f"members.{extension}")
+    links_path = str(tmp_path / f"relationships.{extension}")
+    assert export_tables(members_path, links_path, source_dir) == {
+        "members": len(DEMO_MEMBERS), "relationships": len(DEMO_RELATIONSHIPS)
+    }
+    report = import_tables(members_path, links_path, target_dir)
+    assert (report["members"], report["relationships"]) == (len(DEMO_MEMBERS), len(DEMO_RELATIONSHIPS))
+
+    store, _ = read_store(target_dir)
+    assert store.members == DEMO_MEMBERS
+    assert store.relationships == DEMO_RELATIONSHIPS
+
+
+def test_import_members_without_links(tmp_path, data_dir):
+    members_path = write_text(tmp_path / "members.csv", "id,name,birth_year,gender\n1,Иван Петров,1950,Мужской\n")
+    report = import_tables(members_path, None, data_dir)
+    assert (report["members"], report["relationships"]) == (1, 0)
+    store, _ = read_store(data_dir)
+    assert sorted(store.ids()) == [1, 100]
@@ -0,0 +1,73 @@
+"""Тесты фоновой записи с объединением запросов (writer.py)"""
+
+import threading
+import time
+
+from writer import BackgroundWriter
+
+
+def test_same_key_tasks_are_coalesced():
+    writer = BackgroundWriter(delay=0.05, max_delay=1.0)
+    calls = []
+    for number in range(20):
+        writer.submit("sync", lambda number=number: calls.append(("sync", number)))
+    writer.submit("snapshot", lambda: calls.append(("snapshot", 0)))
+    assert writer.pending()
+    assert writer.flush(timeout=5)
+    # Из одинаковых задач выполняется только последняя, разные ключи не объединяются
+    assert calls == [("sync", 19), ("snapshot", 0)]
+    assert not writer.pending()
+
+
+def test_delay_restarts_until_max_delay():
+    writer = BackgroundWriter(delay=0.1, max_delay=0.4)
+    done = threading.Event()
+    started = time.monotonic()
+    # Запросы чаще delay откладывают запись, но не дольше max_delay после первого
+    while not done.is_set() and time.monotonic() - started < 2:
+        writer.submit("sync", done.set)
+        time.sleep(0.02)
+    elapsed = time.monotonic() - started
+    assert done.is_set()
+    assert 0.3 <= elapsed < 1.0
+    assert writer.flush(timeout=5)
+
+
+def test_task_waits_for_delay_without_flush():
+    writer = BackgroundWriter(delay=0.2, max_delay=1.0)
+    done = threading.Event()
+    writer.submit("sync", done.set)
+    assert not done.wait(0.1)
+    assert done.wait(1.0)
+
+
+def test_flush_runs_pending_tasks_immediately():
+    writer = BackgroundWriter(delay=10, max_delay=10)
+    calls = []
+    writer.submit("sync", lambda: calls.append("sync"))
+    started = time.monotonic()
+    assert writer.flush(timeout=5)
+    assert calls == ["sync"]
+    assert time.monotonic() - started < 1.0
+
+
+def test_flush_timeout_and_errors():
+    writer = BackgroundWriter(delay=0, max_delay=0)
+    release = threading.Event()
+    writer.submit("slow", release.wait)
+    # Задача еще выполняется - flush возвращает False по истечении timeout
+    assert not writer.flush(timeout=0.1)
+    assert writer.pending()
+    release.set()
+    assert writer.flush(timeout=5)
+
+    # Ошибка задачи сохраняется и не останавливает поток записи
+    def fail():
+        raise OSError("диск недоступен")
+
+    calls = []
+    writer.submit("fail", fail)
+    writer.submit("sync", lambda: calls.append("sync"))
+    assert writer.flush(timeout=5)
+    assert isinstance(writer.last_error, OSError)
+    assert calls == ["sync"]
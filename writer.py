@@ -0,0 +1,94 @@
+"""
+Фоновая запись на диск с объединением частых запросов.
+
+Обработчики кнопок Streamlit ставят задачи записи в очередь и сразу
+продолжают работу; поток записи выполняет их после паузы в delay секунд
+(но не позже max_delay секунд после первого запроса). Задачи с одинаковым
+ключом объединяются: выполняется только последняя поставленная.
+"""
+
+import atexit
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+
+class BackgroundWriter:
+    """
+    Поток отложенной записи.
+
+    submit(key, task) ставит задачу в очередь, flush() дожидается выполнения
+    всех поставленных задач. Ошибка задачи не останавливает поток: последняя
+    ошибка сохраняется в last_error.
+    """
+
+    def __init__(self, delay=0.2, max_delay=2.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.last_error = None
+        self._tasks = OrderedDict()
+        self._condition = threading.Condition()
+        self._first_request = None
+        self._deadline = None
+        self._busy = False
+        self._thread = None
+        atexit.register(self.flush)
+
+    def submit(self, key, task):
+        """Ставит задачу в очередь; задача с тем же ключом заменяет ранее поставленную"""
+        with self._condition:
+            now = time.monotonic()
+            self._tasks[key] = task
+            self._tasks.move_to_end(key)
+            if self._first_request is None:
+                self._first_request = now
+            self._deadline = min(now + self.delay, self._first_request + self.max_delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="family-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Выполняет поставленные задачи без ожидания паузы и дожидается их завершения.
+
+        Returns:
+            bool: True, если все задачи выполнены до истечения timeout
+        """
+        with self._condition:
+            if self._tasks:
+                self._deadline = time.monotonic()
+                self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._tasks and not self._busy, timeout)
+
+    def pending(self):
+        """Проверяет, есть ли невыполненные задачи"""
+        with self._condition:
+            return bool(self._tasks) or self._busy
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._tasks:
+                    self._condition.wait()
+                while True:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                tasks = list(self._tasks.values())
+                self._tasks.clear()
+                self._first_request = None
+                self._busy = True
+
+            for task in tasks:
+                try:
+                    task()
+                except Exception as error:
+                    self.last_error = error
+                    traceback.print_exc()
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()